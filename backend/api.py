@@ -1,17 +1,34 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 import os
 import sys
-import shutil
+import tempfile
 import uuid
+import asyncio
 
 # Add current directory to path to allow importing local modules
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from database import Database, get_data_dir
+# Console output as UTF-8: on Windows stdout/stderr default to the ANSI code
+# page (cp1252), and printing Turkish names raised UnicodeEncodeError
+for _stream in (sys.stdout, sys.stderr):
+    if hasattr(_stream, "reconfigure"):
+        _stream.reconfigure(encoding="utf-8", errors="backslashreplace")
+
+from database import Database, get_data_dir, RECIPE_COLUMNS
+import assets
+import auth
+import catalog
+import http_cache
+import images
+import maintenance
+import pagination
+import recipe_io
+import warmup
 
 from contextlib import asynccontextmanager
 
@@ -21,16 +38,51 @@ async def lifespan(app: FastAPI):
     print("--- API RELOADED: Using Popen for Bot ---")
     db = Database()
     db.initialize()
+    # Create/load the session token key before the first login needs it
+    auth.get_secret()
     
     # Ensure avatars directory exists
     avatars_dir = os.path.join(get_data_dir(), "avatars")
     os.makedirs(avatars_dir, exist_ok=True)
     
+    # Drop superseded change-log entries left over from the last session
+    db.compact_change_log()
+    
+    # Warm up renderers and the recipe catalog in the background, so the
+    # first /api/generate does not pay for imports and font parsing
+    app.state.warmup_task = asyncio.create_task(asyncio.to_thread(warmup.run_warmup))
+    
+    # Scheduled online backups and compaction of the database
+    maintenance.scheduler.start()
+    
+    # Background Firebase sync (if the sync router loaded)
+    firebase_sync = sys.modules.get("firebase_sync")
+    if firebase_sync is not None:
+        import sync_listener
+        import sync_scheduler
+        sync_scheduler.scheduler.start()
+        # Snapshot listener, if it was enabled (initializing Firebase may block)
+        app.state.listener_task = asyncio.create_task(asyncio.to_thread(sync_listener.start_from_settings))
+    
     yield
-    # Shutdown (if needed)
+    # Shutdown: stop the scheduler, the listener and the Firebase sync worker threads
+    if firebase_sync is not None:
+        await asyncio.to_thread(sync_scheduler.scheduler.stop)
+        await asyncio.gather(app.state.listener_task, return_exceptions=True)
+        await asyncio.to_thread(sync_listener.listener.stop)
+        firebase_sync.shutdown_executor(wait=False)
+    await asyncio.to_thread(maintenance.scheduler.stop)
+    auth.shutdown_executor(wait=False)
 
 app = FastAPI(title="DetoksBot API", lifespan=lifespan)
 
+# Hard size cap on image uploads, enforced while the body is received
+# (added before CORS so 413 responses still carry CORS headers)
+app.add_middleware(images.UploadLimitMiddleware, paths=[r"^/api/users/\d+/avatar$", r"^/api/settings/logo$"])
+
+# Track API activity, so compaction only runs in quiet periods (status polling does not count)
+app.add_middleware(maintenance.ActivityMiddleware, ignore=("/api/admin/maintenance",))
+
 # Configure CORS for Electron/React frontend
 app.add_middleware(
     CORSMiddleware,
@@ -40,9 +92,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Serve static files (avatars)
+# Serve uploaded images (avatars/, app/) - never the rest of the data dir
 # Ensure data dir exists first (it should via database init)
-app.mount("/static", StaticFiles(directory=get_data_dir()), name="static")
+app.mount("/static", assets.AssetServer(get_data_dir()), name="static")
 
 
 # Database getter - creates new instance per request for thread safety
@@ -54,6 +106,12 @@ def get_db():
 def read_root():
     return {"status": "ok", "message": "DetoksBot Backend is running"}
 
+@app.get("/api/ready")
+def read_ready():
+    """Warm-up readiness: 503 while warming up, 200 once finished."""
+    state = warmup.get_state()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
 # --- Auth Models ---
 class LoginRequest(BaseModel):
     username: str
@@ -82,20 +140,40 @@ class RecipeRequest(BaseModel):
     bki_34_plus: Optional[str] = None
     seasons: Optional[str] = "yaz,kis"
 
+class BulkRecipesRequest(BaseModel):
+    recipe_ids: List[int]
+    target_pool: Optional[str] = None  # copy/move only
+
 # --- API Endpoints ---
 
 @app.post("/api/login")
-def login(request: LoginRequest):
+async def login(request: LoginRequest):
     db = get_db()
-    user = db.verify_user(request.username, request.password)
+    # bcrypt runs on its own bounded pool, not the request threadpool
+    user = await auth.run_bcrypt(db.verify_user, request.username, request.password)
     if user:
         # Remove sensitive data
         user.pop("password_hash", None)
         user.pop("security_answer_hash", None)
-        return {"status": "success", "user": user}
+        session = auth.issue_token(user)
+        return {"status": "success", "user": user, "token": session["token"], "expiresAt": session["expiresAt"]}
     else:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
+@app.post("/api/logout")
+def logout(claims: dict = Depends(auth.current_user)):
+    auth.revocations.revoke_token(claims)
+    return {"status": "success"}
+
+@app.get("/api/auth/me")
+async def get_current_user(claims: dict = Depends(auth.current_user)):
+    """The session behind the bearer token (no database read)."""
+    return {
+        "status": "success",
+        "user": {"id": claims["sub"], "username": claims["name"], "role": claims["role"]},
+        "expiresAt": claims["exp"]
+    }
+
 @app.get("/api/auth/security-question/{username}")
 def get_security_question_endpoint(username: str):
     db = get_db()
@@ -123,52 +201,60 @@ def get_security_question_endpoint(username: str):
     return {"status": "success", "question": user['security_question']}
 
 @app.post("/api/auth/reset-password")
-def reset_password_endpoint(request: PasswordResetRequest):
+async def reset_password_endpoint(request: PasswordResetRequest):
     db = get_db()
-    success = db.reset_password_with_security_answer(
+    success = await auth.run_bcrypt(
+        db.reset_password_with_security_answer,
         request.username, 
         request.security_answer, 
         request.new_password
     )
     
     if success:
+        # Sessions issued with the old password end here
+        user = await asyncio.to_thread(db.get_user_by_username, request.username)
+        if user:
+            await asyncio.to_thread(auth.revocations.revoke_user, user['id'])
         return {"status": "success", "message": "Şifre başarıyla sıfırlandı."}
     else:
         raise HTTPException(status_code=400, detail="Güvenlik cevabı hatalı veya kullanıcı bulunamadı.")
 
+def image_upload_response(saved: dict, url_prefix: str) -> dict:
+    """URLs for a saved upload; `path` is the thumbnail when variants exist."""
+    variants = {name: f"{url_prefix}/{filename}" for name, filename in saved["variants"].items()}
+    original = f"{url_prefix}/{saved['filename']}"
+    return {"path": variants.get("thumb", original), "original": original, "variants": variants}
+
 @app.post("/api/users/{user_id}/avatar")
 async def upload_avatar(user_id: int, file: UploadFile = File(...)):
     try:
-        data_dir = get_data_dir()
-        avatars_dir = os.path.join(data_dir, "avatars")
-        os.makedirs(avatars_dir, exist_ok=True)
+        avatars_dir = os.path.join(get_data_dir(), "avatars")
         
-        # Generate unique filename
-        file_ext = os.path.splitext(file.filename)[1]
-        filename = f"avatar_{user_id}_{uuid.uuid4().hex}{file_ext}"
-        file_path = os.path.join(avatars_dir, filename)
+        # Unique filename; chunked copy + resizing run in the threadpool
+        saved = await images.save_image_upload(
+            file, avatars_dir, f"avatar_{user_id}_{uuid.uuid4().hex}", variants=("thumb",)
+        )
+        
+        # Relative paths for serving via static; the profile shows the thumbnail
+        urls = image_upload_response(saved, "/static/avatars")
         
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
         # Update user in DB
         db = get_db()
-        # Relative path for serving via static
-        relative_path = f"/static/avatars/{filename}"
-        
-        # We need to call update_user_profile but we only have avatar_path to update
-        success = db.update_user_profile(user_id, avatar_path=relative_path)
+        success = await asyncio.to_thread(db.update_user_profile, user_id, avatar_path=urls["path"])
         
         if success:
-             return {"status": "success", "avatar_path": relative_path}
+             return {"status": "success", "avatar_path": urls["path"], "original": urls["original"], "variants": urls["variants"]}
         else:
+             images.remove_with_variants(os.path.join(avatars_dir, saved["filename"]))
              raise HTTPException(status_code=500, detail="Database update failed")
-             
+    
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.put("/api/users/{user_id}/profile")
-def update_profile(user_id: int, profile: UserProfileUpdate):
+def save_profile(user_id: int, profile: UserProfileUpdate) -> Optional[dict]:
+    """Update the profile (bcrypt-bound when a password or answer changes); the updated user or None."""
     db = get_db()
     
     # If password change requested, maybe verify old password?
@@ -181,10 +267,22 @@ def update_profile(user_id: int, profile: UserProfileUpdate):
         security_question=profile.security_question,
         security_answer=profile.security_answer
     )
+    if not success:
+        return None
+    if profile.password:
+        # Sessions issued with the old password end here
+        auth.revocations.revoke_user(user_id)
+    return db.get_user(user_id) or {}
+
+@app.put("/api/users/{user_id}/profile")
+async def update_profile(user_id: int, profile: UserProfileUpdate):
+    if profile.password or profile.security_answer:
+        user = await auth.run_bcrypt(save_profile, user_id, profile)
+    else:
+        user = await asyncio.to_thread(save_profile, user_id, profile)
+    success = user is not None
     
     if success:
-        # Fetch updated user to return
-        user = db.get_user(user_id)
         if user:
             user.pop("password_hash", None)
             user.pop("security_answer_hash", None)
@@ -203,14 +301,49 @@ def get_user(user_id: int):
         return {"status": "success", "user": user}
     raise HTTPException(status_code=404, detail="User not found")
 
+def recipe_to_api(recipe: dict) -> dict:
+    # Map bki_21_25 to content for frontend compatibility
+    if 'bki_21_25' in recipe:
+        recipe['content'] = recipe['bki_21_25']
+    return recipe
+
+RECIPE_API_FIELDS = {column: column for column in RECIPE_COLUMNS}
+RECIPE_API_FIELDS["content"] = "bki_21_25"
+
 @app.get("/api/recipes")
-def get_recipes(pool_type: Optional[str] = None):
+def get_recipes(request: Request, pool_type: Optional[str] = None, after: Optional[str] = None,
+                limit: Optional[int] = None, fields: Optional[str] = None):
+    """
+    Without after/limit/fields: the full list, served with an ETag.
+    With limit: one keyset page {"items": [...], "next_after": cursor} ordered by (name, id).
+    fields= selects only the listed columns (comma separated).
+    """
     db = get_db()
-    recipes = db.get_all_recipes(pool_type=pool_type)
-    # Map bki_21_25 to content for frontend compatibility
-    for recipe in recipes:
-        recipe['content'] = recipe.get('bki_21_25', '')
-    return recipes
+    
+    if after is None and limit is None and fields is None:
+        def build():
+            return [recipe_to_api(recipe) for recipe in db.get_all_recipes(pool_type=pool_type)]
+        
+        return http_cache.cached_json_response(
+            request, db, f"recipes?pool_type={pool_type or ''}", ("recipes",), build
+        )
+    
+    pagination.check_limit(limit)
+    names = pagination.parse_fields(fields, RECIPE_API_FIELDS)
+    columns = list(dict.fromkeys(RECIPE_API_FIELDS[name] for name in names)) if names else None
+    after_key = pagination.decode_cursor(after, (str, int)) if after else None
+    
+    def convert(recipe):
+        recipe = recipe_to_api(recipe)
+        return {name: recipe[name] for name in names} if names else recipe
+    
+    rows = db.iter_recipes(pool_type=pool_type, after=after_key,
+                           limit=limit + 1 if limit else None, fields=columns)
+    if limit:
+        chunks = pagination.stream_page(rows, convert, limit, lambda r: (r["name"], r["id"]))
+    else:
+        chunks = pagination.stream_array(rows, convert)
+    return pagination.json_stream_response(chunks)
 
 @app.post("/api/recipes")
 def create_recipe(recipe: RecipeRequest):
@@ -260,6 +393,81 @@ def delete_recipe(recipe_id: int):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/recipes/import")
+async def import_recipes(request: Request, format: Optional[str] = None,
+                         chunk_size: int = recipe_io.CHUNK_SIZE):
+    """
+    Bulk import from a JSONL or CSV request body (format= or Content-Type).
+    The body is spooled to a temp file, then validated and inserted in
+    transactional chunks; invalid rows are skipped and reported by line.
+    """
+    try:
+        fmt = recipe_io.resolve_format(format, request.headers.get("content-type"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not 0 < chunk_size <= recipe_io.MAX_CHUNK_SIZE:
+        raise HTTPException(status_code=400, detail=f"chunk_size must be in 1..{recipe_io.MAX_CHUNK_SIZE}")
+    
+    try:
+        with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as spool:
+            async for chunk in request.stream():
+                await run_in_threadpool(spool.write, chunk)
+            spool.seek(0)
+            result = await run_in_threadpool(recipe_io.import_recipes, get_db(), spool, fmt, chunk_size)
+        return {"status": "success", **result}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/recipes/export")
+def export_recipes(format: str = "jsonl", pool_type: Optional[str] = None):
+    """Stream every recipe (with package ids) as JSONL or CSV, ordered by id."""
+    try:
+        fmt = recipe_io.resolve_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        recipe_io.export_recipes(get_db(), fmt, pool_type),
+        media_type=recipe_io.FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="recipes.{fmt}"'}
+    )
+
+def require_target_pool(request: BulkRecipesRequest) -> str:
+    if not request.target_pool:
+        raise HTTPException(status_code=400, detail="target_pool is required")
+    return request.target_pool
+
+@app.post("/api/recipes/bulk/copy")
+def bulk_copy_recipes(request: BulkRecipesRequest):
+    """Copy recipes (with seasons and package links) into target_pool in one statement."""
+    target_pool = require_target_pool(request)
+    db = get_db()
+    try:
+        copied = db.copy_recipes_to_pool(request.recipe_ids, target_pool)
+        return {"status": "success", "copied": copied}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/recipes/bulk/move")
+def bulk_move_recipes(request: BulkRecipesRequest):
+    target_pool = require_target_pool(request)
+    db = get_db()
+    try:
+        moved = db.move_recipes_to_pool(request.recipe_ids, target_pool)
+        return {"status": "success", "moved": moved}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/recipes/bulk/delete")
+def bulk_delete_recipes(request: BulkRecipesRequest):
+    db = get_db()
+    try:
+        deleted = db.bulk_delete_recipes(request.recipe_ids)
+        return {"status": "success", "deleted": deleted}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 # --- Settings Endpoints ---
 
 class SettingsRequest(BaseModel):
@@ -273,20 +481,27 @@ class SettingsRequest(BaseModel):
     app_logo_path: Optional[str] = None
 
 @app.get("/api/settings")
-def get_settings():
+def get_settings(request: Request):
     db = get_db()
-    settings = db.get_all_settings()
     
-    # Add season config info
     # Add season config info
     from database import get_season_config
     # settings['season'] = 'auto' # Deprecated
     
     config = get_season_config()
-    settings['summer_start'] = config.get('summer_start', '04-01')
-    settings['summer_end'] = config.get('summer_end', '10-01')
+    summer_start = config.get('summer_start', '04-01')
+    summer_end = config.get('summer_end', '10-01')
     
-    return settings
+    def build():
+        settings = db.get_all_settings()
+        settings['summer_start'] = summer_start
+        settings['summer_end'] = summer_end
+        return settings
+    
+    # config.json is not a table, so its values are part of the ETag variant
+    return http_cache.cached_json_response(
+        request, db, "settings", ("settings",), build, variant=f"{summer_start}|{summer_end}"
+    )
 
 @app.post("/api/settings")
 def update_settings(settings: SettingsRequest):
@@ -316,22 +531,16 @@ def update_settings(settings: SettingsRequest):
 @app.post("/api/settings/logo")
 async def upload_app_logo(file: UploadFile = File(...)):
     try:
-        data_dir = get_data_dir()
-        app_dir = os.path.join(data_dir, "app")
-        os.makedirs(app_dir, exist_ok=True)
+        app_dir = os.path.join(get_data_dir(), "app")
         
-        file_ext = os.path.splitext(file.filename)[1]
         # Use unique name to ensure cache busting on frontend
-        filename = f"logo_{uuid.uuid4().hex[:8]}{file_ext}"
+        saved = await images.save_image_upload(file, app_dir, f"logo_{uuid.uuid4().hex[:8]}")
         
-        file_path = os.path.join(app_dir, filename)
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        # Return relative path
-        relative_path = f"/static/app/{filename}"
-        return {"status": "success", "path": relative_path}
+        # Return relative paths; `path` (the thumbnail) is what the UI shows,
+        # the header variant is sized for document headers
+        return {"status": "success", **image_upload_response(saved, "/static/app")}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -349,10 +558,11 @@ class TemplateRequest(BaseModel):
 # --- Template Endpoints ---
 
 @app.get("/api/templates")
-def get_templates():
+def get_templates(request: Request):
     db = get_db()
-    templates = db.get_all_templates()
-    return templates
+    return http_cache.cached_json_response(
+        request, db, "templates", ("diet_templates",), db.get_all_templates
+    )
 
 @app.get("/api/templates/{template_id}")
 def get_template(template_id: int):
@@ -411,13 +621,22 @@ class PackageRequest(BaseModel):
 class RecipePackagesRequest(BaseModel):
     package_ids: List[int]
 
+class PackageRecipesRequest(BaseModel):
+    recipe_ids: List[int]
+
+class MembershipMatrixRequest(BaseModel):
+    # "package": {package_id: [recipe_id, ...]}, "recipe": {recipe_id: [package_id, ...]}
+    by: str = "package"
+    memberships: Dict[int, List[int]]
+
 # --- Package Endpoints ---
 
 @app.get("/api/packages")
-def get_packages():
+def get_packages(request: Request):
     db = get_db()
-    packages = db.get_all_packages()
-    return packages
+    return http_cache.cached_json_response(
+        request, db, "packages", ("packages",), db.get_all_packages
+    )
 
 @app.get("/api/packages/{package_id}")
 def get_package(package_id: int):
@@ -481,8 +700,40 @@ def get_recipe_packages(recipe_id: int):
 def set_recipe_packages(recipe_id: int, request: RecipePackagesRequest):
     db = get_db()
     try:
-        db.add_recipe_to_packages(recipe_id, request.package_ids)
-        return {"status": "success", "message": "Recipe packages updated successfully"}
+        result = db.add_recipe_to_packages(recipe_id, request.package_ids)
+        return {"status": "success", "message": "Recipe packages updated successfully", **result}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.put("/api/packages/{package_id}/recipes")
+def set_package_recipes(package_id: int, request: PackageRecipesRequest):
+    """Replace the package's recipes with recipe_ids; only the difference is written."""
+    db = get_db()
+    if not db.get_package(package_id):
+        raise HTTPException(status_code=404, detail="Package not found")
+    try:
+        result = db.set_recipe_package_memberships({package_id: request.recipe_ids}, by="package")
+        return {"status": "success", **result}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.put("/api/recipe-packages")
+def set_recipe_package_matrix(request: MembershipMatrixRequest):
+    """
+    Bulk membership update: every listed package (by="package") or recipe
+    (by="recipe") gets exactly the given members, in one transaction.
+    Unlisted packages/recipes are left untouched.
+    """
+    db = get_db()
+    try:
+        result = db.set_recipe_package_memberships(request.memberships, by=request.by)
+        return {"status": "success", **result}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -506,24 +757,53 @@ class AppointmentRequest(BaseModel):
     note: Optional[str] = None
     status: Optional[str] = 'pending'
 
+# camelCase API field -> appointments column
+APPOINTMENT_API_FIELDS = {
+    "id": "id",
+    "clientName": "client_name",
+    "phone": "phone",
+    "date": "date",
+    "time": "time",
+    "types": "types",
+    "note": "note",
+    "status": "status"
+}
+
+def appointment_to_api(app: dict, names: list = None) -> dict:
+    # Convert snake_case to camelCase for frontend
+    return {
+        name: app[APPOINTMENT_API_FIELDS[name]]
+        for name in (names or APPOINTMENT_API_FIELDS)
+    }
+
 @app.get("/api/appointments")
-def get_appointments(date: Optional[str] = None):
+def get_appointments(date: Optional[str] = None, date_from: Optional[str] = None,
+                     date_to: Optional[str] = None, after: Optional[str] = None,
+                     limit: Optional[int] = None, fields: Optional[str] = None):
+    """
+    Appointments ordered by (date, time, id), streamed row by row.
+    Without limit the response is a plain array (backward compatible).
+    With limit it is one keyset page {"items": [...], "next_after": cursor}.
+    date_from/date_to filter an inclusive range; fields= selects columns.
+    """
     db = get_db()
-    appointments = db.get_all_appointments(date)
-    # Convert snake_case to camelCase for frontend
-    result = []
-    for app in appointments:
-        result.append({
-            "id": app["id"],
-            "clientName": app["client_name"],
-            "phone": app["phone"],
-            "date": app["date"],
-            "time": app["time"],
-            "types": app["types"],
-            "note": app["note"],
-            "status": app["status"]
-        })
-    return result
+    
+    pagination.check_limit(limit)
+    names = pagination.parse_fields(fields, APPOINTMENT_API_FIELDS)
+    columns = [APPOINTMENT_API_FIELDS[name] for name in names] if names else None
+    after_key = pagination.decode_cursor(after, (str, str, int)) if after else None
+    
+    rows = db.iter_appointments(
+        date=date, date_from=date_from, date_to=date_to, after=after_key,
+        limit=limit + 1 if limit else None, fields=columns
+    )
+    convert = lambda app: appointment_to_api(app, names)
+    
+    if limit:
+        chunks = pagination.stream_page(rows, convert, limit, lambda r: (r["date"], r["time"], r["id"]))
+    else:
+        chunks = pagination.stream_array(rows, convert)
+    return pagination.json_stream_response(chunks)
 
 @app.post("/api/appointments")
 def create_appointment(request: AppointmentRequest):
@@ -652,8 +932,8 @@ def create_single_list(db, template: dict, package_id: int, bki_group: str,
         for meal_tuple in template['meals']:
             meal_time, meal_name, meal_type = meal_tuple
             
-            # Pakete ait tarifleri getir (sezon filtresi ile)
-            recipes = db.get_recipes_for_diet_by_package(package_id, meal_type, exclude_words, season_filter=season_filter)
+            # Pakete ait tarifleri getir (sezon filtresi ile, bellek içi katalogdan)
+            recipes = catalog.recipes_for_diet(db, package_id, meal_type, exclude_words, season_filter=season_filter)
             
             # BKİ grubuna göre içerik seç
             candidates = []
@@ -856,10 +1136,79 @@ def generate_diet(request: GenerateDietRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/pools")
-def get_pools():
+def get_pools(request: Request):
+    db = get_db()
+    return http_cache.cached_json_response(
+        request, db, "pools", ("pools",), db.get_all_pools
+    )
+
+# --- Bootstrap / Delta Endpoints ---
+
+def settings_to_api(settings: dict) -> dict:
+    from database import get_season_config
+    config = get_season_config()
+    settings['summer_start'] = config.get('summer_start', '04-01')
+    settings['summer_end'] = config.get('summer_end', '10-01')
+    return settings
+
+# Change-log table name -> response key and row converter
+FEED_TABLES = {
+    "recipes": ("recipes", recipe_to_api),
+    "recipe_packages": ("recipePackages", dict),
+    "diet_templates": ("templates", dict),
+    "template_meals": ("templateMeals", dict),
+    "packages": ("packages", dict),
+    "pools": ("pools", dict),
+    "appointments": ("appointments", appointment_to_api),
+}
+
+@app.get("/api/bootstrap")
+def get_bootstrap(appointments_from: Optional[str] = None):
+    """All catalog data in one response, plus the cursor for /api/changes."""
     db = get_db()
-    pools = db.get_all_pools()
-    return pools
+    try:
+        snapshot = db.get_catalog_snapshot(appointments_from=appointments_from)
+        data = snapshot["data"]
+        
+        result = {"cursor": snapshot["cursor"]}
+        for table, (key, convert) in FEED_TABLES.items():
+            result[key] = [convert(row) for row in data[table]]
+        result["settings"] = settings_to_api({row["key"]: row["value"] for row in data["settings"]})
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/changes")
+def get_changes(since: int):
+    """
+    Rows inserted, updated or deleted after `since`.
+    reset=true means the cursor fell behind compaction and the client must re-bootstrap.
+    """
+    db = get_db()
+    try:
+        delta = db.get_changes_since(since)
+        result = {"cursor": delta["cursor"], "reset": delta["reset"]}
+        
+        changes = {}
+        for table, change in delta["changes"].items():
+            if table == "settings":
+                changes["settings"] = {
+                    "upserted": {row["key"]: row["value"] for row in change["upserted"]},
+                    "deleted": change["deleted"]
+                }
+            else:
+                key, convert = FEED_TABLES[table]
+                changes[key] = {
+                    "upserted": [convert(row) for row in change["upserted"]],
+                    "deleted": change["deleted"]
+                }
+        result["changes"] = changes
+        
+        # Season dates live in config.json, outside the change log
+        result["season"] = settings_to_api({})
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 # Global variable to store process
 bot_process = None
@@ -899,6 +1248,13 @@ def get_detoks_bot_status():
         return {"status": "running"}
     return {"status": "stopped"}
 
+# --- Debug Router (profiler, tracemalloc) ---
+from debug_profiler import router as debug_router
+app.include_router(debug_router)
+
+# --- Maintenance Router (backups, compaction) ---
+app.include_router(maintenance.router)
+
 # --- Firebase Sync Router ---
 try:
     from firebase_sync import router as sync_router
@@ -0,0 +1,227 @@
+"""
+Statik varlık sunucusu - /static altında yalnızca yüklenen görseller.
+
+Veri klasörünün tamamı (veritabanı, config.json) değil, yalnızca ASSET_ROOTS
+altındaki dosyalar sunulur. Yüklenen dosyaların adları benzersiz olduğundan
+yanıtlar değişmez (immutable) önbellek başlığı taşır; ayrıca ETag /
+Last-Modified ile koşullu GET ve tek aralıklı Range istekleri desteklenir.
+Küçük ve sık istenen dosyalar (logo, avatar küçük resimleri) bellek içi bir
+LRU'da tutulur; isabetlerde diskten yalnızca stat okunur.
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response, StreamingResponse
+
+ASSET_ROOTS = ("avatars", "app")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+MAX_ENTRY_BYTES = 256 * 1024        # bundan büyük dosyalar önbelleğe alınmaz
+MAX_CACHE_BYTES = 8 * 1024 * 1024   # önbelleğin toplam boyutu
+STREAM_CHUNK = 64 * 1024
+
+MEDIA_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".webp": "image/webp",
+    ".gif": "image/gif",
+    ".bmp": "image/bmp",
+    ".svg": "image/svg+xml",
+    ".ico": "image/x-icon",
+}
+
+# Tek düzey, yalnızca güvenli karakterler: ayraç ve '..' ile klasör dışına çıkılamaz
+_SAFE_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class AssetCache:
+    """Boyut sınırlı LRU: yol -> (mtime_ns, boyut, içerik)."""
+
+    def __init__(self, max_bytes: int = MAX_CACHE_BYTES, max_entry_bytes: int = MAX_ENTRY_BYTES):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path: str, stat) -> bytes:
+        """Dosya değişmemişse önbellekteki içerik, yoksa None."""
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            return None
+
+    def put(self, path: str, stat, content: bytes):
+        if len(content) > self.max_entry_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(path, None)
+            if old is not None:
+                self._size -= len(old[2])
+            self._entries[path] = (stat.st_mtime_ns, stat.st_size, content)
+            self._size += len(content)
+            while self._size > self.max_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._size, "hits": self.hits, "misses": self.misses}
+
+
+def make_etag(stat) -> str:
+    """Boyut ve değiştirilme zamanından güçlü ETag."""
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def parse_range(header: str, size: int):
+    """Tek aralıklı 'bytes=' başlığı -> (başlangıç, bitiş dahil).
+
+    Returns:
+        None: başlık yok sayılmalı (geçersiz ya da çok aralıklı) -> tam yanıt
+        False: aralık karşılanamaz -> 416
+    """
+    match = _RANGE.match(header.strip())
+    if not match or (not match.group(1) and not match.group(2)):
+        return None
+    first, last = match.group(1), match.group(2)
+    if not first:
+        # Son N bayt
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, end
+
+
+def _not_modified(headers, etag: str, stat) -> bool:
+    """If-None-Match (öncelikli) veya If-Modified-Since koşulu sağlanıyor mu."""
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(stat.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _file_chunks(path: str, start: int, end: int):
+    """Dosyanın [start, end] aralığını parça parça oku (threadpool'da dolaşılır)."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(STREAM_CHUNK, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _route_path(scope) -> str:
+    """Mount altındaki göreli yol (root_path çıkarılmış)."""
+    path = scope["path"]
+    root_path = scope.get("root_path", "")
+    if root_path and path.startswith(root_path):
+        return path[len(root_path):]
+    return path
+
+
+class AssetServer:
+    """ASGI uygulaması: directory altındaki ASSET_ROOTS klasörlerinden dosya sunar."""
+
+    def __init__(self, directory: str, roots: tuple = ASSET_ROOTS, cache: AssetCache = None):
+        self.directory = directory
+        self.roots = set(roots)
+        self.cache = cache or AssetCache()
+
+    def resolve(self, route_path: str):
+        """'/<kök>/<dosya adı>' -> disk yolu; izin verilmeyen yollar için None."""
+        parts = route_path.strip("/").split("/")
+        if len(parts) != 2 or parts[0] not in self.roots or not _SAFE_NAME.match(parts[1]):
+            return None
+        return os.path.join(self.directory, parts[0], parts[1])
+
+    async def __call__(self, scope, receive, send):
+        if scope["method"] not in ("GET", "HEAD"):
+            response = Response("Method Not Allowed", status_code=405, headers={"Allow": "GET, HEAD"})
+        else:
+            headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+            response = await run_in_threadpool(self.respond, _route_path(scope), headers, scope["method"] == "HEAD")
+        await response(scope, receive, send)
+
+    def respond(self, route_path: str, headers: dict, head: bool = False) -> Response:
+        """Yanıtı hazırla (engelleyen: stat ve küçük dosyalar için okuma)."""
+        path = self.resolve(route_path)
+        try:
+            stat = os.stat(path) if path else None
+        except OSError:
+            stat = None
+        if stat is None or not os.path.isfile(path):
+            return Response("Not Found", status_code=404)
+
+        etag = make_etag(stat)
+        base_headers = {
+            "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+            "ETag": etag,
+            "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+            "Accept-Ranges": "bytes",
+        }
+        media_type = MEDIA_TYPES.get(os.path.splitext(path)[1].lower(), "application/octet-stream")
+
+        if _not_modified(headers, etag, stat):
+            return Response(status_code=304, headers=base_headers)
+
+        size = stat.st_size
+        start, end, status = 0, size - 1, 200
+        range_header = headers.get("range")
+        if range_header and size and headers.get("if-range", etag) in (etag, base_headers["Last-Modified"]):
+            byte_range = parse_range(range_header, size)
+            if byte_range is False:
+                return Response(status_code=416, headers={**base_headers, "Content-Range": f"bytes */{size}"})
+            if byte_range is not None:
+                start, end = byte_range
+                status = 206
+                base_headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+        length = end - start + 1 if size else 0
+        if head:
+            return Response(status_code=status, media_type=media_type,
+                            headers={**base_headers, "Content-Length": str(length)})
+
+        content = None
+        if size <= self.cache.max_entry_bytes:
+            content = self.cache.get(path, stat)
+            if content is None:
+                with open(path, "rb") as f:
+                    content = f.read()
+                if len(content) != size:
+                    # Okuma sırasında değişti; bir sonraki istekte yeniden denenir
+                    return Response(content, media_type=media_type, headers={"Cache-Control": "no-store"})
+                self.cache.put(path, stat, content)
+
+        if content is not None:
+            return Response(content[start:end + 1], status_code=status, media_type=media_type, headers=base_headers)
+        return StreamingResponse(_file_chunks(path, start, end), status_code=status, media_type=media_type,
+                                 headers={**base_headers, "Content-Length": str(length)})
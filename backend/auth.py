@@ -0,0 +1,220 @@
+"""
+Session tokens for the DetoksBot API
+/api/login issues an HMAC-SHA256 signed, expiring token; requests present it
+as "Authorization: Bearer <token>" and current_user() verifies it without
+bcrypt or a database read. Revocations (logout, password change) are kept in
+memory and mirrored to the revoked_sessions table so they survive restarts.
+bcrypt work runs on its own small executor so parallel logins cannot
+occupy the whole request threadpool.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from fastapi import Depends, Header, HTTPException
+
+from database import SESSION_TOKEN_TTL, Database, get_data_dir, get_db_path, is_memory_db
+
+# Hex HMAC key, generated on first use. Kept out of the settings table: every
+# settings read path (/api/settings, /api/bootstrap, /api/changes) is public.
+SECRET_FILE = "session_secret.key"
+
+TOKEN_TTL = SESSION_TOKEN_TTL
+BCRYPT_WORKERS = 2
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+# ==================== SECRET ====================
+
+_secret = None
+_secret_lock = threading.Lock()
+
+
+def get_secret_path() -> str:
+    return os.path.join(get_data_dir(), SECRET_FILE)
+
+
+def _load_or_create_secret(path: str) -> bytes:
+    """Read the key file, or create it readable by the owner only (0600)"""
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        with open(path, "r", encoding="ascii") as f:
+            return bytes.fromhex(f.read().strip())
+    value = secrets.token_hex(32)
+    with os.fdopen(fd, "w", encoding="ascii") as f:
+        f.write(value)
+    return bytes.fromhex(value)
+
+
+def get_secret() -> bytes:
+    """HMAC key from the data dir key file (created on first use, then cached)
+
+    In-memory databases (tests, previews) get a process-only key instead.
+    """
+    global _secret
+    with _secret_lock:
+        if _secret is None:
+            if is_memory_db(get_db_path()):
+                _secret = secrets.token_bytes(32)
+            else:
+                _secret = _load_or_create_secret(get_secret_path())
+        return _secret
+
+
+def _sign(payload: str) -> str:
+    return _b64encode(hmac.new(get_secret(), payload.encode("ascii"), hashlib.sha256).digest())
+
+
+# ==================== REVOCATION ====================
+
+class RevocationList:
+    """Revoked token ids and per-user cutoffs, loaded once from the database"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._tokens = {}   # jti -> token expiry
+        self._users = {}    # user id -> tokens issued before this are revoked
+
+    def _load(self):
+        if self._loaded:
+            return
+        for row in Database().get_session_revocations():
+            key = row["key"]
+            if key.startswith("user:"):
+                self._users[int(key[5:])] = row["issued_before"]
+            else:
+                self._tokens[key] = row["expires_at"]
+        self._loaded = True
+
+    def is_revoked(self, claims: dict) -> bool:
+        with self._lock:
+            self._load()
+            if claims["jti"] in self._tokens:
+                return True
+            cutoff = self._users.get(claims["sub"])
+            return cutoff is not None and claims["iat"] < cutoff
+
+    def revoke_token(self, claims: dict):
+        """Revoke one token (logout)"""
+        with self._lock:
+            self._load()
+            self._tokens[claims["jti"]] = claims["exp"]
+            self._purge()
+        Database().add_session_revocation(claims["jti"], None, claims["exp"])
+
+    def revoke_user(self, user_id: int, cutoff: float = None, persist: bool = True):
+        """Revoke every token issued to a user before cutoff, default now
+        (password change or reset, account deletion). persist=False when the
+        caller already wrote the revoked_sessions row (Database.delete_user)."""
+        now = time.time() if cutoff is None else cutoff
+        with self._lock:
+            self._load()
+            self._users[user_id] = max(now, self._users.get(user_id, now))
+            self._purge()
+        if persist:
+            Database().add_session_revocation(f"user:{user_id}", now, now + TOKEN_TTL)
+
+    def _purge(self):
+        now = time.time()
+        self._tokens = {jti: exp for jti, exp in self._tokens.items() if exp > now}
+        self._users = {user: cutoff for user, cutoff in self._users.items() if cutoff + TOKEN_TTL > now}
+
+
+revocations = RevocationList()
+
+
+# ==================== TOKENS ====================
+
+def issue_token(user: dict, ttl: int = TOKEN_TTL) -> dict:
+    """Signed token for a verified user row"""
+    now = time.time()
+    claims = {
+        "sub": user["id"],
+        "name": user["username"],
+        "role": user.get("role") or "user",
+        "iat": round(now, 3),
+        "exp": int(now + ttl),
+        "jti": secrets.token_urlsafe(12)
+    }
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+    return {"token": f"{payload}.{_sign(payload)}", "expiresAt": claims["exp"]}
+
+
+def verify_token(token: str) -> Optional[dict]:
+    """Claims of a valid token; None if forged, malformed, expired or revoked"""
+    payload, _, signature = token.partition(".")
+    try:
+        if not signature or not hmac.compare_digest(signature, _sign(payload)):
+            return None
+        claims = json.loads(_b64decode(payload))
+    except (ValueError, UnicodeError):
+        return None
+    if claims.get("exp", 0) <= time.time() or revocations.is_revoked(claims):
+        return None
+    return claims
+
+
+def current_user(authorization: Optional[str] = Header(None)) -> dict:
+    """FastAPI dependency: claims of the request's bearer token, or 401"""
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        raise HTTPException(status_code=401, detail="Bearer token required",
+                            headers={"WWW-Authenticate": "Bearer"})
+    claims = verify_token(token.strip())
+    if claims is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired token",
+                            headers={"WWW-Authenticate": "Bearer"})
+    return claims
+
+
+def require_admin(claims: dict = Depends(current_user)) -> dict:
+    """FastAPI dependency: current_user, restricted to the admin role"""
+    if claims.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Admin role required")
+    return claims
+
+
+# ==================== BCRYPT EXECUTOR ====================
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Bounded pool for bcrypt hashing/verification (created on first use)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+        return _executor
+
+
+def shutdown_executor(wait: bool = True):
+    """Stop the bcrypt pool (called from the API lifespan on shutdown)"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait, cancel_futures=True)
+
+
+async def run_bcrypt(func, *args):
+    """Run a bcrypt-bound func(*args) on the bcrypt pool and await the result"""
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), func, *args)
@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""
+API yük testi - api.app süreç içi ASGI üzerinden, ağ olmadan.
+
+Geçici bir veri klasöründe populate_synthetic ile sentetik veritabanı
+oluşturur, uygulamanın lifespan'ini çalıştırır ve --concurrency sanal
+kullanıcıyla karışık senaryoları --duration saniye boyunca (ya da toplam
+--iterations senaryo tamamlanana kadar) yürütür:
+
+    catalog       paket, kalıp, ayar ve sayfalı tarif okumaları
+    appointments  günün randevuları + oluştur / güncelle / durum / sil
+    login         /api/login (bcrypt sınırlı havuzda)
+    preview       /api/generate, yalnızca PDF (tek çıktı)
+    generate      /api/generate, PDF + DOCX
+
+Sonuç JSON'dur: uç nokta ve toplam bazında istek sayısı, RPS, hata oranı ve
+gecikme yüzdelikleri (ms); commit ve ayarlar da yazılır, böylece farklı
+commit'lerdeki çalıştırmalar doğrudan karşılaştırılabilir.
+
+Kullanım:
+    python bench_api.py --preset tiny --concurrency 16 --duration 20
+    python bench_api.py --mix catalog=80,appointments=20 --concurrency 64 --output before.json
+    python bench_api.py --preset small --mix generate=1 --concurrency 4 --iterations 40
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+import database
+import populate_synthetic
+
+DEFAULT_MIX = "catalog=50,appointments=25,login=10,preview=10,generate=5"
+MAX_ERROR_SAMPLES = 20
+
+
+def parse_mix(text: str) -> dict:
+    """'catalog=50,login=10' -> {senaryo: ağırlık}."""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise SystemExit(f"Bilinmeyen senaryo: {name} (seçenekler: {', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """En yakın sıra yöntemiyle yüzdelik (liste sıralı olmalı)."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class Recorder:
+    """Uç nokta başına gecikmeler ve hatalar."""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.samples = []
+        self.scenarios = {}
+
+    def add(self, name: str, seconds: float, error: str = None):
+        self.latencies.setdefault(name, []).append(seconds)
+        if error is not None:
+            self.errors[name] = self.errors.get(name, 0) + 1
+            if len(self.samples) < MAX_ERROR_SAMPLES:
+                self.samples.append({"endpoint": name, "error": error})
+
+    def summary(self, elapsed: float) -> dict:
+        def stats(values: list, errors: int) -> dict:
+            values = sorted(values)
+            return {
+                "requests": len(values),
+                "errors": errors,
+                "error_rate": round(errors / len(values), 4) if values else 0.0,
+                "rps": round(len(values) / elapsed, 2) if elapsed else None,
+                "latency_ms": {
+                    "mean": round(sum(values) / len(values) * 1000, 2) if values else None,
+                    **{
+                        label: round(percentile(values, fraction) * 1000, 2) if values else None
+                        for label, fraction in (("p50", 0.5), ("p90", 0.9), ("p95", 0.95), ("p99", 0.99))
+                    },
+                    "max": round(values[-1] * 1000, 2) if values else None,
+                },
+            }
+
+        everything = [value for values in self.latencies.values() for value in values]
+        return {
+            "total": stats(everything, sum(self.errors.values())),
+            "endpoints": {
+                name: stats(values, self.errors.get(name, 0))
+                for name, values in sorted(self.latencies.items())
+            },
+            "scenarios": dict(sorted(self.scenarios.items())),
+            "error_samples": self.samples,
+        }
+
+
+async def call(http, recorder: Recorder, name: str, method: str, url: str, **kwargs):
+    """Tek istek; 4xx/5xx ve istisnalar hata sayılır. Yanıtı (ya da None) döndürür."""
+    started = time.perf_counter()
+    try:
+        response = await http.request(method, url, **kwargs)
+    except Exception as e:
+        recorder.add(name, time.perf_counter() - started, f"{type(e).__name__}: {e}")
+        return None
+    # Akış yanıtlarının gövdesi de süreye dahil
+    await response.aread()
+    error = None if response.status_code < 400 else f"HTTP {response.status_code}: {response.text[:200]}"
+    recorder.add(name, time.perf_counter() - started, error)
+    return response if error is None else None
+
+
+# ==================== SENARYOLAR ====================
+
+async def scenario_catalog(http, rng: random.Random, context: dict, recorder: Recorder):
+    name, url = rng.choice((
+        ("catalog.packages", "/api/packages"),
+        ("catalog.templates", "/api/templates"),
+        ("catalog.settings", "/api/settings"),
+        ("catalog.pools", "/api/pools"),
+        ("catalog.recipes_page", f"/api/recipes?limit=100&pool_type={rng.choice(('normal', 'hastalik'))}"),
+    ))
+    await call(http, recorder, name, "GET", url)
+
+
+async def scenario_appointments(http, rng: random.Random, context: dict, recorder: Recorder):
+    day = populate_synthetic.REFERENCE_DAY.isoformat()
+    await call(http, recorder, "appointments.list_day", "GET", f"/api/appointments?date={day}")
+
+    body = {
+        "clientName": f"Yük Testi {rng.randrange(10**6)}", "phone": "05550000000",
+        "date": day, "time": f"{rng.randint(9, 17):02d}:{rng.choice((0, 15, 30, 45)):02d}",
+        "types": ["Ölçüm"], "note": "", "status": "pending",
+    }
+    response = await call(http, recorder, "appointments.create", "POST", "/api/appointments", json=body)
+    if response is None:
+        return
+    appointment_id = response.json()["id"]
+    body["note"] = "Güncellendi"
+    await call(http, recorder, "appointments.update", "PUT", f"/api/appointments/{appointment_id}", json=body)
+    await call(http, recorder, "appointments.status", "PATCH",
+               f"/api/appointments/{appointment_id}/status", params={"status": "completed"})
+    await call(http, recorder, "appointments.delete", "DELETE", f"/api/appointments/{appointment_id}")
+
+
+async def scenario_login(http, rng: random.Random, context: dict, recorder: Recorder):
+    await call(http, recorder, "login", "POST", "/api/login",
+               json={"username": rng.choice(context["usernames"]), "password": populate_synthetic.SYNTHETIC_PASSWORD})
+
+
+def generate_body(rng: random.Random, context: dict, output_format: str) -> dict:
+    context["patients"] += 1
+    return {
+        "patient_name": f"Danışan {context['patients']}",
+        "weight": rng.uniform(55, 120), "height": rng.uniform(150, 195),
+        "birth_year": rng.randint(1960, 2005), "gender": rng.choice(("kadin", "erkek")),
+        "template_id": rng.choice(context["template_ids"]),
+        "package_id": rng.choice(context["package_ids"]),
+        "start_date": populate_synthetic.REFERENCE_DAY.isoformat(),
+        "excluded_foods": rng.choice(("", "", "somon", "ceviz, badem")),
+        "output_format": output_format,
+    }
+
+
+async def scenario_preview(http, rng: random.Random, context: dict, recorder: Recorder):
+    await call(http, recorder, "generate.pdf", "POST", "/api/generate", json=generate_body(rng, context, "pdf"))
+
+
+async def scenario_generate(http, rng: random.Random, context: dict, recorder: Recorder):
+    await call(http, recorder, "generate.both", "POST", "/api/generate", json=generate_body(rng, context, "both"))
+
+
+SCENARIOS = {
+    "catalog": scenario_catalog,
+    "appointments": scenario_appointments,
+    "login": scenario_login,
+    "preview": scenario_preview,
+    "generate": scenario_generate,
+}
+
+
+# ==================== ÇALIŞTIRMA ====================
+
+def prepare(workdir: str, preset: str, seed: int) -> dict:
+    """Sentetik veritabanını veri klasörüne üret; paket çıktıları geçici klasöre gitsin."""
+    database.get_data_dir = lambda: workdir
+    populate_synthetic.generate(database.get_db_path(), preset, seed, force=True)
+
+    output_dir = os.path.join(workdir, "output")
+    os.makedirs(output_dir, exist_ok=True)
+    db = database.Database()
+    conn = db.connect()
+    try:
+        with conn:
+            conn.execute("UPDATE packages SET save_path = ?", (output_dir,))
+        # Yük testinde üretim süresi baskın olmasın: en fazla iki liste
+        context = {
+            "package_ids": [row[0] for row in conn.execute("SELECT id FROM packages WHERE list_count <= 2 ORDER BY id")],
+            "template_ids": [row[0] for row in conn.execute("SELECT id FROM diet_templates ORDER BY id")],
+            # Üretici kullanıcıların bir kısmını pasif yapar; girişler aktiflerle denensin
+            "usernames": [row[0] for row in conn.execute("SELECT username FROM users WHERE is_active = 1 ORDER BY id")],
+            "patients": 0,
+        }
+    finally:
+        db.close()
+    return context
+
+
+async def run_load(context: dict, mix: dict, concurrency: int, duration: float,
+                   iterations: int, seed: int, wait_warmup: bool) -> dict:
+    import httpx
+    import api
+
+    app = api.app
+    recorder = Recorder()
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    remaining = [iterations] if iterations else None
+
+    async with app.router.lifespan_context(app):
+        warmup_seconds = None
+        if wait_warmup:
+            started = time.perf_counter()
+            await app.state.warmup_task
+            warmup_seconds = round(time.perf_counter() - started, 2)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+            deadline = time.perf_counter() + duration
+
+            async def worker(index: int):
+                rng = random.Random(seed * 1000 + index)
+                while time.perf_counter() < deadline:
+                    if remaining is not None:
+                        if remaining[0] <= 0:
+                            return
+                        remaining[0] -= 1
+                    name = rng.choices(names, weights=weights)[0]
+                    recorder.scenarios[name] = recorder.scenarios.get(name, 0) + 1
+                    await SCENARIOS[name](http, rng, context, recorder)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(index) for index in range(concurrency)))
+            elapsed = time.perf_counter() - started
+
+    return {"elapsed": elapsed, "warmup_seconds": warmup_seconds, **recorder.summary(elapsed)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Süreç içi ASGI ile API yük testi")
+    parser.add_argument("--preset", choices=tuple(populate_synthetic.PRESETS), default="tiny")
+    parser.add_argument("--seed", type=int, default=populate_synthetic.DEFAULT_SEED)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Senaryo ağırlıkları (varsayılan: {DEFAULT_MIX})")
+    parser.add_argument("--concurrency", type=int, default=16, help="Eşzamanlı sanal kullanıcı")
+    parser.add_argument("--duration", type=float, default=20.0, help="Saniye")
+    parser.add_argument("--iterations", type=int, default=None,
+                        help="Toplam senaryo sayısı (verilirse süre yalnızca üst sınırdır)")
+    parser.add_argument("--no-warmup", action="store_true",
+                        help="Isınmanın bitmesini bekleme (soğuk başlangıcı ölçmek için)")
+    parser.add_argument("--output", default=None, help="Sonucu ayrıca bu dosyaya yaz")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    workdir = tempfile.mkdtemp(prefix="detoks-bench-")
+    try:
+        context = prepare(workdir, args.preset, args.seed)
+        result = asyncio.run(run_load(
+            context, mix, args.concurrency, args.duration, args.iterations, args.seed, not args.no_warmup
+        ))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "commit": git_commit(),
+        "config": {
+            "preset": args.preset, "seed": args.seed, "mix": mix, "concurrency": args.concurrency,
+            "duration": args.duration, "iterations": args.iterations, "warmup": not args.no_warmup,
+        },
+        "elapsed_seconds": round(result.pop("elapsed"), 3),
+        **result,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
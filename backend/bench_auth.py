@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+Kimlik doğrulama benchmark'ı - süreç içi ASGI, ağ olmadan.
+
+overhead modu, aynı küçük uç noktayı dört biçimde ölçer: kimlik doğrulamasız,
+imzalı oturum token'ı (auth.current_user), istek başına veritabanından kullanıcı
+okuma ve istek başına bcrypt doğrulama. Sonuç istek başına ortalama süredir.
+
+logins modu, --count eşzamanlı giriş sürerken senkron (threadpool'da çalışan)
+bir uç noktanın gecikmesini ölçer; --unbounded ile bcrypt sınırlı havuz yerine
+istek threadpool'unda çalıştırılır (karşılaştırma için).
+
+Kullanım:
+    python bench_auth.py --mode overhead --count 2000
+    python bench_auth.py --mode logins --count 64
+    python bench_auth.py --mode logins --count 64 --unbounded
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+import database
+from database import Database
+import auth
+
+
+def setup_db(workdir: str) -> dict:
+    """Geçici veritabanı, bir kullanıcı ve ona ait token (istekler kendi Database örneğini açar)."""
+    database.get_data_dir = lambda: workdir
+    db = Database()
+    db.initialize()
+    user_id = db.add_user("bench", "bench-password", role="admin")
+    return {"user_id": user_id, "token": auth.issue_token(db.get_user(user_id))["token"]}
+
+
+def build_app():
+    from fastapi import Depends, FastAPI, Header, HTTPException
+
+    app = FastAPI()
+
+    def db_user(x_user_id: int = Header(None)):
+        # Token olmadan kimlik doğrulama: her istekte kullanıcı satırı okunur
+        user = Database().get_user(x_user_id)
+        if not user or not user.get('is_active'):
+            raise HTTPException(status_code=401)
+        return user
+
+    def bcrypt_user(x_user: str = Header(None), x_password: str = Header(None)):
+        # Her istekte şifre doğrulama (Basic auth benzeri)
+        user = Database().verify_user(x_user, x_password)
+        if not user:
+            raise HTTPException(status_code=401)
+        return user
+
+    @app.get("/none")
+    def no_auth():
+        return {"ok": True}
+
+    @app.get("/token")
+    def token_auth(claims: dict = Depends(auth.current_user)):
+        return {"ok": True}
+
+    @app.get("/db")
+    def db_auth(user: dict = Depends(db_user)):
+        return {"ok": True}
+
+    @app.get("/bcrypt")
+    def bcrypt_auth(user: dict = Depends(bcrypt_user)):
+        return {"ok": True}
+
+    @app.get("/sync-ping")
+    def sync_ping():
+        return {"ok": True}
+
+    return app
+
+
+def bench_overhead(count: int) -> dict:
+    """Her kimlik doğrulama biçimi için istek başına ortalama süre."""
+    import httpx
+
+    workdir = tempfile.mkdtemp(prefix="detoks-bench-")
+    try:
+        state = setup_db(workdir)
+        app = build_app()
+        variants = {
+            "none": ("/none", {}, count),
+            "token": ("/token", {"Authorization": f"Bearer {state['token']}"}, count),
+            "db_lookup": ("/db", {"X-User-Id": str(state["user_id"])}, count),
+            # bcrypt çok yavaş; daha az istekle ölç
+            "bcrypt": ("/bcrypt", {"X-User": "bench", "X-Password": "bench-password"}, max(count // 100, 5)),
+        }
+
+        async def run():
+            transport = httpx.ASGITransport(app=app)
+            results = {}
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+                for name, (path, headers, requests) in variants.items():
+                    await http.get(path, headers=headers)  # ısınma
+                    started = time.perf_counter()
+                    for _ in range(requests):
+                        response = await http.get(path, headers=headers)
+                        assert response.status_code == 200, response.text
+                    results[name] = (time.perf_counter() - started) / requests
+            return results
+
+        per_request = asyncio.run(run())
+        return {
+            "mode": "overhead",
+            "count": count,
+            "us_per_request": {name: round(seconds * 1e6, 1) for name, seconds in per_request.items()},
+            "auth_overhead_us": {
+                name: round((seconds - per_request["none"]) * 1e6, 1)
+                for name, seconds in per_request.items() if name != "none"
+            },
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def bench_logins(count: int, unbounded: bool) -> dict:
+    """count eşzamanlı giriş sırasında /sync-ping gecikmesi."""
+    import httpx
+    from starlette.concurrency import run_in_threadpool
+
+    workdir = tempfile.mkdtemp(prefix="detoks-bench-")
+    try:
+        state = setup_db(workdir)
+        app = build_app()
+
+        @app.post("/login")
+        async def login():
+            if unbounded:
+                # Eski davranış: senkron uç nokta gibi istek threadpool'unda
+                user = await run_in_threadpool(Database().verify_user, "bench", "bench-password")
+            else:
+                user = await auth.run_bcrypt(Database().verify_user, "bench", "bench-password")
+            return auth.issue_token(user)
+
+        async def run():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+                started = time.perf_counter()
+                logins = asyncio.gather(*(http.post("/login") for _ in range(count)))
+                login_task = asyncio.ensure_future(logins)
+
+                latencies = []
+                while not login_task.done():
+                    sent = time.perf_counter()
+                    await http.get("/sync-ping")
+                    latencies.append(time.perf_counter() - sent)
+                    await asyncio.sleep(0.01)
+
+                responses = await login_task
+                return responses, time.perf_counter() - started, latencies
+
+        responses, elapsed, latencies = asyncio.run(run())
+        latencies.sort()
+        return {
+            "mode": "logins",
+            "unbounded": unbounded,
+            "count": count,
+            "bcrypt_workers": None if unbounded else auth.BCRYPT_WORKERS,
+            "ok": sum(1 for response in responses if response.status_code == 200),
+            "seconds": round(elapsed, 3),
+            "pings": len(latencies),
+            "ping_p50_ms": round(latencies[len(latencies) // 2] * 1000, 2) if latencies else None,
+            "ping_max_ms": round(latencies[-1] * 1000, 2) if latencies else None,
+        }
+    finally:
+        auth.shutdown_executor()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Oturum token'ı / bcrypt benchmark'ı")
+    parser.add_argument("--mode", choices=("overhead", "logins"), default="overhead")
+    parser.add_argument("--count", type=int, default=None,
+                        help="overhead: istek sayısı (varsayılan 2000), logins: eşzamanlı giriş (varsayılan 64)")
+    parser.add_argument("--unbounded", action="store_true",
+                        help="logins: bcrypt'i istek threadpool'unda çalıştır")
+    args = parser.parse_args()
+
+    if args.mode == "logins":
+        result = bench_logins(args.count or 64, args.unbounded)
+    else:
+        result = bench_overhead(args.count or 2000)
+    print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+# -*- coding: utf-8 -*-
+"""
+Firebase senkronizasyon benchmark'ı - ağ ve kimlik bilgisi olmadan.
+
+Geçici bir veritabanına bekleyen randevular yazar ve firebase_sync'in gönderme
+yolunu süreç içi sahte Firestore (firestore_fake) üzerinde çalıştırır. RPC
+başına gecikme --latency-ms ile verilir; --batch-size 1 eski belge başına
+gidiş-dönüş davranışına karşılık gelir.
+
+Kullanım:
+    python bench_firebase_sync.py --count 5000 --latency-ms 20
+    python bench_firebase_sync.py --count 500 --batch-size 1
+    python bench_firebase_sync.py --mode pull --count 20000
+    python bench_firebase_sync.py --mode responsiveness --count 3000 --latency-ms 50
+    python bench_firebase_sync.py --mode collections --count 20000
+
+responsiveness modu, tam senkronizasyon sürerken aynı event loop üzerindeki
+başka bir isteğin gecikmesini ölçer; --blocking ile senkronizasyon eskisi gibi
+doğrudan async handler içinde çalıştırılır (karşılaştırma için).
+
+collections modu, büyük bir hesabın ilk senkronizasyonunu ölçer: tarifler,
+kalıplar, paketler ve danışanlar sync_engine ile sayfa sayfa ve eş zamanlı çekilir.
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+from database import Database
+import firebase_sync
+import firestore_fake
+import sync_engine
+
+
+def seed_appointments(db: Database, count: int):
+    """count adet needs_sync = 1 randevu ekle (tek transaction)."""
+    rows = [
+        (f"Danışan {i}", f"0555{i:07d}", f"2026-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+         f"{9 + i % 9:02d}:{(i % 4) * 15:02d}", "detoks,kilo", "", "pending")
+        for i in range(count)
+    ]
+    conn = db.connect()
+    try:
+        with conn:
+            conn.executemany("""
+                INSERT INTO appointments (client_name, phone, date, time, types, note, status, needs_sync)
+                VALUES (?, ?, ?, ?, ?, ?, ?, 1)
+            """, rows)
+    finally:
+        db.close()
+
+
+def bench_push(count: int, latency: float, batch_size: int, reject: int) -> dict:
+    """Bir gönderme çalıştırmasını ölç."""
+    workdir = tempfile.mkdtemp(prefix="detoks-bench-")
+    try:
+        db = Database(os.path.join(workdir, "bench.db"))
+        db.initialize()
+        seed_appointments(db, count)
+
+        client = firestore_fake.FakeFirestore(latency=latency)
+        if reject:
+            # Reddedilecek belgelerin id'leri önceden bilinsin diye ilk satırlara sabit id ver
+            conn = db.connect()
+            with conn:
+                conn.executemany(
+                    "UPDATE appointments SET firebase_id = ? WHERE id = ?",
+                    [(f"rejected-{i}", i) for i in range(1, reject + 1)]
+                )
+            db.close()
+            client.reject_documents(f"rejected-{i}" for i in range(1, reject + 1))
+
+        started = time.perf_counter()
+        result = firebase_sync.push_pending_appointments(db, client, "bench-dietitian", batch_size=batch_size)
+        elapsed = time.perf_counter() - started
+
+        return {
+            "mode": "push",
+            "count": count,
+            "batch_size": batch_size,
+            "latency_ms": latency * 1000,
+            "pushed": result["pushed"],
+            "failed": len(result["failed"]),
+            "batches": result["batches"],
+            "rpcs": client.stats["rpcs"],
+            "seconds": round(elapsed, 3),
+            "docs_per_second": round(result["pushed"] / elapsed, 1) if elapsed else None,
+            "remote_documents": len(client.dump("appointments")),
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def seed_remote(client, count: int, dietitian_id: str):
+    """Sahte Firestore'a count adet randevu belgesi yaz (500'lük batch'ler)."""
+    collection = client.collection("appointments")
+    for start in range(0, count, firestore_fake.MAX_BATCH_SIZE):
+        batch = client.batch()
+        for i in range(start, min(start + firestore_fake.MAX_BATCH_SIZE, count)):
+            # ASCII ad: sqlite3 ASCII olmayan str'lerin UTF-8 kopyasını nesnede önbelleğe alır,
+            # bu da sahte istemcinin verisini büyütüp bellek ölçümünü bozardı
+            batch.set(collection.document(), {
+                "clientName": f"Danisan {i}",
+                "phone": f"0555{i:07d}",
+                "date": f"2026-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+                "time": f"{9 + i % 9:02d}:{(i % 4) * 15:02d}",
+                "types": ["detoks", "kilo"],
+                "note": "",
+                "status": "pending",
+                "dietitianId": dietitian_id,
+                "updatedAt": firestore_fake.SERVER_TIMESTAMP,
+            })
+        batch.commit()
+
+
+def bench_pull(count: int, latency: float, chunk_size: int) -> dict:
+    """Bir çekme çalıştırmasını ölç (tracemalloc ile en yüksek bellek dahil)."""
+    workdir = tempfile.mkdtemp(prefix="detoks-bench-")
+    try:
+        db = Database(os.path.join(workdir, "bench.db"))
+        db.initialize()
+
+        client = firestore_fake.FakeFirestore()
+        seed_remote(client, count, "bench-dietitian")
+        client.latency = latency
+
+        # Sahte istemci sorgu sonucunu sıralamak için bellekte tutar; temel değeri ilk
+        # belge üretildiğinde al ki yalnızca aktarımın (ingest) ek belleği ölçülsün
+        baseline = {}
+        original_stream = firestore_fake.FakeQuery.stream
+
+        def measured_stream(query):
+            documents = original_stream(query)
+            first = next(documents, None)
+            baseline["bytes"] = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            if first is not None:
+                yield first
+                yield from documents
+
+        firestore_fake.FakeQuery.stream = measured_stream
+        tracemalloc.start()
+        try:
+            started = time.perf_counter()
+            result = firebase_sync.pull_remote_appointments(db, client, "bench-dietitian", chunk_size=chunk_size)
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+            firestore_fake.FakeQuery.stream = original_stream
+
+        conn = db.connect()
+        local = conn.execute("SELECT COUNT(*) FROM appointments").fetchone()[0]
+        db.close()
+
+        return {
+            "mode": "pull",
+            "count": count,
+            "chunk_size": chunk_size,
+            "pulled": result["pulled"],
+            "chunks": result["chunks"],
+            "local_rows": local,
+            "seconds": round(elapsed, 3),
+            "docs_per_second": round(result["pulled"] / elapsed, 1) if elapsed else None,
+            "ingest_peak_kb": round((peak - baseline["bytes"]) / 1024, 1),
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def seed_catalog(client, count: int, dietitian_id: str):
+    """Sahte Firestore'a count tarif, count/2 danışan, count/20 kalıp ve paket yaz."""
+    sizes = {
+        "recipes": count,
+        "clients": count // 2,
+        "dietTemplates": max(count // 20, 1),
+        "packages": max(count // 20, 1),
+    }
+
+    def document(collection: str, i: int) -> dict:
+        if collection == "recipes":
+            data = {"name": f"Tarif {i}", "meal_type": "ogle", "seasons": "yaz,kis",
+                    **{key: f"Porsiyon {i}" for key in ("bki_21_25", "bki_26_29", "bki_30_33", "bki_34_plus")}}
+        elif collection == "clients":
+            data = {"name": f"Danisan {i}", "phone": f"0555{i:07d}"}
+        elif collection == "dietTemplates":
+            data = {"name": f"Kalip {i}", "meals": [
+                {"time": f"{8 + n * 3:02d}:00", "meal_name": f"Ogun {n + 1}", "meal_type": "ogle"} for n in range(5)
+            ]}
+        else:
+            data = {"name": f"Paket {i}", "description": "", "list_count": 4, "days_per_list": 7}
+        data.update({"dietitianId": dietitian_id, "updatedAt": firestore_fake.SERVER_TIMESTAMP})
+        return data
+
+    for collection, size in sizes.items():
+        reference = client.collection(collection)
+        for start in range(0, size, firestore_fake.MAX_BATCH_SIZE):
+            batch = client.batch()
+            for i in range(start, min(start + firestore_fake.MAX_BATCH_SIZE, size)):
+                batch.set(reference.document(), document(collection, i))
+            batch.commit()
+    return sizes
+
+
+def bench_collections(count: int, latency: float, page_size: int) -> dict:
+    """Katalog koleksiyonlarının ilk çekilişini ölç (sayfa başına ek bellek dahil)."""
+    workdir = tempfile.mkdtemp(prefix="detoks-bench-")
+    try:
+        db_path = os.path.join(workdir, "bench.db")
+        Database(db_path).initialize()
+
+        client = firestore_fake.FakeFirestore()
+        sizes = seed_catalog(client, count, "bench-dietitian")
+        client.latency = latency
+
+        # Sahte istemci her sayfa sorgusunda eşleşen belgeleri bellekte sıralar; her
+        # sayfanın ilk belgesinde temel değeri yenile, sayfa işlenirken artışı kaydet.
+        # Koleksiyonlar eş zamanlı çekildiğinden değer en kötü durumda birkaç sayfanın toplamıdır
+        growth = []
+        baseline = {}
+        lock = threading.Lock()
+        original_stream = firestore_fake.FakeQuery.stream
+
+        def measured_stream(query):
+            documents = original_stream(query)
+            first = next(documents, None)
+            with lock:
+                current, peak = tracemalloc.get_traced_memory()
+                if "bytes" in baseline:
+                    growth.append(peak - baseline["bytes"])
+                baseline["bytes"] = current
+                tracemalloc.reset_peak()
+            if first is not None:
+                yield first
+                yield from documents
+
+        firestore_fake.FakeQuery.stream = measured_stream
+        tracemalloc.start()
+        try:
+            started = time.perf_counter()
+            result = sync_engine.pull_collections(client, "bench-dietitian", page_size=page_size,
+                                                  db_factory=lambda: Database(db_path))
+            elapsed = time.perf_counter() - started
+            growth.append(tracemalloc.get_traced_memory()[1] - baseline["bytes"])
+        finally:
+            tracemalloc.stop()
+            firestore_fake.FakeQuery.stream = original_stream
+
+        pulled = sum(item.get("pulled", 0) for item in result.values())
+        return {
+            "mode": "collections",
+            "count": count,
+            "page_size": page_size,
+            "remote_documents": sum(sizes.values()),
+            "pulled": pulled,
+            "collections": result,
+            "seconds": round(elapsed, 3),
+            "docs_per_second": round(pulled / elapsed, 1) if elapsed else None,
+            "ingest_peak_kb": round(max(growth) / 1024, 1),
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def bench_responsiveness(count: int, latency: float, blocking: bool) -> dict:
+    """Tam senkronizasyon sırasında /ping gecikmesini ölç (süreç içi ASGI)."""
+    import httpx
+    from fastapi import FastAPI
+
+    workdir = tempfile.mkdtemp(prefix="detoks-bench-")
+    original_get_sync_db = firebase_sync.get_sync_db
+    try:
+        db_path = os.path.join(workdir, "bench.db")
+        db = Database(db_path)
+        db.initialize()
+        seed_appointments(db, count)
+
+        client = firestore_fake.FakeFirestore()
+        seed_remote(client, count, "bench-dietitian")
+        client.latency = latency
+        client.write_latency = latency / 100
+        firebase_sync.set_firestore_client(client)
+        firebase_sync.get_sync_db = lambda: Database(db_path)
+
+        app = FastAPI()
+
+        @app.get("/ping")
+        async def ping():
+            return {"ok": True}
+
+        @app.post("/blocking-full")
+        async def blocking_full():
+            # Eski davranış: engelleyen çağrı doğrudan event loop üzerinde
+            return firebase_sync.full_sync("bench-dietitian")
+
+        app.include_router(firebase_sync.router)
+
+        async def run():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+                path = "/blocking-full" if blocking else "/api/sync/appointments/full"
+                started = time.perf_counter()
+                sync_task = asyncio.create_task(http.post(path, json={
+                    "collection": "appointments", "dietitianId": "bench-dietitian"
+                }))
+
+                # Her tur: bir /ping isteği + 10 ms uyku. Turun fazladan süresi,
+                # event loop'un o sırada ne kadar bekletildiğini gösterir
+                latencies = []
+                while not sync_task.done():
+                    sent = time.perf_counter()
+                    await http.get("/ping")
+                    await asyncio.sleep(0.01)
+                    latencies.append(time.perf_counter() - sent - 0.01)
+
+                response = await sync_task
+                return response, time.perf_counter() - started, latencies
+
+        response, elapsed, latencies = asyncio.run(run())
+        latencies.sort()
+        result = response.json()
+        return {
+            "mode": "responsiveness",
+            "blocking": blocking,
+            "count": count,
+            "latency_ms": latency * 1000,
+            "pushed": result.get("pushed"),
+            "pulled": result.get("pulled"),
+            "sync_seconds": round(elapsed, 3),
+            "pings": len(latencies),
+            "stall_p50_ms": round(latencies[len(latencies) // 2] * 1000, 2) if latencies else None,
+            "stall_max_ms": round(latencies[-1] * 1000, 2) if latencies else None,
+        }
+    finally:
+        firebase_sync.get_sync_db = original_get_sync_db
+        firebase_sync.set_firestore_client(None)
+        firebase_sync.shutdown_executor()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Firebase sync benchmark (sahte Firestore)")
+    parser.add_argument("--mode", choices=("push", "pull", "responsiveness", "collections"), default="push")
+    parser.add_argument("--count", type=int, default=5000)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="push: WriteBatch boyutu, pull/collections: transaction başına belge sayısı")
+    parser.add_argument("--reject", type=int, default=0,
+                        help="Kalıcı hata verecek belge sayısı (bölerek yeniden deneme yolu)")
+    parser.add_argument("--blocking", action="store_true",
+                        help="responsiveness: senkronizasyonu event loop üzerinde çalıştır")
+    args = parser.parse_args()
+
+    if args.mode == "responsiveness":
+        result = bench_responsiveness(args.count, args.latency_ms / 1000, args.blocking)
+    elif args.mode == "collections":
+        result = bench_collections(args.count, args.latency_ms / 1000,
+                                   args.batch_size or sync_engine.PAGE_SIZE)
+    elif args.mode == "pull":
+        result = bench_pull(args.count, args.latency_ms / 1000,
+                            args.batch_size or firebase_sync.PULL_CHUNK_SIZE)
+    else:
+        result = bench_push(args.count, args.latency_ms / 1000,
+                            args.batch_size or firebase_sync.PUSH_BATCH_SIZE, args.reject)
+    print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
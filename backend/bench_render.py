@@ -0,0 +1,409 @@
+# -*- coding: utf-8 -*-
+"""
+Çıktı oluşturucu benchmark'ı - PDFGenerator, DOCXGenerator ve DocumentGenerator.
+
+Gün sayısı, günlük öğün sayısı, öğün başına madde sayısı ve kapak sayfası
+açık/kapalı kombinasyonlarından sentetik programlar üretir; her kombinasyonu
+bellek tamponuna (BytesIO) ve diske çizer. Her durum ayrı bir süreçte
+çalışır (bir ısınma çizimi + --iterations ölçüm), böylece tepe RSS o duruma
+aittir ve önceki durumların belleği sonuca karışmaz.
+
+Ölçülenler: liste başına süre (ms), sayfa/saniye, tepe RSS (MB) ve çıktı
+boyutu. PDF sayfaları dosyadaki sayfa nesnelerinden sayılır; DOCX'te sayfa
+düzeni Word'e ait olduğundan sayfa sayısı mantıksaldır (sayfa sonu + 1).
+
+DocumentGenerator yalnızca dosya yoluna yazar ve kapak sayfası çizmez; bu
+yüzden yalnızca disk + kapaksız durumlarda ölçülür. docx2pdf dönüşümü
+(Word gerektirir) olmayan ortamlarda süre yalnızca DOCX'i kapsar, sonuçta
+"converted": false yazılır.
+
+Sonuç JSON'dur ve commit ile ayarları içerir; --compare ile önceki bir
+sonuçla durum bazında karşılaştırılır.
+
+Kullanım:
+    python bench_render.py --output render-before.json
+    python bench_render.py --backends pdf --days 1,7,30 --meals 5 --bullets 3,8
+    python bench_render.py --compare render-before.json --threshold 10
+"""
+import argparse
+import concurrent.futures
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BACKENDS = ("pdf", "docx", "document")
+TARGETS = ("memory", "disk")
+
+# Öğün düzeni; --meals ilk N öğünü kullanır
+MEAL_SLOTS = [
+    ("08:00", "Kahvaltı", "kahvalti"),
+    ("10:30", "Ara Öğün 1", "ara_ogun_1"),
+    ("12:30", "Öğle Yemeği", "ogle"),
+    ("15:30", "Ara Öğün 2", "ara_ogun_2"),
+    ("18:30", "Akşam Yemeği", "aksam"),
+    ("20:30", "Ara Öğün 3", "ara_ogun_3"),
+    ("21:30", "Özel İçecek", "ozel_icecek"),
+]
+
+ITEMS = [
+    "1 adet haşlanmış yumurta", "2 dilim tam buğday ekmeği", "5 adet zeytin", "1 kase yoğurt",
+    "100 g ızgara tavuk göğsü", "4 yemek kaşığı bulgur pilavı", "bol yeşillikli salata",
+    "1 tatlı kaşığı zeytinyağı", "1 adet orta boy elma", "2 adet ceviz", "1 bardak kefir",
+    "120 g fırında somon", "6 yemek kaşığı zeytinyağlı taze fasulye", "1 fincan yeşil çay",
+    "40 g beyaz peynir", "domates ve salatalık", "3 yemek kaşığı yulaf ezmesi", "1 su bardağı ayran",
+    "1 kase mercimek çorbası", "5 adet badem", "limonlu su", "1 dilim çavdar ekmeği",
+]
+
+PATIENT_INFO = {
+    'patient_name': 'Benchmark Hasta',
+    'weight': 82.5,
+    'height': 168.0,
+    'birth_year': 1988,
+    'end_date': '30 OCAK'
+}
+START_DATE = "1 OCAK"
+FOOTER_INFO = {"phone": "0555 000 00 00", "website": "example.com", "instagram": "detoks"}
+
+_PDF_PAGE = re.compile(rb"/Type\s*/Page\b")
+
+
+def parse_ints(text: str) -> list:
+    return [int(part) for part in text.split(",") if part.strip()]
+
+
+def parse_choices(text: str, choices: tuple, name: str) -> list:
+    values = [part.strip() for part in text.split(",") if part.strip()]
+    unknown = [value for value in values if value not in choices]
+    if unknown:
+        raise SystemExit(f"Bilinmeyen {name}: {', '.join(unknown)} (seçenekler: {', '.join(choices)})")
+    return values
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def synthetic_program(days: int, meals: int, bullets: int, seed: int) -> list:
+    """create_single_list çıktısı biçiminde sentetik program."""
+    rng = random.Random(seed)
+    slots = MEAL_SLOTS[:meals] if meals <= len(MEAL_SLOTS) else [
+        MEAL_SLOTS[index % len(MEAL_SLOTS)] for index in range(meals)
+    ]
+    program = []
+    for day in range(1, days + 1):
+        program.append({
+            "day": day,
+            "meals": [
+                {
+                    "time": meal_time,
+                    "meal_name": meal_name,
+                    "meal_type": meal_type,
+                    "recipe_text": ", ".join(rng.sample(ITEMS, bullets)),
+                }
+                for meal_time, meal_name, meal_type in slots
+            ],
+        })
+    return program
+
+
+def case_key(case: dict) -> str:
+    return (f"{case['backend']}/{case['target']}/d{case['days']}-m{case['meals']}-b{case['bullets']}"
+            f"-{'cover' if case['cover'] else 'nocover'}")
+
+
+def build_cases(backends: list, targets: list, days: list, meals: list, bullets: list, covers: list) -> list:
+    cases = []
+    for backend in backends:
+        for target in targets:
+            if backend == "document" and target == "memory":
+                continue
+            for cover in covers:
+                if backend == "document" and cover:
+                    continue
+                for day_count in days:
+                    for meal_count in meals:
+                        for bullet_count in bullets:
+                            cases.append({
+                                "backend": backend, "target": target, "days": day_count,
+                                "meals": meal_count, "bullets": bullet_count, "cover": cover,
+                            })
+    return cases
+
+
+# ==================== ÇOCUK SÜREÇ ====================
+
+def _peak_rss_mb() -> float:
+    """Sürecin şimdiye kadarki tepe RSS'i (resource yoksa None)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux KB, macOS bayt döndürür
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def count_pdf_pages(content: bytes) -> int:
+    return len(_PDF_PAGE.findall(content))
+
+
+def count_docx_pages(content: bytes) -> int:
+    """Mantıksal sayfa sayısı: açık sayfa sonları + 1."""
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        xml = archive.read("word/document.xml")
+    return xml.count(b'w:type="page"') + 1
+
+
+def _renderer(backend: str, workdir: str):
+    """Durumun çizim fonksiyonu: (program, hedef, kapak) -> (çıktı: BytesIO ya da yol, PDF yolu)."""
+    if backend == "pdf":
+        from pdf_generator import PDFGenerator
+        generator = PDFGenerator(footer_info=FOOTER_INFO)
+
+        def render(program, target, cover):
+            out = io.BytesIO() if target == "memory" else os.path.join(workdir, "bench.pdf")
+            generator.create_diet_pdf(
+                file_path=out, diet_program=program, template_name="bench", pool_type="bench",
+                bki_group="21_25", patient_info=PATIENT_INFO if cover else None, start_date=START_DATE
+            )
+            return out, None
+        return render
+
+    if backend == "docx":
+        from docx_generator import DOCXGenerator
+        generator = DOCXGenerator(footer_info=FOOTER_INFO)
+
+        def render(program, target, cover):
+            out = io.BytesIO() if target == "memory" else os.path.join(workdir, "bench.docx")
+            generator.create_diet_docx(
+                file_path=out, diet_program=program, patient_name=PATIENT_INFO['patient_name'],
+                start_date=START_DATE, template_name="bench", bki_group="21_25", excluded_foods="",
+                combination_code="", patient_info=PATIENT_INFO if cover else None
+            )
+            return out, None
+        return render
+
+    from document_generator import DocumentGenerator
+    generator = DocumentGenerator(footer_info=FOOTER_INFO)
+
+    def render(program, target, cover):
+        # Dönüşüm hatası stdout'a yazılır; JSON çıktısına karışmasın
+        with contextlib.redirect_stdout(io.StringIO()):
+            docx_path, pdf_path = generator.create_diet_document(
+                os.path.join(workdir, "bench"), program, "bench", "bench", "21_25"
+            )
+        return docx_path, pdf_path
+    return render
+
+
+def _read_output(out) -> bytes:
+    if isinstance(out, io.BytesIO):
+        return out.getvalue()
+    with open(out, "rb") as f:
+        return f.read()
+
+
+def run_case(case: dict, iterations: int, seed: int) -> dict:
+    """Bir durumu bu süreçte ölç (ayrı süreçte çağrılır)."""
+    workdir = tempfile.mkdtemp(prefix="detoks-render-")
+    try:
+        import_rss = _peak_rss_mb()
+        render = _renderer(case["backend"], workdir)
+        program = synthetic_program(case["days"], case["meals"], case["bullets"], seed)
+
+        # Isınma: font kaydı, stil şablonları ve modül içi önbellekler
+        started = time.perf_counter()
+        render(program, case["target"], case["cover"])
+        first_ms = (time.perf_counter() - started) * 1000
+
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            out, pdf_path = render(program, case["target"], case["cover"])
+            timings.append(time.perf_counter() - started)
+
+        content = _read_output(out)
+        converted = None
+        if case["backend"] == "pdf":
+            pages = count_pdf_pages(content)
+        elif case["backend"] == "docx":
+            pages = count_docx_pages(content)
+        else:
+            converted = pdf_path is not None
+            if converted:
+                pdf_content = _read_output(pdf_path)
+                pages = count_pdf_pages(pdf_content)
+                content += pdf_content
+            else:
+                pages = count_docx_pages(content)
+
+        timings.sort()
+        mean = sum(timings) / len(timings)
+        result = {
+            "ms_per_list": {
+                "mean": round(mean * 1000, 2),
+                "p50": round(timings[len(timings) // 2] * 1000, 2),
+                "min": round(timings[0] * 1000, 2),
+                "max": round(timings[-1] * 1000, 2),
+            },
+            "first_ms": round(first_ms, 2),
+            "pages": pages,
+            "pages_per_s": round(pages / mean, 1) if mean else None,
+            "output_bytes": len(content),
+            "peak_rss_mb": _peak_rss_mb(),
+            "import_rss_mb": import_rss,
+        }
+        if converted is not None:
+            result["converted"] = converted
+        return result
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+# ==================== RAPOR ====================
+
+def summarize(cases: list) -> dict:
+    """Arka uç (ve hedef) bazında özet."""
+    groups = {}
+    for case in cases:
+        if "error" in case:
+            continue
+        for key in (case["backend"], f"{case['backend']}/{case['target']}"):
+            groups.setdefault(key, []).append(case)
+
+    summary = {}
+    for key, members in sorted(groups.items()):
+        seconds = sum(case["ms_per_list"]["mean"] for case in members) / 1000
+        pages = sum(case["pages"] for case in members)
+        rss = [case["peak_rss_mb"] for case in members if case["peak_rss_mb"] is not None]
+        summary[key] = {
+            "cases": len(members),
+            "mean_ms_per_list": round(seconds * 1000 / len(members), 2),
+            "pages_per_s": round(pages / seconds, 1) if seconds else None,
+            "peak_rss_mb": max(rss) if rss else None,
+            "mean_output_bytes": round(sum(case["output_bytes"] for case in members) / len(members)),
+        }
+    return summary
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> dict:
+    """Durum bazında süre ve boyut farkı (yüzde); eşiği aşan yavaşlamalar ayrıca listelenir."""
+    previous = {case["key"]: case for case in baseline.get("cases", []) if "error" not in case}
+    changes = []
+    regressions = []
+    for case in report["cases"]:
+        before = previous.get(case["key"])
+        if before is None or "error" in case:
+            continue
+        old_ms, new_ms = before["ms_per_list"]["mean"], case["ms_per_list"]["mean"]
+        change = {
+            "key": case["key"],
+            "ms_per_list": [old_ms, new_ms],
+            "time_change_pct": round((new_ms - old_ms) / old_ms * 100, 1) if old_ms else None,
+            "size_change_pct": round((case["output_bytes"] - before["output_bytes"])
+                                     / before["output_bytes"] * 100, 1) if before["output_bytes"] else None,
+        }
+        changes.append(change)
+        if change["time_change_pct"] is not None and change["time_change_pct"] > threshold:
+            regressions.append(case["key"])
+    return {
+        "baseline_commit": baseline.get("commit"),
+        "threshold_pct": threshold,
+        "regressions": regressions,
+        "missing": sorted(set(previous) - {case["key"] for case in report["cases"]}),
+        "cases": changes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF/DOCX oluşturucu benchmark'ı")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help=f"Seçenekler: {', '.join(BACKENDS)}")
+    parser.add_argument("--targets", default=",".join(TARGETS), help=f"Seçenekler: {', '.join(TARGETS)}")
+    parser.add_argument("--days", default="1,7,30", help="Gün sayıları (1-30)")
+    parser.add_argument("--meals", default="3,6", help="Günlük öğün sayıları")
+    parser.add_argument("--bullets", default="3,8", help="Öğün başına madde sayıları")
+    parser.add_argument("--cover", choices=("both", "on", "off"), default="both", help="Kapak sayfası")
+    parser.add_argument("--iterations", type=int, default=3, help="Durum başına ölçüm (ısınma hariç)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="Sonucu ayrıca bu dosyaya yaz")
+    parser.add_argument("--compare", default=None, help="Karşılaştırılacak önceki sonuç dosyası")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="--compare: yavaşlama sayılacak yüzde (varsayılan 10)")
+    args = parser.parse_args()
+
+    days = parse_ints(args.days)
+    meals = parse_ints(args.meals)
+    bullets = parse_ints(args.bullets)
+    if not all(1 <= value <= 30 for value in days):
+        raise SystemExit("--days 1-30 aralığında olmalı")
+    if not all(value >= 1 for value in meals) or not all(1 <= value <= len(ITEMS) for value in bullets):
+        raise SystemExit(f"--meals en az 1, --bullets 1-{len(ITEMS)} aralığında olmalı")
+    if args.iterations < 1:
+        raise SystemExit("--iterations en az 1 olmalı")
+    covers = {"both": [True, False], "on": [True], "off": [False]}[args.cover]
+
+    cases = build_cases(
+        parse_choices(args.backends, BACKENDS, "arka uç"), parse_choices(args.targets, TARGETS, "hedef"),
+        days, meals, bullets, covers
+    )
+    if not cases:
+        raise SystemExit("Seçilen ayarlarla ölçülecek durum yok")
+
+    started = time.perf_counter()
+    results = []
+    # Her durum yeni bir süreçte: tepe RSS yalnızca o durumu yansıtır
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context, max_tasks_per_child=1) as pool:
+        for case in cases:
+            key = case_key(case)
+            print(f"  {key}", file=sys.stderr, flush=True)
+            try:
+                measured = pool.submit(run_case, case, args.iterations, args.seed).result()
+            except Exception as e:
+                measured = {"error": f"{type(e).__name__}: {e}"}
+            results.append({"key": key, **case, **measured})
+
+    report = {
+        "commit": git_commit(),
+        "config": {
+            "days": days, "meals": meals, "bullets": bullets, "cover": args.cover,
+            "iterations": args.iterations, "seed": args.seed,
+        },
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+        "backends": summarize(results),
+        "cases": results,
+    }
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            report["comparison"] = compare(report, json.load(f), args.threshold)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
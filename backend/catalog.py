@@ -0,0 +1,159 @@
+"""
+Tarif kataloğu modülü - diyet oluşturma için paket/öğün bazlı bellek içi indeks.
+"""
+import threading
+
+import db_watch
+
+DEFAULT_SEASONS = "yaz,kis"
+SEASONS = ("yaz", "kis")
+MEAL_TYPES = ("kahvalti", "ara_ogun_1", "ogle", "ara_ogun_2", "aksam", "ara_ogun_3", "ozel_icecek")
+BKI_COLUMNS = ("bki_21_25", "bki_26_29", "bki_30_33", "bki_34_plus")
+
+
+class CatalogEntry:
+    """İndekslenmiş tarif: satır verisi + önceden hesaplanmış filtre alanları."""
+
+    __slots__ = ("recipe", "seasons", "search_text")
+
+    def __init__(self, recipe: dict):
+        self.recipe = recipe
+        self.seasons = recipe_seasons(recipe)
+        self.search_text = recipe_search_text(recipe)
+
+
+def recipe_seasons(recipe: dict) -> frozenset:
+    """Tarifin sezonlarını küme olarak döndür (varsayılan: yaz,kis)."""
+    seasons = recipe.get('seasons') or DEFAULT_SEASONS
+    return frozenset(seasons.split(','))
+
+
+def recipe_search_text(recipe: dict) -> str:
+    """Yasaklı kelime araması için ad ve tüm BKİ içeriklerini birleştir."""
+    parts = [recipe.get('name') or '']
+    parts.extend(recipe.get(column) or '' for column in BKI_COLUMNS)
+    return " ".join(parts).lower()
+
+
+def normalize_keywords(exclude_keywords: list = None) -> list:
+    """Yasaklı kelimeleri küçük harfe çevir, boşları at."""
+    if not exclude_keywords:
+        return []
+    keywords = (keyword.lower().strip() for keyword in exclude_keywords)
+    return [keyword for keyword in keywords if keyword]
+
+
+def matches_diet_filters(seasons: frozenset, search_text: str,
+                         keywords: list, season_filter: str = None) -> bool:
+    """Tarif sezon ve yasaklı kelime filtrelerinden geçiyor mu."""
+    if season_filter and season_filter not in seasons:
+        return False
+    for keyword in keywords:
+        if keyword in search_text:
+            return False
+    return True
+
+
+# ==================== İNDEKS ====================
+
+_lock = threading.Lock()
+_packages = {}    # package_id -> {meal_type: [CatalogEntry, ...]}
+_generation = 0   # invalidate() her çağrıldığında artar
+_source = None    # (db_path, tablo sürümleri) indeksin kurulduğu veri
+
+
+def _invalidate_locked():
+    global _generation
+    _generation += 1
+    _packages.clear()
+
+
+def invalidate():
+    """İndeksi geçersiz kıl."""
+    with _lock:
+        _invalidate_locked()
+
+
+def _check_source(db):
+    """Tarif/paket tabloları değiştiyse (süreç içi veya dışı yazım) indeksi at."""
+    global _source
+    versions = db_watch.table_versions(db)
+    source = (
+        db.db_path,
+        versions.get('__epoch__'),
+        versions.get('recipes'),
+        versions.get('recipe_packages')
+    )
+    with _lock:
+        if source != _source:
+            _invalidate_locked()
+            _source = source
+
+
+def _load(db, package_id: int = None) -> dict:
+    """Tek sorguyla paket(ler)in tariflerini öğün tipine göre grupla."""
+    query = """
+        SELECT rp.package_id AS catalog_package_id, r.* FROM recipes r
+        INNER JOIN recipe_packages rp ON r.id = rp.recipe_id
+    """
+    params = []
+    if package_id is not None:
+        query += " WHERE rp.package_id = ?"
+        params.append(package_id)
+    query += " ORDER BY r.name"
+
+    conn = db.connect()
+    try:
+        rows = conn.execute(query, params).fetchall()
+    finally:
+        db.close()
+
+    index = {}
+    if package_id is not None:
+        index[package_id] = {}
+    for row in rows:
+        recipe = dict(row)
+        owner = recipe.pop('catalog_package_id')
+        index.setdefault(owner, {}).setdefault(recipe['meal_type'], []).append(CatalogEntry(recipe))
+    return index
+
+
+def get_package_index(db, package_id: int) -> dict:
+    """Paketin öğün tipi -> tarif listesi indeksini döndür (gerekirse yükle)."""
+    _check_source(db)
+    with _lock:
+        cached = _packages.get(package_id)
+        generation = _generation
+    if cached is not None:
+        return cached
+
+    loaded = _load(db, package_id)
+    with _lock:
+        # Yükleme sırasında bir yazım olduysa sonucu önbelleğe koyma
+        if generation == _generation:
+            _packages.update(loaded)
+    return loaded[package_id]
+
+
+def warm(db) -> int:
+    """Tüm paketlerin indeksini tek sorguda oluştur. İndekslenen kayıt sayısını döndür."""
+    _check_source(db)
+    with _lock:
+        generation = _generation
+
+    loaded = _load(db)
+    with _lock:
+        if generation == _generation:
+            _packages.update(loaded)
+    return sum(len(entries) for meals in loaded.values() for entries in meals.values())
+
+
+def recipes_for_diet(db, package_id: int, meal_type: str,
+                     exclude_keywords: list = None, season_filter: str = None) -> list:
+    """Database.get_recipes_for_diet_by_package ile aynı sonuç, ama bellekten."""
+    entries = get_package_index(db, package_id).get(meal_type, [])
+    keywords = normalize_keywords(exclude_keywords)
+    return [
+        entry.recipe for entry in entries
+        if matches_diet_filters(entry.seasons, entry.search_text, keywords, season_filter)
+    ]
@@ -0,0 +1,135 @@
+"""
+Yapılandırma deposu - settings tablosu ve config.json için tek, değişmez bellek görüntüsü.
+
+Sıcak yollar (diyet oluşturma, doküman ayarları) get_setting/get_season_config
+çağrılarını I/O yapmadan bu görüntüden okur. set_setting ve save_season_config
+görüntüyü hemen geçersiz kılar; başka süreçlerin düzenlemeleri PRAGMA
+data_version ve config.json mtime kontrolleriyle yakalanır.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from types import MappingProxyType
+
+import db_watch
+
+DEFAULT_SEASON_CONFIG = {
+    "summer_start": "04-01",  # MM-DD
+    "summer_end": "10-01"     # MM-DD
+}
+
+
+class ConfigSnapshot:
+    """Ayarlar ve sezon yapılandırmasının değişmez görüntüsü."""
+
+    __slots__ = ("settings", "season")
+
+    def __init__(self, settings: dict, season: dict):
+        self.settings = MappingProxyType(settings)
+        self.season = MappingProxyType(season)
+
+    def get(self, key: str, default: str = None) -> str:
+        """Ayar değerini döndür."""
+        return self.settings.get(key, default)
+
+
+def read_season_file(config_path: str) -> dict:
+    """config.json dosyasını varsayılanlarla birleştirerek oku."""
+    if os.path.exists(config_path):
+        try:
+            with open(config_path, "r", encoding="utf-8") as f:
+                return {**DEFAULT_SEASON_CONFIG, **json.load(f)}
+        except Exception:
+            pass
+    return dict(DEFAULT_SEASON_CONFIG)
+
+
+def _file_mtime(path: str):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class ConfigStore:
+    """Bir veritabanı + config.json çifti için görüntüyü tutar ve tazeler."""
+
+    def __init__(self, db_path: str, config_path: str,
+                 min_interval: float = db_watch.DEFAULT_MIN_INTERVAL):
+        self.db_path = db_path
+        self.config_path = config_path
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._db_token = None
+        self._config_mtime = None
+        self._mtime_checked_at = 0.0
+
+    def _read_settings(self) -> dict:
+        """settings tablosunu tek sorguda oku (tablo yoksa boş)."""
+        conn = sqlite3.connect(self.db_path, uri=True)
+        try:
+            return {key: value for key, value in conn.execute("SELECT key, value FROM settings")}
+        except sqlite3.OperationalError:
+            return {}
+        finally:
+            conn.close()
+
+    def _config_changed(self) -> bool:
+        """config.json mtime'ını en fazla min_interval'da bir kontrol et."""
+        now = time.monotonic()
+        if now - self._mtime_checked_at < self.min_interval:
+            return False
+        self._mtime_checked_at = now
+        return _file_mtime(self.config_path) != self._config_mtime
+
+    def snapshot(self) -> ConfigSnapshot:
+        """Güncel görüntüyü döndür, gerekiyorsa yeniden kur."""
+        token = db_watch.get_watcher(self.db_path).token()
+        with self._lock:
+            snapshot = self._snapshot
+            settings_stale = snapshot is None or token != self._db_token
+            config_stale = snapshot is None or self._config_changed()
+
+            if not settings_stale and not config_stale:
+                return snapshot
+
+            settings = self._read_settings() if settings_stale else dict(snapshot.settings)
+            if config_stale:
+                self._config_mtime = _file_mtime(self.config_path)
+                season = read_season_file(self.config_path)
+            else:
+                season = dict(snapshot.season)
+
+            self._snapshot = ConfigSnapshot(settings, season)
+            self._db_token = token
+            return self._snapshot
+
+    def invalidate(self):
+        """Görüntüyü at; bir sonraki okuma her iki kaynağı da yeniden okur."""
+        with self._lock:
+            self._snapshot = None
+
+
+_registry_lock = threading.Lock()
+_stores = {}
+
+
+def get_store(db_path: str, config_path: str) -> ConfigStore:
+    """Veritabanı yolu için paylaşılan depoyu döndür."""
+    with _registry_lock:
+        store = _stores.get(db_path)
+        if store is None or store.config_path != config_path:
+            store = ConfigStore(db_path, config_path)
+            _stores[db_path] = store
+        return store
+
+
+def invalidate_all():
+    """Tüm depoları geçersiz kıl (config.json yazıldıktan sonra)."""
+    with _registry_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        store.invalidate()
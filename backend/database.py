@@ -3,11 +3,21 @@ Veritabanı modülü - SQLite ile tarif ve ayar yönetimi.
 """
 import sqlite3
 import os
+import sys
 import json
+import itertools
+import pathlib
+import threading
+import unicodedata
 import bcrypt
+from contextlib import contextmanager
 from datetime import datetime
 from typing import Optional
 
+import catalog
+import config_store
+import db_watch
+
 
 def get_data_dir() -> str:
     """Data klasörü yolunu döndür."""
@@ -22,52 +32,314 @@ def get_config_path() -> str:
 
 
 def get_season_config() -> dict:
-    """Config dosyasını oku."""
-    config_path = get_config_path()
-    default_config = {
-        "summer_start": "04-01", # MM-DD
-        "summer_end": "10-01"    # MM-DD
-    }
-    
-    if os.path.exists(config_path):
-        try:
-            with open(config_path, "r", encoding="utf-8") as f:
-                return {**default_config, **json.load(f)}
-        except Exception:
-            pass
-            
-    return default_config
+    """Sezon yapılandırmasını bellek içi görüntüden döndür (config.json)."""
+    return dict(get_config_store().snapshot().season)
 
 def save_season_config(summer_start: str, summer_end: str):
     """Sezon tarihlerini kaydet."""
     config_path = get_config_path()
-    config = get_season_config()
+    config = config_store.read_season_file(config_path)
     config["summer_start"] = summer_start
     config["summer_end"] = summer_end
     
     with open(config_path, "w", encoding="utf-8") as f:
         json.dump(config, f, ensure_ascii=False, indent=2)
+    
+    config_store.invalidate_all()
+
+
+def get_config_store(db_path: str = None) -> config_store.ConfigStore:
+    """Veritabanı için paylaşılan yapılandırma deposunu döndür."""
+    return config_store.get_store(db_path or get_db_path(), get_config_path())
+
+
+# Sürüm sayacı tutulan katalog tabloları (bkz. Database._create_version_tracking)
+VERSIONED_TABLES = (
+    "recipes", "recipe_packages", "packages", "pools",
+    "diet_templates", "template_meals", "settings"
+)
+
+
+# Değişiklik günlüğüne yazılan tablolar ve satır anahtarları (bkz. Database._create_change_log)
+CHANGE_LOG_TABLES = {
+    "recipes": "id",
+    "recipe_packages": "id",
+    "diet_templates": "id",
+    "template_meals": "id",
+    "packages": "id",
+    "pools": "id",
+    "settings": "key",
+    "appointments": "id"
+}
+
+
+# Oturum token'larının ömrü (saniye); auth.TOKEN_TTL, iptal kayıtları bu kadar tutulur
+SESSION_TOKEN_TTL = 12 * 3600
 
 
+def username_key(username: str) -> str:
+    """Kullanıcı adının arama anahtarı: NFC, baştaki/sondaki boşluklar atılmış, küçük harf.
+    
+    I, İ ve ı harflerinin hepsi 'i' olur: str.lower() 'İ' harfini 'i' + U+0307
+    (birleşik nokta) yapar, Türkçe kurallar ise 'I' harfini 'ı' yapıp ASCII
+    klavyeyle yazılan 'ADMIN' girişini 'admin' kullanıcısından ayırırdı.
+    """
+    key = unicodedata.normalize("NFC", username.strip())
+    return key.replace("İ", "i").replace("I", "i").lower().replace("ı", "i")
+
+
+# Firestore koleksiyonlarından çekilen (firebase_id ile eşlenen) katalog tabloları
+SYNCED_CATALOG_TABLES = ("recipes", "diet_templates", "packages")
+
+
+# Senkronizasyon outbox'ına yazılan tablolar ve izlenen sütunları (bkz. Database._create_outbox).
+# Yalnızca push'un gönderdiği tablolar: okunmayan kayıtlar hiç silinmez ve birikir.
+# Sıra önemli: sütunun indeksi changed_mask içindeki bitidir; yeni sütunlar sona eklenmeli.
+OUTBOX_COLUMNS = {
+    "appointments": ("client_name", "phone", "date", "time", "types", "note", "status"),
+    "recipes": ("name", "meal_type", "pool_type", "seasons",
+                "bki_21_25", "bki_26_29", "bki_30_33", "bki_34_plus"),
+    "diet_templates": ("name",),
+    "packages": ("name", "description", "save_path", "list_count",
+                 "days_per_list", "weight_change_per_list")
+}
+
+
+# Outbox'ı push'un boşalttığı tablolar (firebase_sync.push_pending_appointments,
+# sync_engine.push_collection). Çekme yalnızca bunlarda gönderilmemiş yerel düzenlemeleri
+# korur; boşaltılmayan outbox kayıtları uzaktan güncellemeleri kalıcı olarak engellerdi.
+PUSHED_TABLES = tuple(OUTBOX_COLUMNS)
+
+
+def outbox_columns(table: str, mask: int) -> list:
+    """changed_mask değerini sütun adlarına çevir."""
+    return [column for bit, column in enumerate(OUTBOX_COLUMNS[table]) if mask & (1 << bit)]
+
+
+@contextmanager
+def outbox_paused(conn):
+    """Bu transaction'daki yazımlar outbox'a düşmesin (uzaktan çekilen veriler için).
+    
+    Duraklatma satırı aynı transaction içinde eklenip silinir; SQLite tek yazıcıya
+    izin verdiği için başka bağlantıların yazımları bundan etkilenmez.
+    """
+    conn.execute("INSERT OR IGNORE INTO sync_outbox_pause (id) VALUES (1)")
+    try:
+        yield conn
+    finally:
+        conn.execute("DELETE FROM sync_outbox_pause")
+
+
+@contextmanager
+def versions_batched(conn, tables: tuple):
+    """Bu transaction'daki yazımlar sürüm sayaçlarını satır başına değil, bir kez artırsın.
+    
+    Duraklatma satırı varken sürüm tetikleyicileri çalışmaz; çıkışta bir değişiklik
+    olduysa `tables` sayaçları birer kez artırılır (ETag'ler ve katalog indeksi tek
+    seferde tazelenir). Blokta yalnızca `tables` içindeki tablolara yazılmalı.
+    """
+    conn.execute("INSERT OR IGNORE INTO table_versions_pause (id) VALUES (1)")
+    before = conn.total_changes
+    try:
+        yield conn
+    finally:
+        changed = conn.total_changes != before
+        conn.execute("DELETE FROM table_versions_pause")
+        if changed:
+            conn.executemany(
+                "UPDATE table_versions SET version = version + 1 WHERE name = ?",
+                [(table,) for table in tables]
+            )
+
 
+# Bu sayıdan büyük içe aktarma parçaları değişiklik günlüğüne satır satır yazılmaz;
+# /api/changes imleçleri sıfırlanır (bkz. Database._import_recipe_chunk)
+IMPORT_LOG_LIMIT = 500
+
+# Projeksiyon (fields=) için izin verilen sütunlar
+RECIPE_COLUMNS = (
+    "id", "name", "meal_type", "pool_type", "seasons",
+    "bki_21_25", "bki_26_29", "bki_30_33", "bki_34_plus", "created_at"
+)
+# Toplu içe aktarımda yazılan sütunlar (id sqlite_sequence'ten türetilir)
+RECIPE_IMPORT_COLUMNS = (
+    "name", "meal_type", "pool_type", "seasons",
+    "bki_21_25", "bki_26_29", "bki_30_33", "bki_34_plus"
+)
+APPOINTMENT_COLUMNS = (
+    "id", "firebase_id", "client_name", "phone", "date", "time", "types",
+    "note", "status", "created_at", "synced_at", "needs_sync"
+)
+
+
+@contextmanager
+def change_log_paused(conn):
+    """Bu transaction'daki yazımlar değişiklik günlüğüne satır satır düşmesin.
+    
+    Blok günlüğü kendisi yazmalı (küme tabanlı INSERT ... SELECT) ya da
+    reset_change_cursors ile istemcileri tam yüklemeye göndermeli.
+    """
+    conn.execute("INSERT OR IGNORE INTO change_log_pause (id) VALUES (1)")
+    try:
+        yield conn
+    finally:
+        conn.execute("DELETE FROM change_log_pause")
+
+
+def reset_change_cursors(conn):
+    """Şu ana kadarki tüm /api/changes imleçleri tam yükleme (reset) alsın.
+    
+    Bir seq tüketilip floor o yapılır: güncel (since == son seq) ve budanmış
+    (boş günlük) imleçler dahil önceki her imleç floor'un gerisinde kalır.
+    """
+    marker = conn.execute(
+        "INSERT INTO change_log (table_name, row_key, op) VALUES ('__reset__', '', 'reset')"
+    ).lastrowid
+    conn.execute("DELETE FROM change_log WHERE seq = ?", (marker,))
+    conn.execute("UPDATE change_log_state SET floor = MAX(floor, ?) WHERE id = 1", (marker,))
+
+
+def _projection(fields: list, allowed: tuple, required: tuple) -> list:
+    """İstenen sütunları doğrula; sayfalama anahtarlarını her zaman ekle."""
+    if not fields:
+        return list(allowed)
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    columns = [column for column in required if column not in fields]
+    columns.extend(dict.fromkeys(fields))
+    return columns
+
+
+MEMORY_DB = ":memory:"
+
+# Ana veritabanı yerine kullanılacak yol ya da URI (testler, önizleme süreçleri)
+DB_PATH_ENV = "DETOKS_DB_PATH"
 
 
 def get_db_path() -> str:
-    """Ana veritabanı yolunu döndür."""
-    return os.path.join(get_data_dir(), "detoksbot.db")
+    """Ana veritabanı yolunu döndür.
+    
+    DETOKS_DB_PATH ayarlıysa o kullanılır; ':memory:' değeri süreç genelinde
+    paylaşılan tek bir bellek içi veritabanına karşılık gelir.
+    """
+    override = os.environ.get(DB_PATH_ENV)
+    if override == MEMORY_DB:
+        return memory_db_uri("detoksbot")
+    return override or os.path.join(get_data_dir(), "detoksbot.db")
+
+
+_memory_lock = threading.Lock()
+_memory_keepers = {}  # uri -> içeriği canlı tutan bağlantı
+_memory_ids = itertools.count(1)
+
+
+def memory_db_uri(name: str = None) -> str:
+    """Paylaşımlı önbellekli bellek içi veritabanı URI'si (ad verilmezse yeni ve özel)."""
+    if name is None:
+        name = f"detoksbot-{os.getpid()}-{next(_memory_ids)}"
+    return f"file:{name}?mode=memory&cache=shared"
+
+
+def snapshot_uri(path: str) -> str:
+    """Dosyayı salt okunur ve kilitsiz açan URI (mode=ro&immutable=1).
+    
+    immutable=1 ile SQLite dosyanın değişmeyeceğini varsayar: kilit almaz ve
+    başka bağlantıların yazımlarını görmez. Yalnızca write_snapshot ile yazılmış,
+    bir daha değiştirilmeyecek kopyalar için kullanılmalı.
+    """
+    return f"{pathlib.Path(os.path.abspath(path)).as_uri()}?mode=ro&immutable=1"
+
+
+def is_memory_db(db_path: str) -> bool:
+    """Yol ':memory:' ya da mode=memory URI'si mi."""
+    return db_path == MEMORY_DB or (db_path.startswith("file:") and "mode=memory" in db_path)
+
+
+def _keep_memory_db(uri: str):
+    """Bellek içi veritabanını, her metot bağlantısını kapatsa da yaşatacak bağlantıyı aç."""
+    with _memory_lock:
+        if uri not in _memory_keepers:
+            _memory_keepers[uri] = sqlite3.connect(uri, uri=True, check_same_thread=False)
+
+
+def release_memory_db(db_path: str):
+    """Bellek içi veritabanını bırak; son bağlantı kapanınca içeriği silinir."""
+    with _memory_lock:
+        conn = _memory_keepers.pop(db_path, None)
+    db_watch.forget(db_path)
+    if conn is not None:
+        conn.close()
+
+
+def _backup(source: str, target: str):
+    """source veritabanını target'a sayfa sayfa kopyala (sqlite3 backup API)."""
+    src = sqlite3.connect(source, uri=True)
+    try:
+        dst = sqlite3.connect(target, uri=True)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+    finally:
+        src.close()
 
 
 class Database:
     """SQLite veritabanı yönetim sınıfı."""
     
-    def __init__(self, db_path: str = None):
-        """Veritabanı bağlantısını başlat."""
+    def __init__(self, db_path: str = None, read_only: bool = False):
+        """Veritabanı bağlantısını başlat.
+        
+        Args:
+            db_path: Dosya yolu ya da SQLite URI'si ('file:...'). ':memory:' her
+                örnek için ayrı bir bellek içi veritabanı açar; bu veritabanı
+                release_memory_db çağrılana kadar yaşar.
+            read_only: Dosyayı salt okunur, kilitsiz anlık görüntü olarak aç
+                (bkz. snapshot_uri); yazımlar sqlite3.OperationalError verir.
+        """
         if db_path is None:
             db_path = get_db_path()
+        if db_path == MEMORY_DB:
+            db_path = memory_db_uri()
+        if read_only and not db_path.startswith("file:"):
+            db_path = snapshot_uri(db_path)
+        if is_memory_db(db_path):
+            _keep_memory_db(db_path)
         
         self.db_path = db_path
+        self.read_only = read_only
         self.conn = None
     
+    @classmethod
+    def open_snapshot(cls, path: str) -> "Database":
+        """write_snapshot ile yazılmış kopyayı salt okunur aç (oluşturma işçileri için)."""
+        return cls(path, read_only=True)
+    
+    @classmethod
+    def load_snapshot(cls, source: str = None) -> "Database":
+        """Kaynak veritabanını (varsayılan: ana veritabanı) özel bir bellek içi kopyaya yükle.
+        
+        Kopya sqlite3 backup API ile alınır; sonrasındaki okuma ve yazımlar kaynağı
+        kilitlemez, kaynaktaki değişiklikler de kopyaya yansımaz.
+        """
+        memory_db = cls(MEMORY_DB)
+        _backup(source or get_db_path(), memory_db.db_path)
+        return memory_db
+    
+    def write_snapshot(self, path: str) -> str:
+        """Veritabanının tutarlı bir kopyasını dosyaya yaz (backup API, ardından atomik rename).
+        
+        Açık bir immutable bağlantısı olan dosyanın üzerine yazılmamalı; her yeni
+        görüntü için yeni bir dosya adı kullanılmalı.
+        """
+        tmp_path = f"{path}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        _backup(self.db_path, tmp_path)
+        os.replace(tmp_path, path)
+        return path
+    
     def __enter__(self):
         """Context manager girişi - bağlantı aç."""
         self.connect()
@@ -78,23 +350,36 @@ class Database:
         self.close()
         return False
     
-    def connect(self):
-        """Veritabanına bağlan."""
-        self.conn = sqlite3.connect(self.db_path)
+    def connect(self, check_same_thread: bool = True):
+        """Veritabanına bağlan.
+        
+        Args:
+            check_same_thread: False ise bağlantı (sırayla) başka thread'lerde de kullanılabilir;
+                akış yanıtları satırları threadpool üzerinden okuduğu için gerekir.
+        """
+        self.conn = sqlite3.connect(self.db_path, uri=True, check_same_thread=check_same_thread)
         self.conn.row_factory = sqlite3.Row
         return self.conn
     
     def close(self):
         """Veritabanı bağlantısını kapat."""
         if self.conn:
+            wrote = self.conn.total_changes > 0
             self.conn.close()
             self.conn = None
+            if wrote:
+                # Bellek içi önbellekler (ayarlar, tarif indeksi) tazelensin
+                db_watch.notify_write(self.db_path)
     
     def initialize(self):
         """Veritabanı tablolarını oluştur."""
         conn = self.connect()
         cursor = conn.cursor()
         
+        # Yeni dosyalar boş sayfaları adım adım bırakabilsin (bkz. maintenance.compact_database);
+        # tabloları olan bir dosyada VACUUM yapılmadan etkisizdir
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        
         # Paketler tablosu (yeni sistem - havuzları değiştirir)
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS packages (
@@ -105,7 +390,8 @@ class Database:
                 list_count INTEGER NOT NULL DEFAULT 1,
                 days_per_list INTEGER NOT NULL DEFAULT 7,
                 weight_change_per_list REAL DEFAULT 0,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                firebase_id TEXT
             )
         """)
         
@@ -147,7 +433,8 @@ class Database:
                 bki_26_29 TEXT NOT NULL,
                 bki_30_33 TEXT NOT NULL,
                 bki_34_plus TEXT NOT NULL,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                firebase_id TEXT
             )
         """)
 
@@ -164,7 +451,8 @@ class Database:
             CREATE TABLE IF NOT EXISTS diet_templates (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 name TEXT NOT NULL,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                firebase_id TEXT
             )
         """)
         
@@ -220,7 +508,8 @@ class Database:
                 last_login DATETIME,
                 avatar_path TEXT,
                 security_question TEXT,
-                security_answer_hash TEXT
+                security_answer_hash TEXT,
+                username_key TEXT
             )
         """)
         
@@ -247,6 +536,38 @@ class Database:
             print("Migrating database: Adding security_answer_hash column...")
             cursor.execute("ALTER TABLE users ADD COLUMN security_answer_hash TEXT")
             conn.commit()
+
+        # İptal edilen oturum token'ları (auth.RevocationList'in kalıcı kopyası)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS revoked_sessions (
+                key TEXT PRIMARY KEY,       -- token jti veya 'user:<id>' (kullanıcının tüm token'ları)
+                issued_before REAL,         -- 'user:' satırları: bu andan önce verilen token'lar geçersiz
+                expires_at REAL NOT NULL    -- bu andan sonra satır silinebilir
+            )
+        """)
+        
+        # Migrasyon: indeksli, büyük/küçük harf duyarsız kullanıcı adı araması için username_key
+        try:
+            cursor.execute("SELECT username_key FROM users LIMIT 1")
+        except sqlite3.OperationalError:
+            print("Migrating database: Adding username_key column...")
+            cursor.execute("ALTER TABLE users ADD COLUMN username_key TEXT")
+            conn.commit()
+        
+        rows = cursor.execute("SELECT id, username FROM users WHERE username_key IS NULL").fetchall()
+        if rows:
+            cursor.executemany(
+                "UPDATE users SET username_key = ? WHERE id = ?",
+                [(username_key(row['username']), row['id']) for row in rows]
+            )
+            conn.commit()
+        
+        try:
+            cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_users_username_key ON users (username_key)")
+        except sqlite3.IntegrityError:
+            # Yalnızca harf büyüklüğüyle ayrışan eski kullanıcı adları: arama yine indeksli kalsın
+            print("Warning: usernames differing only in case; username_key index is not unique")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_username_key_lookup ON users (username_key)")
         
         # Migrasyon: appointments tablosuna firebase sync sütunları ekle
         # Her kolonu ayrı ayrı kontrol et (biri varsa diğerleri de var olabilir)
@@ -271,6 +592,55 @@ class Database:
             cursor.execute("ALTER TABLE appointments ADD COLUMN needs_sync INTEGER DEFAULT 1")
             conn.commit()
         
+        # firebase_id sonradan eklenen tablolarda UNIQUE değil; pull'daki UPSERT
+        # (ON CONFLICT(firebase_id)) için benzersiz indeks gerekli
+        try:
+            cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_appointments_firebase_id ON appointments (firebase_id)")
+        except sqlite3.IntegrityError:
+            print("Warning: duplicate firebase_id values in appointments; pull sync needs them resolved")
+        
+        # Danışanlar tablosu (Firestore clients koleksiyonunun yerel kopyası)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS clients (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                firebase_id TEXT UNIQUE,
+                name TEXT NOT NULL,
+                phone TEXT,
+                email TEXT,
+                notes TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME
+            )
+        """)
+        
+        # Migrasyon: Firestore'dan çekilen katalog tabloları için firebase_id sütunu
+        # (yeni tablolarda CREATE TABLE'da var; benzersiz indeks her durumda aşağıda)
+        for table in SYNCED_CATALOG_TABLES:
+            try:
+                cursor.execute(f"SELECT firebase_id FROM {table} LIMIT 1")
+            except sqlite3.OperationalError:
+                print(f"Migrating database: Adding firebase_id column to {table}...")
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN firebase_id TEXT")
+                conn.commit()
+            cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_firebase_id ON {table} (firebase_id)")
+        
+        # Sayfalama (keyset) ve tarih aralığı sorguları için indeksler
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_appointments_date_time_id ON appointments (date, time, id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_recipes_name_id ON recipes (name, id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_recipes_pool_name_id ON recipes (pool_type, name, id)")
+        
+        # Katalog tabloları için sürüm sayaçları (ETag / koşullu GET için)
+        self._create_version_tracking(cursor)
+        
+        # Ön yüz için değişiklik günlüğü (bootstrap + delta güncellemeler)
+        self._create_change_log(cursor)
+        
+        # Senkronizasyon için değişiklik yakalama (outbox)
+        self._create_outbox(cursor)
+        
+        # Senkronizasyon imleçleri ve çalıştırma geçmişi
+        self._create_sync_state(cursor)
+        
         # Varsayılan havuzları ekle
         self._add_default_pools(cursor)
         
@@ -284,12 +654,421 @@ class Database:
             cursor.execute("""
                 INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)
             """, (key, value))
+
+        # Migrasyon: oturum anahtarı eskiden settings'teydi ve ayar uçlarından dışarı
+        # verildi; satır silinir, auth yeni anahtarı veri klasöründeki dosyada üretir
+        # (sızmış anahtarla imzalanmış token'lar geçersiz olur)
+        cursor.execute("DELETE FROM settings WHERE key = 'session_secret'")
+
+        # Varsayılan kalıpları ekle; her kurulum aynı kalıpları Firestore'a ayrı belgeler
+        # olarak göndermesin (çekme, aynı adlı uzak kalıpları bunlara bağlar)
+        with outbox_paused(conn):
+            self._add_default_templates(cursor)
         
-        # Varsayılan kalıpları ekle
-        self._add_default_templates(cursor)
+        conn.commit()
+        self.close()
+    
+    def _create_version_tracking(self, cursor):
+        """Her katalog tablosu için tetikleyicilerle artan sürüm sayacı oluştur."""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS table_versions (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        
+        # Veritabanı kimliği: geri yüklenen bir dosyada sürümler tekrar etse de ETag'ler çakışmaz
+        cursor.execute("""
+            INSERT OR IGNORE INTO table_versions (name, version)
+            VALUES ('__epoch__', abs(random()) % 1000000000)
+        """)
+        
+        # Toplu işlemler sayaçları bir kez artırır (bkz. versions_batched)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS table_versions_pause (
+                id INTEGER PRIMARY KEY CHECK (id = 1)
+            )
+        """)
+        
+        for table in VERSIONED_TABLES:
+            cursor.execute("INSERT OR IGNORE INTO table_versions (name, version) VALUES (?, 0)", (table,))
+            for event in ("INSERT", "UPDATE", "DELETE"):
+                trigger = f"trg_{table}_version_{event.lower()}"
+                # Migrasyon: duraklatma koşulu olmayan eski tetikleyiciyi yeniden oluştur
+                cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (trigger,))
+                row = cursor.fetchone()
+                if row and "table_versions_pause" not in row[0]:
+                    cursor.execute(f"DROP TRIGGER {trigger}")
+                cursor.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS {trigger}
+                    AFTER {event} ON {table}
+                    WHEN NOT EXISTS (SELECT 1 FROM table_versions_pause)
+                    BEGIN
+                        UPDATE table_versions SET version = version + 1 WHERE name = '{table}';
+                    END
+                """)
+    
+    def _create_change_log(self, cursor):
+        """Ön yüz kataloğu için tetikleyicilerle tutulan değişiklik günlüğünü oluştur."""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS change_log (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name TEXT NOT NULL,
+                row_key TEXT NOT NULL,
+                op TEXT NOT NULL,
+                changed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_change_log_row ON change_log (table_name, row_key)
+        """)
+        
+        # Sıkıştırma ile silinen en yüksek seq; bunun gerisindeki imleçler tam yükleme yapmalı
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS change_log_state (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                floor INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        cursor.execute("INSERT OR IGNORE INTO change_log_state (id, floor) VALUES (1, 0)")
+        
+        # Toplu işlemler satır başına kayıt yerine günlüğü kendileri yazar (bkz. change_log_paused)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS change_log_pause (
+                id INTEGER PRIMARY KEY CHECK (id = 1)
+            )
+        """)
+        
+        added = False
+        for table, key_column in CHANGE_LOG_TABLES.items():
+            for event, op, row in (("INSERT", "upsert", "NEW"),
+                                   ("UPDATE", "upsert", "NEW"),
+                                   ("DELETE", "delete", "OLD")):
+                trigger = f"trg_{table}_changelog_{event.lower()}"
+                cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (trigger,))
+                existing = cursor.fetchone()
+                added = added or existing is None
+                # Migrasyon: duraklatma koşulu olmayan eski tetikleyiciyi yeniden oluştur
+                if existing and "change_log_pause" not in existing[0]:
+                    cursor.execute(f"DROP TRIGGER {trigger}")
+                cursor.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS {trigger}
+                    AFTER {event} ON {table}
+                    WHEN NOT EXISTS (SELECT 1 FROM change_log_pause)
+                    BEGIN
+                        INSERT INTO change_log (table_name, row_key, op)
+                        VALUES ('{table}', {row}.{key_column}, '{op}');
+                    END
+                """)
+        
+        # Migrasyon: günlüğe yeni eklenen tablolar (ör. recipe_packages, template_meals) için
+        # eski imleçler o tabloların değişikliklerini görmemiş olabilir; tam yükleme yapsınlar
+        if added:
+            reset_change_cursors(cursor)
+    
+    def _create_outbox(self, cursor):
+        """Firestore'a gönderilecek değişiklikler için tetikleyicilerle tutulan outbox'ı oluştur.
+        
+        Her kayıt: seq, tablo, satır id, işlem (insert/update/delete), değişen sütunlar
+        (OUTBOX_COLUMNS sırasıyla bit maskesi) ve silmelerde firebase_id. Aynı satır
+        için yeni bir kayıt eklendiğinde eskisi bununla birleştirilip silinir; böylece
+        satır başına en fazla bir bekleyen kayıt kalır. Tablo başına bekleyen sayısı
+        sync_outbox_state'te tutulur (O(1) okuma).
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sync_outbox'")
+        created = cursor.fetchone() is None
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sync_outbox (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name TEXT NOT NULL,
+                row_id INTEGER NOT NULL,
+                op TEXT NOT NULL,
+                changed_mask INTEGER NOT NULL DEFAULT 0,
+                firebase_id TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_sync_outbox_row ON sync_outbox (table_name, row_id)
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sync_outbox_state (
+                table_name TEXT PRIMARY KEY,
+                pending INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sync_outbox_pause (
+                id INTEGER PRIMARY KEY CHECK (id = 1)
+            )
+        """)
+        
+        if created:
+            # Eski sürümden: needs_sync ile işaretli randevular outbox'a taşınır
+            full_mask = (1 << len(OUTBOX_COLUMNS["appointments"])) - 1
+            cursor.execute(f"""
+                INSERT INTO sync_outbox (table_name, row_id, op, changed_mask, firebase_id)
+                SELECT 'appointments', id,
+                       CASE WHEN synced_at IS NULL THEN 'insert' ELSE 'update' END,
+                       {full_mask}, firebase_id
+                FROM appointments WHERE needs_sync = 1
+                ORDER BY id
+            """)
+            cursor.execute("DELETE FROM sync_outbox_state")
+            cursor.execute("""
+                INSERT INTO sync_outbox_state (table_name, pending)
+                SELECT table_name, COUNT(*) FROM sync_outbox GROUP BY table_name
+            """)
+        
+        # Bekleyen sayaçları
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_sync_outbox_count_insert
+            AFTER INSERT ON sync_outbox
+            BEGIN
+                INSERT INTO sync_outbox_state (table_name, pending) VALUES (NEW.table_name, 1)
+                ON CONFLICT(table_name) DO UPDATE SET pending = pending + 1;
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_sync_outbox_count_delete
+            AFTER DELETE ON sync_outbox
+            BEGIN
+                UPDATE sync_outbox_state SET pending = pending - 1 WHERE table_name = OLD.table_name;
+            END
+        """)
+        
+        # Sıkıştırma: yeni kayıt öncekiyle birleşir (insert + update = insert, * + delete = delete)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_sync_outbox_compact
+            AFTER INSERT ON sync_outbox
+            WHEN NEW.op != 'insert'
+            BEGIN
+                UPDATE sync_outbox SET
+                    op = CASE
+                        WHEN NEW.op = 'delete' THEN 'delete'
+                        WHEN EXISTS (
+                            SELECT 1 FROM sync_outbox
+                            WHERE table_name = NEW.table_name AND row_id = NEW.row_id
+                              AND seq < NEW.seq AND op = 'insert'
+                        ) THEN 'insert'
+                        ELSE NEW.op
+                    END,
+                    changed_mask = CASE
+                        WHEN NEW.op = 'delete' THEN 0
+                        ELSE NEW.changed_mask | COALESCE((
+                            SELECT MAX(changed_mask) FROM sync_outbox
+                            WHERE table_name = NEW.table_name AND row_id = NEW.row_id AND seq < NEW.seq
+                        ), 0)
+                    END,
+                    firebase_id = COALESCE(NEW.firebase_id, (
+                        SELECT MAX(firebase_id) FROM sync_outbox
+                        WHERE table_name = NEW.table_name AND row_id = NEW.row_id AND seq < NEW.seq
+                    ))
+                WHERE seq = NEW.seq;
+                
+                DELETE FROM sync_outbox
+                WHERE table_name = NEW.table_name AND row_id = NEW.row_id AND seq < NEW.seq;
+            END
+        """)
+        
+        # Migrasyon: eski sürümler katalog tablolarını da outbox'a yazıyordu; push bunları
+        # gönderip silmediği için tetikleyiciler kaldırılır, biriken kayıtlar temizlenir
+        cursor.execute("SELECT name, tbl_name FROM sqlite_master WHERE type = 'trigger'")
+        for name, table in cursor.fetchall():
+            stale = table not in OUTBOX_COLUMNS and name in (
+                f"trg_{table}_outbox_{event}" for event in ("insert", "update", "delete")
+            )
+            if stale:
+                cursor.execute(f"DROP TRIGGER {name}")
+        tracked = ", ".join(f"'{table}'" for table in OUTBOX_COLUMNS)
+        cursor.execute(f"DELETE FROM sync_outbox WHERE table_name NOT IN ({tracked})")
+        cursor.execute(f"DELETE FROM sync_outbox_state WHERE table_name NOT IN ({tracked})")
+        
+        paused = "NOT EXISTS (SELECT 1 FROM sync_outbox_pause)"
+        for table, columns in OUTBOX_COLUMNS.items():
+            full_mask = (1 << len(columns)) - 1
+            changed_mask = " | ".join(
+                f"(CASE WHEN OLD.{column} IS NOT NEW.{column} THEN {1 << bit} ELSE 0 END)"
+                for bit, column in enumerate(columns)
+            )
+            # Migrasyon: silmelerde firebase_id'yi yazmayan eski tetikleyicileri yeniden oluştur
+            for event in ("insert", "update", "delete"):
+                trigger = f"trg_{table}_outbox_{event}"
+                cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (trigger,))
+                row = cursor.fetchone()
+                if row and ".firebase_id" not in row[0]:
+                    cursor.execute(f"DROP TRIGGER {trigger}")
+            
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_outbox_insert
+                AFTER INSERT ON {table}
+                WHEN {paused}
+                BEGIN
+                    INSERT INTO sync_outbox (table_name, row_id, op, changed_mask, firebase_id)
+                    VALUES ('{table}', NEW.id, 'insert', {full_mask}, NEW.firebase_id);
+                END
+            """)
+            # Yalnızca izlenen sütunlar değiştiyse (firebase_id/synced_at gibi defter tutma hariç)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_outbox_update
+                AFTER UPDATE ON {table}
+                WHEN {paused} AND ({changed_mask}) != 0
+                BEGIN
+                    INSERT INTO sync_outbox (table_name, row_id, op, changed_mask, firebase_id)
+                    VALUES ('{table}', NEW.id, 'update', {changed_mask}, NEW.firebase_id);
+                END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_outbox_delete
+                AFTER DELETE ON {table}
+                WHEN {paused}
+                BEGIN
+                    INSERT INTO sync_outbox (table_name, row_id, op, changed_mask, firebase_id)
+                    VALUES ('{table}', OLD.id, 'delete', 0, OLD.firebase_id);
+                END
+            """)
+    
+        # Kalıp öğünleri kalıp belgesinin parçası: değişiklikleri kalıbı güncellenmiş sayar.
+        # Kalıp silinmişse kayıt eklenmez (yoksa bekleyen silmeyle birleşip onu ezerdi)
+        for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_template_meals_outbox_{event.lower()}
+                AFTER {event} ON template_meals
+                WHEN {paused} AND EXISTS (SELECT 1 FROM diet_templates WHERE id = {row}.template_id)
+                BEGIN
+                    INSERT INTO sync_outbox (table_name, row_id, op, changed_mask, firebase_id)
+                    SELECT 'diet_templates', id, 'update', 0, firebase_id
+                    FROM diet_templates WHERE id = {row}.template_id;
+                END
+            """)
+    
+    def _create_sync_state(self, cursor):
+        """Koleksiyon başına çekme imleçleri ve senkronizasyon çalıştırma geçmişi tabloları."""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sync_checkpoints (
+                collection TEXT PRIMARY KEY,
+                cursor TEXT,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                cursor_id TEXT
+            )
+        """)
+        
+        # Migrasyon: imleçteki son belgenin id'si (aynı updatedAt'li belgeler için eşitlik bozucu)
+        try:
+            cursor.execute("SELECT cursor_id FROM sync_checkpoints LIMIT 1")
+        except sqlite3.OperationalError:
+            print("Migrating database: Adding cursor_id column to sync_checkpoints...")
+            cursor.execute("ALTER TABLE sync_checkpoints ADD COLUMN cursor_id TEXT")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sync_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                trigger TEXT NOT NULL,
+                status TEXT NOT NULL,
+                started_at DATETIME NOT NULL,
+                finished_at DATETIME,
+                duration_ms INTEGER,
+                pushed INTEGER DEFAULT 0,
+                pulled INTEGER DEFAULT 0,
+                error TEXT
+            )
+        """)
+        
+        # Migrasyon: tek lastSync_appointments ayarı -> appointments imleci
+        cursor.execute("SELECT value FROM settings WHERE key = 'lastSync_appointments'")
+        row = cursor.fetchone()
+        if row is not None:
+            cursor.execute("""
+                INSERT OR IGNORE INTO sync_checkpoints (collection, cursor) VALUES ('appointments', ?)
+            """, (row[0],))
+            cursor.execute("DELETE FROM settings WHERE key = 'lastSync_appointments'")
+    
+    def get_sync_checkpoint(self, collection: str) -> Optional[str]:
+        """Koleksiyonun çekme imlecini getir (yoksa None)."""
+        conn = self.connect()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT cursor FROM sync_checkpoints WHERE collection = ?", (collection,))
+        row = cursor.fetchone()
+        
+        self.close()
+        return row['cursor'] if row else None
+    
+    def get_sync_cursor(self, collection: str) -> tuple:
+        """Koleksiyonun çekme imleci ve son uygulanan belgenin id'si: (cursor, cursor_id).
+        
+        İmleç yoksa (None, None); eski imleçlerde cursor_id None olabilir.
+        """
+        conn = self.connect()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT cursor, cursor_id FROM sync_checkpoints WHERE collection = ?", (collection,))
+        row = cursor.fetchone()
+        
+        self.close()
+        return (row['cursor'], row['cursor_id']) if row else (None, None)
+    
+    def get_sync_checkpoints(self) -> dict:
+        """Tüm koleksiyonların imleçleri: {koleksiyon: {"cursor", "updatedAt"}}."""
+        conn = self.connect()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT collection, cursor, updated_at FROM sync_checkpoints ORDER BY collection")
+        rows = cursor.fetchall()
+        
+        self.close()
+        return {row['collection']: {"cursor": row['cursor'], "updatedAt": row['updated_at']} for row in rows}
+    
+    def add_sync_run(self, run: dict, keep: int = 100) -> int:
+        """Bir senkronizasyon çalıştırmasını kaydet; en yeni `keep` kayıt tutulur."""
+        conn = self.connect()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            INSERT INTO sync_runs (trigger, status, started_at, finished_at, duration_ms, pushed, pulled, error)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (run['trigger'], run['status'], run['started_at'], run.get('finished_at'),
+              run.get('duration_ms'), run.get('pushed', 0), run.get('pulled', 0), run.get('error')))
+        run_id = cursor.lastrowid
+        
+        cursor.execute("DELETE FROM sync_runs WHERE id <= ?", (run_id - keep,))
         
         conn.commit()
         self.close()
+        return run_id
+    
+    def get_sync_runs(self, limit: int = 20) -> list:
+        """Son senkronizasyon çalıştırmaları (en yeni önce)."""
+        conn = self.connect()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT * FROM sync_runs ORDER BY id DESC LIMIT ?", (limit,))
+        rows = cursor.fetchall()
+        
+        self.close()
+        return [dict(row) for row in rows]
+    
+    def get_outbox_counts(self) -> dict:
+        """Tablo başına bekleyen outbox kaydı sayısı (sayaç tablosundan, tarama yok)."""
+        conn = self.connect()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT table_name, pending FROM sync_outbox_state")
+        rows = cursor.fetchall()
+        
+        self.close()
+        return {row['table_name']: row['pending'] for row in rows}
+    
+    def get_table_versions(self) -> dict:
+        """Katalog tablolarının güncel sürüm sayaçlarını getir."""
+        conn = self.connect()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT name, version FROM table_versions")
+        rows = cursor.fetchall()
+        
+        self.close()
+        return {row['name']: row['version'] for row in rows}
     
     def _add_default_pools(self, cursor):
         """Varsayılan havuzları ekle."""
@@ -429,6 +1208,162 @@ class Database:
         self.close()
         return [dict(row) for row in rows]
     
+    def iter_recipes(self, pool_type: str = None, after: tuple = None, limit: int = None,
+                     fields: list = None):
+        """Tarifleri (name, id) sırasıyla akış halinde getir (keyset sayfalama).
+        
+        Args:
+            after: Son görülen (name, id); yalnızca bundan sonraki satırlar döner
+            limit: En fazla satır sayısı
+            fields: Seçilecek sütunlar (RECIPE_COLUMNS içinden); None ise tümü
+        
+        Yields:
+            dict: Tarif satırı (name ve id sayfalama için her zaman bulunur)
+        """
+        columns = _projection(fields, RECIPE_COLUMNS, ("id", "name"))
+        query = f"SELECT {', '.join(columns)} FROM recipes WHERE 1=1"
+        params = []
+        
+        if pool_type:
+            query += " AND pool_type = ?"
+            params.append(pool_type)
+        
+        if after:
+            query += " AND (name, id) > (?, ?)"
+            params.extend(after)
+        
+        query += " ORDER BY name, id"
+        
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        
+        yield from self._iter_rows(query, params)
+    
+    def _iter_rows(self, query: str, params: list):
+        """Sorgu satırlarını tek tek sözlük olarak üret; bağlantı sonunda kapanır."""
+        conn = self.connect(check_same_thread=False)
+        try:
+            cursor = conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(500)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(row)
+        finally:
+            self.close()
+    
+    def iter_recipes_for_export(self, pool_type: str = None):
+        """Tarifleri id sırasıyla, paket id'leriyle birlikte akış halinde getir.
+        
+        Yields:
+            dict: Tarif satırı + "package_ids" ("1,3" biçiminde ya da None)
+        """
+        query = f"""
+            SELECT {', '.join('r.' + column for column in RECIPE_COLUMNS)},
+                   (SELECT group_concat(rp.package_id) FROM recipe_packages rp
+                    WHERE rp.recipe_id = r.id) AS package_ids
+            FROM recipes r
+        """
+        params = []
+        if pool_type:
+            query += " WHERE r.pool_type = ?"
+            params.append(pool_type)
+        query += " ORDER BY r.id"
+        yield from self._iter_rows(query, params)
+    
+    def import_recipes(self, recipes, chunk_size: int = 1000) -> dict:
+        """Tarifleri parçalar halinde toplu ekle; her parça tek transaction.
+        
+        Satırlar executemany ile yazılır; lastrowid satır başına alınamadığından
+        id'ler parçadan önceki sqlite_sequence değerinden türetilir (yazma kilidi
+        tutulduğu için aralık kesintisizdir) ve paket bağlantıları buna göre eklenir.
+        
+        Args:
+            recipes: Doğrulanmış tarif sözlükleri (RECIPE_IMPORT_COLUMNS ve isteğe
+                bağlı "package_ids"); tüketildikçe okunur, bellekte en fazla bir parça tutulur
+            chunk_size: Transaction başına tarif sayısı
+        
+        Returns:
+            {"inserted", "package_links", "first_id", "last_id"}
+        """
+        insert_sql = f"""
+            INSERT INTO recipes ({', '.join(RECIPE_IMPORT_COLUMNS)})
+            VALUES ({', '.join('?' * len(RECIPE_IMPORT_COLUMNS))})
+        """
+        result = {"inserted": 0, "package_links": 0, "first_id": None, "last_id": None}
+        conn = self.connect()
+        try:
+            chunk = []
+            for recipe in recipes:
+                chunk.append(recipe)
+                if len(chunk) >= chunk_size:
+                    self._import_recipe_chunk(conn, insert_sql, chunk, result)
+                    chunk = []
+            if chunk:
+                self._import_recipe_chunk(conn, insert_sql, chunk, result)
+        finally:
+            self.close()
+        return result
+    
+    @staticmethod
+    def _import_recipe_chunk(conn, insert_sql: str, chunk: list, result: dict):
+        """Bir parçayı yaz (BEGIN IMMEDIATE: id aralığı başka yazıcıyla karışmasın).
+        
+        Sürüm sayaçları parça başına bir kez artar; değişiklik günlüğüne satır
+        tetikleyicileri yerine tek INSERT ... SELECT yazılır. IMPORT_LOG_LIMIT'ten
+        büyük parçalar günlüğü şişirmek yerine imleçleri sıfırlar (istemciler tam yükler).
+        """
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            start = conn.execute("""
+                SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'recipes'), 0),
+                           COALESCE((SELECT MAX(id) FROM recipes), 0))
+            """).fetchone()[0]
+            with versions_batched(conn, ("recipes", "recipe_packages")), change_log_paused(conn):
+                conn.executemany(insert_sql, [
+                    tuple(recipe[column] for column in RECIPE_IMPORT_COLUMNS) for recipe in chunk
+                ])
+                end = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'recipes'").fetchone()[0]
+                if end - start != len(chunk):
+                    raise sqlite3.DatabaseError("Recipe ids of the imported chunk are not contiguous")
+                
+                links = [
+                    (start + offset, package_id)
+                    for offset, recipe in enumerate(chunk, 1)
+                    for package_id in recipe.get("package_ids") or ()
+                ]
+                if links:
+                    cursor = conn.executemany(
+                        "INSERT OR IGNORE INTO recipe_packages (recipe_id, package_id) VALUES (?, ?)", links
+                    )
+                    result["package_links"] += cursor.rowcount
+                
+                if len(chunk) > IMPORT_LOG_LIMIT:
+                    reset_change_cursors(conn)
+                else:
+                    conn.execute("""
+                        INSERT INTO change_log (table_name, row_key, op)
+                        SELECT 'recipes', id, 'upsert' FROM recipes WHERE id > ? AND id <= ?
+                        ORDER BY id
+                    """, (start, end))
+                    conn.execute("""
+                        INSERT INTO change_log (table_name, row_key, op)
+                        SELECT 'recipe_packages', id, 'upsert' FROM recipe_packages
+                        WHERE recipe_id > ? AND recipe_id <= ?
+                        ORDER BY id
+                    """, (start, end))
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        
+        result["inserted"] += len(chunk)
+        if result["first_id"] is None:
+            result["first_id"] = start + 1
+        result["last_id"] = end
+    
     def get_recipes_for_diet(self, pool_type: str, meal_type: str, exclude_keywords: list = None) -> list:
         """Diyet oluşturmak için tarifleri getir (hariç tutma filtresi ile)."""
         conn = self.connect()
@@ -462,15 +1397,8 @@ class Database:
     # ==================== AYAR İŞLEMLERİ ====================
     
     def get_setting(self, key: str, default: str = None) -> str:
-        """Ayar değerini getir."""
-        conn = self.connect()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT value FROM settings WHERE key = ?", (key,))
-        row = cursor.fetchone()
-        
-        self.close()
-        return row['value'] if row else default
+        """Ayar değerini getir (bellek içi görüntüden, I/O yapmadan)."""
+        return get_config_store(self.db_path).snapshot().get(key, default)
     
     def set_setting(self, key: str, value: str):
         """Ayar değerini kaydet."""
@@ -483,17 +1411,11 @@ class Database:
         
         conn.commit()
         self.close()
+        get_config_store(self.db_path).invalidate()
     
     def get_all_settings(self) -> dict:
         """Tüm ayarları getir."""
-        conn = self.connect()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT key, value FROM settings")
-        rows = cursor.fetchall()
-        
-        self.close()
-        return {row['key']: row['value'] for row in rows}
+        return dict(get_config_store(self.db_path).snapshot().settings)
     
     # ==================== DİYET KALIBI İŞLEMLERİ ====================
     
@@ -713,7 +1635,7 @@ class Database:
         self.close()
         
         # Tüm öğün türleri
-        all_meal_types = ["kahvalti", "ara_ogun_1", "ogle", "ara_ogun_2", "aksam", "ara_ogun_3", "ozel_icecek"]
+        all_meal_types = list(catalog.MEAL_TYPES)
         missing_types = [mt for mt in all_meal_types if mt not in meal_distribution]
         
         return {
@@ -722,53 +1644,95 @@ class Database:
             "missing_meal_types": missing_types
         }
     
+    @staticmethod
+    def _load_recipe_ids(cursor, recipe_ids: list):
+        """Tarif id'lerini geçici tabloya yaz (toplu işlemler tek SQL ifadesiyle join eder)."""
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS bulk_recipe_ids (id INTEGER PRIMARY KEY)")
+        cursor.execute("DELETE FROM bulk_recipe_ids")
+        cursor.executemany("INSERT OR IGNORE INTO bulk_recipe_ids (id) VALUES (?)",
+                           [(recipe_id,) for recipe_id in recipe_ids])
+    
     def copy_recipes_to_pool(self, recipe_ids: list, target_pool: str) -> int:
-        """Tarifleri başka havuza kopyala."""
+        """Tarifleri sezonları ve paket bağlantılarıyla birlikte başka havuza kopyala.
+        
+        Yeni id'ler eski id sırasıyla sqlite_sequence'ten sonra gelir; eşleme geçici
+        tabloda tutulur, böylece satırlar ve bağlantılar iki INSERT ... SELECT ile yazılır.
+        """
         conn = self.connect()
         cursor = conn.cursor()
-        
-        copied = 0
-        for recipe_id in recipe_ids:
-            cursor.execute("SELECT * FROM recipes WHERE id = ?", (recipe_id,))
-            row = cursor.fetchone()
-            if row:
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            self._load_recipe_ids(cursor, recipe_ids)
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS bulk_recipe_copies (old_id INTEGER PRIMARY KEY, new_id INTEGER)")
+            cursor.execute("DELETE FROM bulk_recipe_copies")
+            cursor.execute("""
+                INSERT INTO bulk_recipe_copies (old_id, new_id)
+                SELECT r.id,
+                       MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'recipes'), 0),
+                           COALESCE((SELECT MAX(id) FROM recipes), 0))
+                       + ROW_NUMBER() OVER (ORDER BY r.id)
+                FROM recipes r JOIN bulk_recipe_ids b ON b.id = r.id
+            """)
+            
+            columns = [column for column in RECIPE_IMPORT_COLUMNS if column != "pool_type"]
+            with versions_batched(conn, ("recipes", "recipe_packages")):
+                cursor.execute(f"""
+                    INSERT INTO recipes (id, pool_type, {', '.join(columns)})
+                    SELECT c.new_id, ?, {', '.join('r.' + column for column in columns)}
+                    FROM bulk_recipe_copies c JOIN recipes r ON r.id = c.old_id
+                    ORDER BY c.new_id
+                """, (target_pool,))
+                copied = cursor.rowcount
                 cursor.execute("""
-                    INSERT INTO recipes (name, meal_type, pool_type, bki_21_25, bki_26_29, bki_30_33, bki_34_plus)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (row["name"], row["meal_type"], target_pool, 
-                      row["bki_21_25"], row["bki_26_29"], row["bki_30_33"], row["bki_34_plus"]))
-                copied += 1
-        
-        conn.commit()
-        self.close()
+                    INSERT OR IGNORE INTO recipe_packages (recipe_id, package_id)
+                    SELECT c.new_id, rp.package_id
+                    FROM bulk_recipe_copies c JOIN recipe_packages rp ON rp.recipe_id = c.old_id
+                """)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self.close()
         return copied
     
     def move_recipes_to_pool(self, recipe_ids: list, target_pool: str) -> int:
-        """Tarifleri başka havuza taşı."""
+        """Tarifleri başka havuza taşı (zaten o havuzda olanlara dokunulmaz)."""
         conn = self.connect()
         cursor = conn.cursor()
-        
-        cursor.execute(f"""
-            UPDATE recipes SET pool_type = ? WHERE id IN ({','.join('?' * len(recipe_ids))})
-        """, [target_pool] + recipe_ids)
-        
-        moved = cursor.rowcount
-        conn.commit()
-        self.close()
+        try:
+            self._load_recipe_ids(cursor, recipe_ids)
+            with versions_batched(conn, ("recipes",)):
+                cursor.execute("""
+                    UPDATE recipes SET pool_type = ?
+                    WHERE id IN (SELECT id FROM bulk_recipe_ids) AND pool_type IS NOT ?
+                """, (target_pool, target_pool))
+                moved = cursor.rowcount
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self.close()
         return moved
     
     def bulk_delete_recipes(self, recipe_ids: list) -> int:
-        """Toplu tarif silme."""
+        """Toplu tarif silme (paket bağlantılarıyla birlikte)."""
         conn = self.connect()
         cursor = conn.cursor()
-        
-        cursor.execute(f"""
-            DELETE FROM recipes WHERE id IN ({','.join('?' * len(recipe_ids))})
-        """, recipe_ids)
-        
-        deleted = cursor.rowcount
-        conn.commit()
-        self.close()
+        try:
+            self._load_recipe_ids(cursor, recipe_ids)
+            with versions_batched(conn, ("recipes", "recipe_packages")):
+                # foreign_keys kapalı: ON DELETE CASCADE çalışmaz, bağlantılar elle silinir
+                cursor.execute("DELETE FROM recipe_packages WHERE recipe_id IN (SELECT id FROM bulk_recipe_ids)")
+                cursor.execute("DELETE FROM recipes WHERE id IN (SELECT id FROM bulk_recipe_ids)")
+                deleted = cursor.rowcount
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self.close()
         return deleted
     
     # ==================== KULLANICI İŞLEMLERİ ====================
@@ -792,14 +1756,16 @@ class Database:
         # Şifreyi hashle
         password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
         
-        cursor.execute("""
-            INSERT INTO users (username, password_hash, display_name, role)
-            VALUES (?, ?, ?, ?)
-        """, (username, password_hash, display_name or username, role))
-        
-        user_id = cursor.lastrowid
-        conn.commit()
-        self.close()
+        try:
+            cursor.execute("""
+                INSERT INTO users (username, username_key, password_hash, display_name, role)
+                VALUES (?, ?, ?, ?, ?)
+            """, (username, username_key(username), password_hash, display_name or username, role))
+            
+            user_id = cursor.lastrowid
+            conn.commit()
+        finally:
+            self.close()
         return user_id
     
     def verify_user(self, username: str, password: str) -> Optional[dict]:
@@ -807,8 +1773,7 @@ class Database:
         conn = self.connect()
         cursor = conn.cursor()
         
-        cursor.execute("SELECT * FROM users WHERE username = ? AND is_active = 1", (username,))
-        row = cursor.fetchone()
+        row = self._find_user(cursor, username, active_only=True)
         
         if not row:
             self.close()
@@ -826,6 +1791,32 @@ class Database:
         self.close()
         return None
     
+    def add_session_revocation(self, key: str, issued_before: Optional[float], expires_at: float):
+        """Oturum token'ı (veya kullanıcının tüm token'ları) için iptal kaydı ekle."""
+        conn = self.connect()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            INSERT OR REPLACE INTO revoked_sessions (key, issued_before, expires_at)
+            VALUES (?, ?, ?)
+        """, (key, issued_before, expires_at))
+        
+        conn.commit()
+        self.close()
+    
+    def get_session_revocations(self) -> list:
+        """Süresi dolmamış iptal kayıtları (dolanlar silinir)."""
+        conn = self.connect()
+        cursor = conn.cursor()
+        
+        cursor.execute("DELETE FROM revoked_sessions WHERE expires_at <= ?", (datetime.now().timestamp(),))
+        cursor.execute("SELECT key, issued_before, expires_at FROM revoked_sessions")
+        rows = cursor.fetchall()
+        
+        conn.commit()
+        self.close()
+        return [dict(row) for row in rows]
+    
     def get_user(self, user_id: int) -> Optional[dict]:
         """Kullanıcı bilgilerini getir."""
         conn = self.connect()
@@ -837,30 +1828,23 @@ class Database:
         self.close()
         return dict(row) if row else None
     
+    def _find_user(self, cursor, username: str, active_only: bool = False):
+        """username_key indeksiyle kullanıcı satırını bul; birebir eşleşen ad öncelikli."""
+        sql = "SELECT * FROM users WHERE username_key = ?"
+        if active_only:
+            sql += " AND is_active = 1"
+        sql += " ORDER BY username = ? DESC, id LIMIT 1"
+        cursor.execute(sql, (username_key(username), username))
+        return cursor.fetchone()
+    
     def get_user_by_username(self, username: str) -> Optional[dict]:
-        """Kullanıcı adına göre kullanıcı bilgilerini getir."""
+        """Kullanıcı adına göre kullanıcı bilgilerini getir (büyük/küçük harf duyarsız)."""
         conn = self.connect()
-        cursor = conn.cursor()
-        
-        # Windows cp1252 encoding hatasını önlemek için tüm kullanıcıları çekip Python'da filtrele
         try:
-            cursor.execute("SELECT * FROM users")
-            rows = cursor.fetchall()
+            row = self._find_user(conn.cursor(), username)
         finally:
             self.close()
-        
-        # Exact match
-        for row in rows:
-            if row['username'] == username:
-                return dict(row)
-                
-        # Case insensitive match
-        target_lower = username.lower()
-        for row in rows:
-            if row['username'].lower() == target_lower:
-                return dict(row)
-                
-        return None
+        return dict(row) if row else None
     
     def get_all_users(self) -> list:
         """Tüm kullanıcıları getir."""
@@ -874,14 +1858,24 @@ class Database:
         return [dict(row) for row in rows]
     
     def delete_user(self, user_id: int):
-        """Kullanıcı sil."""
+        """Kullanıcı sil; verilmiş tüm oturum token'ları da iptal edilir."""
         conn = self.connect()
         cursor = conn.cursor()
         
+        now = datetime.now().timestamp()
         cursor.execute("DELETE FROM users WHERE id = ?", (user_id,))
+        cursor.execute("""
+            INSERT OR REPLACE INTO revoked_sessions (key, issued_before, expires_at)
+            VALUES (?, ?, ?)
+        """, (f"user:{user_id}", now, now + SESSION_TOKEN_TTL))
         
         conn.commit()
         self.close()
+        
+        # Token doğrulaması veritabanını okumaz: süreçteki iptal listesi de güncellenmeli
+        auth = sys.modules.get("auth")
+        if auth is not None:
+            auth.revocations.revoke_user(user_id, cutoff=now, persist=False)
     
     def update_user_profile(self, user_id: int, username: str = None, password: str = None, avatar_path: str = None, security_question: str = None, security_answer: str = None) -> bool:
         """Kullanıcı profil bilgilerini güncelle."""
@@ -894,6 +1888,8 @@ class Database:
         if username:
             fields.append("username = ?")
             values.append(username)
+            fields.append("username_key = ?")
+            values.append(username_key(username))
             # Eğer kullanıcı adı değişiyorsa display_name'i de güncelle (isteğe bağlı)
             fields.append("display_name = ?")
             values.append(username)
@@ -938,8 +1934,7 @@ class Database:
         conn = self.connect()
         cursor = conn.cursor()
         
-        cursor.execute("SELECT id, security_answer_hash FROM users WHERE username = ?", (username,))
-        row = cursor.fetchone()
+        row = self._find_user(cursor, username)
         
         if not row or not row['security_answer_hash']:
             self.close()
@@ -1076,21 +2071,115 @@ class Database:
     # ==================== TARİF-PAKET İLİŞKİ İŞLEMLERİ ====================
     
     def add_recipe_to_packages(self, recipe_id: int, package_ids: list):
-        """Tarifi belirtilen paketlere ekle."""
-        conn = self.connect()
-        cursor = conn.cursor()
+        """Tarifin paketlerini package_ids olarak ayarla (yalnızca fark yazılır)."""
+        return self.set_recipe_package_memberships({recipe_id: package_ids}, by="recipe")
+    
+    def set_recipe_package_memberships(self, memberships: dict, by: str = "package") -> dict:
+        """Tarif-paket üyeliklerini istenen kümelere eşitle (tek transaction).
         
-        # Önce mevcut ilişkileri sil
-        cursor.execute("DELETE FROM recipe_packages WHERE recipe_id = ?", (recipe_id,))
+        İstenen çiftler geçici tabloya yazılır; eklenecek ve silinecek çiftler
+        recipe_packages ile join edilerek SQL'de bulunur ve executemany ile
+        uygulanır. Sürüm sayacı işlem başına bir kez artar.
+        
+        Args:
+            memberships: by="package" ise {paket id: [tarif id, ...]},
+                by="recipe" ise {tarif id: [paket id, ...]}; yalnızca anahtarlardaki
+                paketlerin (ya da tariflerin) üyelikleri değişir
+            by: "package" veya "recipe"
+        
+        Returns:
+            {"added": n, "removed": n, "unchanged": n}
+        
+        Raises:
+            ValueError: Geçersiz `by` ya da var olmayan tarif/paket id'leri
+        """
+        if by not in ("package", "recipe"):
+            raise ValueError(f"Unknown membership key: {by}")
+        scope_column = f"{by}_id"
+        pairs = []
+        for key, members in memberships.items():
+            for member in dict.fromkeys(members):
+                pairs.append((key, member) if by == "package" else (member, key))
         
-        # Yeni ilişkileri ekle
-        for package_id in package_ids:
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS membership_scope (id INTEGER PRIMARY KEY)")
+            cursor.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS membership_desired (
+                    package_id INTEGER NOT NULL,
+                    recipe_id INTEGER NOT NULL,
+                    PRIMARY KEY (package_id, recipe_id)
+                )
+            """)
+            cursor.execute("DELETE FROM membership_scope")
+            cursor.execute("DELETE FROM membership_desired")
+            cursor.executemany("INSERT INTO membership_scope (id) VALUES (?)",
+                               [(key,) for key in memberships])
+            cursor.executemany("INSERT OR IGNORE INTO membership_desired (package_id, recipe_id) VALUES (?, ?)",
+                               pairs)
+            
+            # Var olmayan id'ler: sessizce sahipsiz bağlantı oluşturmak yerine reddet
+            cursor.execute("""
+                SELECT DISTINCT package_id FROM (
+                    SELECT package_id FROM membership_desired
+                    UNION ALL
+                    SELECT id FROM membership_scope WHERE ? = 'package'
+                ) WHERE package_id NOT IN (SELECT id FROM packages)
+            """, (by,))
+            missing_packages = [row[0] for row in cursor.fetchall()]
+            cursor.execute("""
+                SELECT DISTINCT recipe_id FROM (
+                    SELECT recipe_id FROM membership_desired
+                    UNION ALL
+                    SELECT id FROM membership_scope WHERE ? = 'recipe'
+                ) WHERE recipe_id NOT IN (SELECT id FROM recipes)
+            """, (by,))
+            missing_recipes = [row[0] for row in cursor.fetchall()]
+            if missing_packages or missing_recipes:
+                conn.rollback()
+                details = []
+                if missing_packages:
+                    details.append(f"unknown package ids: {sorted(missing_packages)}")
+                if missing_recipes:
+                    details.append(f"unknown recipe ids: {sorted(missing_recipes)}")
+                raise ValueError("; ".join(details))
+            
             cursor.execute("""
-                INSERT OR IGNORE INTO recipe_packages (recipe_id, package_id) VALUES (?, ?)
-            """, (recipe_id, package_id))
+                SELECT d.recipe_id, d.package_id FROM membership_desired d
+                LEFT JOIN recipe_packages rp
+                    ON rp.recipe_id = d.recipe_id AND rp.package_id = d.package_id
+                WHERE rp.id IS NULL
+            """)
+            to_add = cursor.fetchall()
+            cursor.execute(f"""
+                SELECT rp.id FROM recipe_packages rp
+                JOIN membership_scope s ON s.id = rp.{scope_column}
+                LEFT JOIN membership_desired d
+                    ON d.recipe_id = rp.recipe_id AND d.package_id = rp.package_id
+                WHERE d.recipe_id IS NULL
+            """)
+            to_remove = cursor.fetchall()
+            
+            with versions_batched(conn, ("recipe_packages",)):
+                cursor.executemany("DELETE FROM recipe_packages WHERE id = ?",
+                                   [tuple(row) for row in to_remove])
+                cursor.executemany("INSERT INTO recipe_packages (recipe_id, package_id) VALUES (?, ?)",
+                                   [tuple(row) for row in to_add])
+            cursor.execute("DELETE FROM membership_scope")
+            cursor.execute("DELETE FROM membership_desired")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self.close()
         
-        conn.commit()
-        self.close()
+        return {
+            "added": len(to_add),
+            "removed": len(to_remove),
+            "unchanged": len(pairs) - len(to_add)
+        }
     
     def remove_recipe_from_package(self, recipe_id: int, package_id: int):
         """Tarifi paketten çıkar."""
@@ -1149,42 +2238,18 @@ class Database:
                                          season_filter: str = None) -> list:
         """Diyet oluşturmak için pakete ait tarifleri getir (hariç tutma filtresi ile)."""
         recipes = self.get_recipes_by_package(package_id, meal_type)
-        
-        filtered_recipes = []
-        for recipe in recipes:
-            # 1. Mevsim Filtresi
-            if season_filter:
-                # Tarifin sezon bilgisi (varsayılan: yaz,kis)
-                # Not: DB'den gelen row objesi olduğu için dict gibi davranmayabilir ama row_factory=Row
-                recipe_seasons = recipe['seasons'] if 'seasons' in recipe.keys() else 'yaz,kis'
-                if recipe_seasons is None: recipe_seasons = 'yaz,kis'
-                
-                # Eğer aranan mevsim tarifin sezonlarında yoksa atla
-                if season_filter not in recipe_seasons.split(','):
-                    continue
-                    
-            # 2. Yasaklı Kelime Filtresi
-            exclude = False
-            if exclude_keywords:
-                for keyword in exclude_keywords:
-                    keyword_lower = keyword.lower().strip()
-                    if keyword_lower:
-                        # Tüm BKİ içeriklerinde ara
-                        all_content = " ".join([
-                            recipe.get('name', '').lower(),
-                            recipe.get('bki_21_25', '').lower(),
-                            recipe.get('bki_26_29', '').lower(),
-                            recipe.get('bki_30_33', '').lower(),
-                            recipe.get('bki_34_plus', '').lower()
-                        ])
-                        if keyword_lower in all_content:
-                            exclude = True
-                            break
-            
-            if not exclude:
-                filtered_recipes.append(recipe)
-        
-        return filtered_recipes
+        keywords = catalog.normalize_keywords(exclude_keywords)
+        
+        # Mevsim ve yasaklı kelime filtresi (tüm BKİ içeriklerinde aranır)
+        return [
+            recipe for recipe in recipes
+            if catalog.matches_diet_filters(
+                catalog.recipe_seasons(recipe),
+                catalog.recipe_search_text(recipe),
+                keywords,
+                season_filter
+            )
+        ]
 
     # --- Appointment Methods ---
     
@@ -1270,6 +2335,49 @@ class Database:
         
         return result
     
+    def iter_appointments(self, date: str = None, date_from: str = None, date_to: str = None,
+                          after: tuple = None, limit: int = None, fields: list = None):
+        """Randevuları (date, time, id) sırasıyla akış halinde getir (keyset sayfalama).
+        
+        Args:
+            date: Tek gün filtresi
+            date_from, date_to: Tarih aralığı (dahil)
+            after: Son görülen (date, time, id); yalnızca bundan sonraki satırlar döner
+            limit: En fazla satır sayısı
+            fields: Seçilecek sütunlar (APPOINTMENT_COLUMNS içinden); None ise tümü
+        
+        Yields:
+            dict: Randevu satırı (types listeye açılmış; date, time, id her zaman bulunur)
+        """
+        columns = _projection(fields, APPOINTMENT_COLUMNS, ("id", "date", "time"))
+        query = f"SELECT {', '.join(columns)} FROM appointments WHERE 1=1"
+        params = []
+        
+        if date:
+            query += " AND date = ?"
+            params.append(date)
+        if date_from:
+            query += " AND date >= ?"
+            params.append(date_from)
+        if date_to:
+            query += " AND date <= ?"
+            params.append(date_to)
+        
+        if after:
+            query += " AND (date, time, id) > (?, ?, ?)"
+            params.extend(after)
+        
+        query += " ORDER BY date, time, id"
+        
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        
+        for appointment in self._iter_rows(query, params):
+            if 'types' in appointment:
+                appointment['types'] = appointment['types'].split(',') if appointment['types'] else []
+            yield appointment
+    
     def update_appointment_status(self, appointment_id: int, status: str):
         """Randevu durumunu güncelle."""
         conn = self.connect()
@@ -1279,3 +2387,155 @@ class Database:
         
         conn.commit()
         self.close()
+
+    # ==================== KATALOG AKIŞI (BOOTSTRAP / DELTA) ====================
+    
+    # Tablo -> (sorgu, sıralama); bootstrap ve delta aynı satır biçimini döndürür
+    _FEED_QUERIES = {
+        "recipes": ("SELECT * FROM recipes", "name"),
+        "recipe_packages": ("SELECT * FROM recipe_packages", "id"),
+        "diet_templates": ("SELECT * FROM diet_templates", "name"),
+        "template_meals": ("SELECT * FROM template_meals", "template_id, sort_order"),
+        "packages": ("SELECT * FROM packages", "name"),
+        "pools": ("SELECT * FROM pools", "sort_order"),
+        "settings": ("SELECT key, value FROM settings", "key"),
+        "appointments": ("SELECT * FROM appointments", "date, time")
+    }
+    
+    @staticmethod
+    def _feed_row(table: str, row) -> dict:
+        """Satırı sözlüğe çevir (randevu türlerini listeye aç)."""
+        item = dict(row)
+        if table == "appointments":
+            item['types'] = item['types'].split(',') if item['types'] else []
+        return item
+    
+    @staticmethod
+    def _change_cursor(cursor) -> int:
+        """Günlüğe verilmiş son seq (sqlite_sequence'ten: sıkıştırma satırları silse de geri gitmez)."""
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'")
+        row = cursor.fetchone()
+        return row[0] if row else 0
+    
+    def get_catalog_snapshot(self, appointments_from: str = None) -> dict:
+        """Tüm katalog verisini ve değişiklik imlecini tek okuma işleminde getir."""
+        conn = self.connect()
+        cursor = conn.cursor()
+        
+        try:
+            # Tek okuma işlemi: imleç ve satırlar aynı anlık görüntüden gelir
+            cursor.execute("BEGIN")
+            change_cursor = self._change_cursor(cursor)
+            
+            data = {}
+            for table, (query, order_by) in self._FEED_QUERIES.items():
+                params = []
+                if table == "appointments" and appointments_from:
+                    query += " WHERE date >= ?"
+                    params.append(appointments_from)
+                cursor.execute(f"{query} ORDER BY {order_by}", params)
+                data[table] = [self._feed_row(table, row) for row in cursor.fetchall()]
+            
+            conn.commit()
+        finally:
+            self.close()
+        
+        return {"cursor": change_cursor, "data": data}
+    
+    def get_changes_since(self, since: int) -> dict:
+        """İmleçten sonra eklenen/güncellenen/silinen satırları getir.
+        
+        Returns:
+            {"cursor": yeni imleç, "reset": tam yükleme gerekli mi,
+             "changes": {tablo: {"upserted": [satırlar], "deleted": [anahtarlar]}}}
+        """
+        conn = self.connect()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("BEGIN")
+            change_cursor = self._change_cursor(cursor)
+            
+            cursor.execute("SELECT floor FROM change_log_state WHERE id = 1")
+            row = cursor.fetchone()
+            floor = row['floor'] if row else 0
+            
+            # Sıkıştırılmış aralığın gerisindeki imleç: istemci bootstrap yapmalı
+            if since < floor:
+                conn.commit()
+                return {"cursor": change_cursor, "reset": True, "changes": {}}
+            
+            # Her satır için yalnızca son işlem önemli
+            cursor.execute("""
+                SELECT table_name, row_key, op FROM change_log
+                WHERE seq IN (
+                    SELECT MAX(seq) FROM change_log WHERE seq > ? GROUP BY table_name, row_key
+                )
+            """, (since,))
+            
+            pending = {}
+            for entry in cursor.fetchall():
+                bucket = pending.setdefault(entry['table_name'], {"upsert": [], "delete": []})
+                bucket[entry['op']].append(entry['row_key'])
+            
+            changes = {}
+            for table, bucket in pending.items():
+                if table not in self._FEED_QUERIES:
+                    continue
+                key_column = CHANGE_LOG_TABLES[table]
+                query, _ = self._FEED_QUERIES[table]
+                upserted = []
+                found = set()
+                
+                keys = bucket["upsert"]
+                for start in range(0, len(keys), 500):
+                    chunk = keys[start:start + 500]
+                    cursor.execute(
+                        f"{query} WHERE {key_column} IN ({','.join('?' * len(chunk))})", chunk
+                    )
+                    for row in cursor.fetchall():
+                        found.add(str(row[key_column]))
+                        upserted.append(self._feed_row(table, row))
+                
+                # Günlükte upsert olup artık bulunamayan satır silinmiş demektir
+                deleted = bucket["delete"] + [key for key in keys if key not in found]
+                if key_column == "id":
+                    deleted = [int(key) for key in deleted]
+                changes[table] = {"upserted": upserted, "deleted": deleted}
+            
+            conn.commit()
+        finally:
+            self.close()
+        
+        return {"cursor": change_cursor, "reset": False, "changes": changes}
+    
+    def compact_change_log(self, max_entries: int = 10000) -> int:
+        """Değişiklik günlüğünü sıkıştır. Silinen kayıt sayısını döndür.
+        
+        1. Aynı satır için daha yeni bir kayıt varsa eskileri silinir (imleç anlamı değişmez).
+        2. Günlük hâlâ max_entries'ten büyükse en eski kayıtlar silinir ve floor ilerletilir.
+        """
+        conn = self.connect()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            DELETE FROM change_log
+            WHERE seq NOT IN (SELECT MAX(seq) FROM change_log GROUP BY table_name, row_key)
+        """)
+        removed = cursor.rowcount
+        
+        cursor.execute("SELECT COUNT(*) FROM change_log")
+        count = cursor.fetchone()[0]
+        
+        if count > max_entries:
+            cursor.execute("""
+                SELECT seq FROM change_log ORDER BY seq DESC LIMIT 1 OFFSET ?
+            """, (max_entries,))
+            cutoff = cursor.fetchone()[0]
+            cursor.execute("DELETE FROM change_log WHERE seq <= ?", (cutoff,))
+            removed += cursor.rowcount
+            cursor.execute("UPDATE change_log_state SET floor = MAX(floor, ?) WHERE id = 1", (cutoff,))
+        
+        conn.commit()
+        self.close()
+        return removed
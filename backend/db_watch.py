@@ -0,0 +1,107 @@
+"""
+Veritabanı değişiklik izleyicisi - bellek içi önbellekleri geçersiz kılmak için.
+
+Süreç içi yazımlar Database.close() üzerinden hemen bildirilir. Başka
+süreçlerin (populate betikleri, sqlite araçları) yazımları ise kalıcı bir
+bağlantıda PRAGMA data_version ile en fazla `min_interval` saniyede bir
+kontrol edilir; bu aralıkta token okumak hiç I/O yapmaz.
+"""
+import sqlite3
+import threading
+import time
+
+DEFAULT_MIN_INTERVAL = 1.0
+
+
+class DataVersionWatcher:
+    """Tek bir veritabanı dosyası için değişiklik token'ı üretir."""
+
+    def __init__(self, db_path: str, min_interval: float = DEFAULT_MIN_INTERVAL):
+        self.db_path = db_path
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._conn = None
+        self._local_generation = 0
+        self._data_version = None
+        self._checked_at = 0.0
+
+    def _read_data_version(self):
+        """Kalıcı bağlantı üzerinden PRAGMA data_version oku."""
+        try:
+            if self._conn is None:
+                self._conn = sqlite3.connect(self.db_path, uri=True, check_same_thread=False)
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+        except sqlite3.Error:
+            # Bağlantı bozulduysa bir sonraki kontrolde yeniden aç
+            self.close()
+            return None
+
+    def token(self) -> tuple:
+        """Değişiklik token'ı. Değeri değiştiyse önbellekler yeniden kurulmalı."""
+        with self._lock:
+            now = time.monotonic()
+            if self._data_version is None or now - self._checked_at >= self.min_interval:
+                self._data_version = self._read_data_version()
+                self._checked_at = now
+            return (self._local_generation, self._data_version)
+
+    def notify_write(self):
+        """Süreç içi bir yazımı bildir (token hemen değişir)."""
+        with self._lock:
+            self._local_generation += 1
+
+    def close(self):
+        """Kalıcı bağlantıyı kapat."""
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            finally:
+                self._conn = None
+
+
+_registry_lock = threading.Lock()
+_watchers = {}
+
+
+def get_watcher(db_path: str) -> DataVersionWatcher:
+    """Veritabanı yolu için paylaşılan izleyiciyi döndür."""
+    with _registry_lock:
+        watcher = _watchers.get(db_path)
+        if watcher is None:
+            watcher = DataVersionWatcher(db_path)
+            _watchers[db_path] = watcher
+        return watcher
+
+
+def notify_write(db_path: str):
+    """Veritabanına süreç içinden yazıldığını bildir."""
+    get_watcher(db_path).notify_write()
+
+
+_versions_lock = threading.Lock()
+_versions = {}  # db_path -> (token, {table: version})
+
+
+def table_versions(db) -> dict:
+    """table_versions sayaçlarını döndür; token değişmedikçe sorgu yapılmaz."""
+    token = get_watcher(db.db_path).token()
+    with _versions_lock:
+        cached = _versions.get(db.db_path)
+    if cached is not None and cached[0] == token:
+        return cached[1]
+
+    versions = db.get_table_versions()
+    with _versions_lock:
+        _versions[db.db_path] = (token, versions)
+    return versions
+
+
+def forget(db_path: str):
+    """Veritabanının izleyicisini ve önbelleğe alınmış sürümlerini bırak."""
+    with _registry_lock:
+        watcher = _watchers.pop(db_path, None)
+    if watcher is not None:
+        with watcher._lock:
+            watcher.close()
+    with _versions_lock:
+        _versions.pop(db_path, None)
@@ -0,0 +1,243 @@
+"""
+Debug endpoints for DetoksBot
+On-demand stack sampling and tracemalloc snapshot diffs for the running backend
+"""
+from fastapi import APIRouter, HTTPException, Request, Depends
+from fastapi.responses import PlainTextResponse
+from collections import Counter
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+import auth
+
+router = APIRouter(prefix="/api/debug", tags=["debug"])
+
+MAX_PROFILE_SECONDS = 60
+MIN_INTERVAL_MS = 1
+MAX_STACK_DEPTH = 128
+
+LOOPBACK_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+# Aynı anda tek bir profil çalışsın (örnekleyici tüm thread'leri dolaşıyor)
+_profile_lock = threading.Lock()
+
+# tracemalloc karşılaştırma tabanı
+_memory_baseline = None
+
+
+# ==================== ACCESS ====================
+
+def require_admin(request: Request, claims: dict = Depends(auth.require_admin)):
+    """Allow only loopback clients with an admin session token."""
+    client_host = request.client.host if request.client else None
+    if client_host not in LOOPBACK_HOSTS:
+        raise HTTPException(status_code=403, detail="Debug endpoints are local only")
+    return claims
+
+
+# ==================== SAMPLER ====================
+
+class StackSampler:
+    """Tüm thread'lerin yığınlarını sabit aralıkla örnekleyen profilleyici."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples = Counter()  # (thread_name, stack) -> count
+        self.sample_count = 0
+        self.elapsed = 0.0
+
+    @staticmethod
+    def _walk(frame) -> tuple:
+        """Frame zincirini kökten yaprağa doğru (dosya, fonksiyon, satır) listesine çevir."""
+        stack = []
+        while frame is not None and len(stack) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            stack.append((code.co_filename, code.co_name, code.co_firstlineno))
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+    def run(self, duration: float):
+        """Örneklemeyi çağıran thread'de `duration` saniye boyunca çalıştır."""
+        own_ident = threading.get_ident()
+        started = time.perf_counter()
+        deadline = started + duration
+
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                thread_name = names.get(ident, f"thread-{ident}")
+                self.samples[(thread_name, self._walk(frame))] += 1
+            self.sample_count += 1
+
+            # Örnekleme süresini aralıktan düş, böylece frekans sabit kalır
+            spent = time.perf_counter() - now
+            time.sleep(max(0.0, self.interval - spent))
+
+        self.elapsed = time.perf_counter() - started
+
+    @staticmethod
+    def _frame_label(frame_key: tuple) -> str:
+        filename, func_name, line = frame_key
+        return f"{func_name} ({os.path.basename(filename)}:{line})"
+
+    def to_collapsed(self) -> str:
+        """Brendan Gregg collapsed-stack formatı (flamegraph.pl / speedscope uyumlu)."""
+        lines = []
+        for (thread_name, stack), count in self.samples.most_common():
+            frames = [thread_name.replace(";", ":")]
+            frames.extend(self._frame_label(f).replace(";", ":") for f in stack)
+            lines.append(f"{';'.join(frames)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def to_speedscope(self) -> dict:
+        """speedscope 'sampled' profil formatı."""
+        frames = []
+        frame_index = {}
+        profiles = {}
+        interval_ms = self.interval * 1000
+
+        for (thread_name, stack), count in self.samples.items():
+            indices = []
+            for frame_key in stack:
+                if frame_key not in frame_index:
+                    filename, func_name, line = frame_key
+                    frame_index[frame_key] = len(frames)
+                    frames.append({"name": func_name, "file": filename, "line": line})
+                indices.append(frame_index[frame_key])
+
+            profile = profiles.setdefault(thread_name, {
+                "type": "sampled",
+                "name": thread_name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": 0,
+                "samples": [],
+                "weights": []
+            })
+            profile["samples"].append(indices)
+            profile["weights"].append(count * interval_ms)
+            profile["endValue"] += count * interval_ms
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"DetoksBot backend ({self.sample_count} samples)",
+            "exporter": "detoksbot-debug-profiler",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": list(profiles.values())
+        }
+
+
+# ==================== PROFILE ENDPOINTS ====================
+
+@router.post("/profile")
+def profile_threads(seconds: float = 5.0, interval_ms: float = 5.0,
+                    format: str = "speedscope", admin: dict = Depends(require_admin)):
+    """
+    Sample all thread stacks for `seconds` and return the aggregated profile.
+    Declared sync so the sampling loop runs in the threadpool, not on the event loop.
+    """
+    if format not in ("speedscope", "collapsed"):
+        raise HTTPException(status_code=400, detail="format must be 'speedscope' or 'collapsed'")
+    if not 0 < seconds <= MAX_PROFILE_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be in (0, {MAX_PROFILE_SECONDS}]")
+
+    if not _profile_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A profile is already running")
+
+    try:
+        sampler = StackSampler(max(interval_ms, MIN_INTERVAL_MS) / 1000.0)
+        sampler.run(seconds)
+    finally:
+        _profile_lock.release()
+
+    if format == "collapsed":
+        return PlainTextResponse(sampler.to_collapsed())
+    return sampler.to_speedscope()
+
+
+# ==================== MEMORY ENDPOINTS ====================
+
+def _filtered_snapshot():
+    """tracemalloc'un kendi ve import sisteminin ayırmalarını dışarıda bırak."""
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ))
+
+
+@router.post("/memory/start")
+def start_memory_tracing(frames: int = 10, admin: dict = Depends(require_admin)):
+    """Start tracemalloc and record the baseline snapshot."""
+    global _memory_baseline
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(max(1, min(frames, 100)))
+    _memory_baseline = _filtered_snapshot()
+
+    current, peak = tracemalloc.get_traced_memory()
+    return {"status": "tracing", "frames": tracemalloc.get_traceback_limit(),
+            "traced_current": current, "traced_peak": peak}
+
+
+@router.get("/memory/diff")
+def memory_diff(limit: int = 30, group_by: str = "lineno", reset: bool = False,
+                admin: dict = Depends(require_admin)):
+    """
+    Compare a fresh snapshot against the baseline and return the top growth sites.
+    With reset=true the fresh snapshot becomes the new baseline.
+    """
+    global _memory_baseline
+
+    if group_by not in ("lineno", "filename", "traceback"):
+        raise HTTPException(status_code=400, detail="group_by must be lineno, filename or traceback")
+    if not tracemalloc.is_tracing() or _memory_baseline is None:
+        raise HTTPException(status_code=409, detail="Memory tracing not started")
+
+    snapshot = _filtered_snapshot()
+    stats = snapshot.compare_to(_memory_baseline, group_by)
+
+    top = []
+    for stat in stats[:max(1, limit)]:
+        top.append({
+            "location": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+            "size": stat.size,
+            "size_diff": stat.size_diff,
+            "count": stat.count,
+            "count_diff": stat.count_diff
+        })
+
+    if reset:
+        _memory_baseline = snapshot
+
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "traced_current": current,
+        "traced_peak": peak,
+        "total_size_diff": sum(stat.size_diff for stat in stats),
+        "threads": [t.name for t in threading.enumerate()],
+        "top": top
+    }
+
+
+@router.post("/memory/stop")
+def stop_memory_tracing(admin: dict = Depends(require_admin)):
+    """Stop tracemalloc and drop the baseline snapshot."""
+    global _memory_baseline
+
+    _memory_baseline = None
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    return {"status": "stopped"}
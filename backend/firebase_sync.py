@@ -2,11 +2,20 @@
 Firebase Sync API endpoints for DetoksBot
 Handles synchronization between Firebase and local SQLite database
 """
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import json
+import os
+import random
+import threading
+import time
+import uuid
 
 # Firebase Admin SDK
 try:
@@ -17,23 +26,78 @@ except ImportError:
     FIREBASE_AVAILABLE = False
     print("Warning: firebase-admin not installed. Run: pip install firebase-admin")
 
-from database import Database
+from database import Database, outbox_columns, outbox_paused
+import firestore_fake
 
 router = APIRouter(prefix="/api/sync", tags=["sync"])
 
 # Firebase initialization
 db_firestore = None
 
+
+def get_sync_db() -> Database:
+    """New Database instance per sync operation (push and pull may run in parallel threads)"""
+    return Database()
+
+
+# ==================== EXECUTOR ====================
+
+# Firestore and sqlite3 calls block; they run here instead of on the event loop.
+# Two workers so a full sync can push and pull at the same time.
+SYNC_WORKERS = 2
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Dedicated thread pool for blocking sync work (created on first use)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=SYNC_WORKERS, thread_name_prefix="firebase-sync")
+        return _executor
+
+
+def shutdown_executor(wait: bool = True):
+    """Stop the sync thread pool (called from the API lifespan on shutdown)"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait, cancel_futures=True)
+
+
+async def run_blocking(func, *args):
+    """Run func(*args) on the sync executor and await the result"""
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), func, *args)
+
+
+async def require_firebase():
+    """503 unless a Firestore client is (or can be) initialized"""
+    if not await run_blocking(init_firebase):
+        raise HTTPException(status_code=503, detail="Firebase not available")
+
+def set_firestore_client(client):
+    """Use the given client (e.g. a firestore_fake.FakeFirestore) instead of Firebase Admin"""
+    global db_firestore
+    db_firestore = client
+
+
 def init_firebase():
     """Initialize Firebase Admin SDK"""
     global db_firestore
     
-    if not FIREBASE_AVAILABLE:
-        return False
-    
     if db_firestore is not None:
         return True
     
+    if os.environ.get("DETOKS_FIRESTORE_FAKE") == "1":
+        db_firestore = firestore_fake.FakeFirestore()
+        return True
+    
+    if not FIREBASE_AVAILABLE:
+        return False
+    
     try:
         # Check if already initialized
         firebase_admin.get_app()
@@ -68,6 +132,13 @@ class SyncRequest(BaseModel):
     dietitianId: str
     lastSyncTime: Optional[str] = None
 
+class CollectionPullRequest(BaseModel):
+    dietitianId: str
+    collections: Optional[List[str]] = None  # default: every collection in sync_engine.COLLECTIONS
+
+class ListenerRequest(BaseModel):
+    dietitianId: str
+
 class AppointmentSync(BaseModel):
     id: Optional[str] = None
     firebaseId: Optional[str] = None
@@ -87,223 +158,768 @@ class AppointmentSync(BaseModel):
 
 # ==================== SYNC ENDPOINTS ====================
 
+def read_sync_status() -> dict:
+    """Sync status from the local database (blocking)"""
+    import sync_listener
+    import sync_scheduler
+    
+    db = get_sync_db()
+    checkpoints = db.get_sync_checkpoints()
+    pending = db.get_outbox_counts()
+    runs = db.get_sync_runs()
+    
+    # Count local records
+    conn = db.connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM appointments")
+        local_appointments = cursor.fetchone()[0]
+    finally:
+        db.close()
+    
+    appointments_checkpoint = checkpoints.get("appointments") or {}
+    return {
+        "firebase_available": FIREBASE_AVAILABLE,
+        "firebase_initialized": db_firestore is not None,
+        "collections": {
+            "appointments": {
+                "lastSyncTime": appointments_checkpoint.get("cursor"),
+                "localCount": local_appointments,
+                "pendingPush": pending.get("appointments", 0)
+            }
+        },
+        "checkpoints": checkpoints,
+        "pendingPush": pending,
+        "scheduler": sync_scheduler.scheduler.state(),
+        "listener": sync_listener.listener.state(),
+        "runs": [
+            {
+                "id": run["id"],
+                "trigger": run["trigger"],
+                "status": run["status"],
+                "startedAt": run["started_at"],
+                "finishedAt": run["finished_at"],
+                "durationMs": run["duration_ms"],
+                "pushed": run["pushed"],
+                "pulled": run["pulled"],
+                "error": run["error"]
+            }
+            for run in runs
+        ]
+    }
+
+
 @router.get("/status")
 async def get_sync_status():
     """Get overall sync status"""
-    with Database() as db:
-        # Get last sync times from settings
-        appointments_sync = db.get_setting("lastSync_appointments", None)
+    return await run_blocking(read_sync_status)
+
+
+# ==================== CHUNKED PULL ====================
+
+PULL_CHUNK_SIZE = 500
+
+# One pull at a time, so two runs never race on the cursor
+_pull_lock = threading.Lock()
+
+UPSERT_APPOINTMENT_SQL = """
+    INSERT INTO appointments
+    (firebase_id, client_name, phone, date, time, types, note, status, synced_at, needs_sync)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
+    ON CONFLICT(firebase_id) DO UPDATE SET
+        client_name = excluded.client_name,
+        phone = excluded.phone,
+        date = excluded.date,
+        time = excluded.time,
+        types = excluded.types,
+        note = excluded.note,
+        status = excluded.status,
+        synced_at = excluded.synced_at
+    WHERE NOT EXISTS (
+        SELECT 1 FROM sync_outbox
+        WHERE table_name = 'appointments' AND row_id = appointments.id
+    )
+"""
+
+
+def parse_sync_time(value: str):
+    """ISO timestamp (with optional trailing Z) to datetime"""
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def appointment_row(doc, synced_at: str) -> tuple:
+    """UPSERT parameters and updatedAt for a Firestore appointment document"""
+    data = doc.to_dict()
+    types = data.get('types') or []
+    return (
+        doc.id,
+        data.get('clientName'),
+        data.get('phone'),
+        data.get('date'),
+        data.get('time'),
+        ','.join(types),
+        data.get('note'),
+        data.get('status', 'pending'),
+        synced_at
+    ), data.get('updatedAt')
+
+
+def save_checkpoint(conn, collection: str, cursor_value: str, cursor_id: str = None):
+    """Store a collection's pull cursor (inside the caller's transaction)
+    cursor_id is the id of the last applied document with that updatedAt."""
+    conn.execute("""
+        INSERT INTO sync_checkpoints (collection, cursor, cursor_id, updated_at)
+        VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(collection) DO UPDATE SET
+            cursor = excluded.cursor, cursor_id = excluded.cursor_id, updated_at = excluded.updated_at
+    """, (collection, cursor_value, cursor_id))
+
+
+def after_cursor(query, cursor_value: str, cursor_id: str = None):
+    """Restrict a query ordered by (updatedAt, __name__) to documents after the cursor.
+    
+    With the boundary document's id the comparison is strict, so nothing
+    already applied is downloaded again. A bare timestamp (older checkpoints,
+    an explicit lastSyncTime) falls back to >=, re-applying the boundary
+    documents (the UPSERT is idempotent) rather than skipping any.
+    """
+    if not cursor_value:
+        return query
+    if cursor_id:
+        return query.start_after({'updatedAt': parse_sync_time(cursor_value), '__name__': cursor_id})
+    return query.where('updatedAt', '>=', parse_sync_time(cursor_value))
+
+
+DELETE_PULLED_APPOINTMENT_SQL = """
+    DELETE FROM appointments
+    WHERE firebase_id = ?
+    AND NOT EXISTS (
+        SELECT 1 FROM sync_outbox
+        WHERE table_name = 'appointments' AND row_id = appointments.id
+    )
+"""
+
+
+def apply_pull_chunk(db: Database, rows: list, cursor_value: str, deleted_ids: list = (),
+                     cursor_id: str = None):
+    """Upsert one chunk (and delete remotely deleted documents) and advance the
+    pull cursor in the same transaction"""
+    conn = db.connect()
+    try:
+        with conn, outbox_paused(conn):
+            conn.executemany(UPSERT_APPOINTMENT_SQL, rows)
+            if deleted_ids:
+                conn.executemany(DELETE_PULLED_APPOINTMENT_SQL, [(doc_id,) for doc_id in deleted_ids])
+            if cursor_value:
+                save_checkpoint(conn, 'appointments', cursor_value, cursor_id)
+    finally:
+        db.close()
+
+
+def pull_remote_appointments(db: Database, client, dietitian_id: str,
+                             last_sync_time: str = None,
+                             chunk_size: int = PULL_CHUNK_SIZE) -> dict:
+    """
+    Stream appointments updated since the cursor, ordered by updatedAt,
+    and apply them in chunks of chunk_size (one executemany transaction each).
+    
+    The cursor is the (updatedAt, document id) of the last applied document
+    and is saved with every chunk, so an interrupted pull resumes where it
+    stopped and an idle pull transfers nothing (see after_cursor). Rows with
+    unpushed local edits (an entry in the sync outbox) are not overwritten,
+    and the pulled writes themselves are kept out of the outbox.
+    """
+    with _pull_lock:
+        if last_sync_time is None:
+            last_sync_time, cursor_id = db.get_sync_cursor('appointments')
+        else:
+            cursor_id = None
         
-        # Count local records
-        conn = db.connect()
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM appointments")
-        local_appointments = cursor.fetchone()[0]
+        query = client.collection('appointments').where('dietitianId', '==', dietitian_id)
+        query = query.order_by('updatedAt').order_by('__name__')
+        query = after_cursor(query, last_sync_time, cursor_id)
         
-        return {
-            "firebase_available": FIREBASE_AVAILABLE,
-            "firebase_initialized": db_firestore is not None,
-            "collections": {
-                "appointments": {
-                    "lastSyncTime": appointments_sync,
-                    "localCount": local_appointments
-                }
-            }
-        }
+        pulled = 0
+        chunks = 0
+        cursor_value = last_sync_time
+        rows = []
+        synced_at = datetime.now().isoformat()
+        
+        for doc in query.stream():
+            row, updated_at = appointment_row(doc, synced_at)
+            rows.append(row)
+            if updated_at is not None:
+                cursor_value = updated_at.isoformat()
+                cursor_id = doc.id
+            
+            if len(rows) >= chunk_size:
+                apply_pull_chunk(db, rows, cursor_value, cursor_id=cursor_id)
+                pulled += len(rows)
+                chunks += 1
+                rows = []
+        
+        if rows:
+            apply_pull_chunk(db, rows, cursor_value, cursor_id=cursor_id)
+            pulled += len(rows)
+            chunks += 1
+        
+        return {"pulled": pulled, "chunks": chunks, "lastSyncTime": cursor_value}
 
 
 @router.post("/appointments/pull")
 async def pull_appointments(request: SyncRequest):
     """
     Pull new/updated appointments from Firebase to local DB.
-    Only fetches records updated after lastSyncTime.
+    Only fetches records updated after lastSyncTime (or the stored checkpoint).
     """
-    if not init_firebase():
-        raise HTTPException(status_code=503, detail="Firebase not available")
+    await require_firebase()
+    await run_blocking(remember_dietitian, request.dietitianId)
+    
+    try:
+        return await run_blocking(
+            pull_remote_appointments, get_sync_db(), db_firestore, request.dietitianId, request.lastSyncTime
+        )
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ==================== BATCHED PUSH ====================
+
+# Firestore accepts at most 500 writes per batch commit
+PUSH_BATCH_SIZE = 500
+PUSH_MAX_ATTEMPTS = 4
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 8.0
+
+# One push at a time, so a row never gets two different client-generated ids
+_push_lock = threading.Lock()
+
+# google.api_core.exceptions names that mean "retry the same request"
+TRANSIENT_ERRORS = {
+    "ServiceUnavailable", "DeadlineExceeded", "Aborted",
+    "InternalServerError", "TooManyRequests", "ResourceExhausted"
+}
+
+
+def is_transient_error(error: Exception) -> bool:
+    """True if the error is worth retrying unchanged"""
+    return type(error).__name__ in TRANSIENT_ERRORS
+
+
+def retry_delay(attempt: int) -> float:
+    """Exponential backoff with jitter for the given (0-based) attempt"""
+    delay = min(RETRY_BASE_DELAY * (2 ** attempt), RETRY_MAX_DELAY)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def server_timestamp(client):
+    """SERVER_TIMESTAMP sentinel understood by the given client"""
+    return getattr(client, "SERVER_TIMESTAMP", None) or firestore.SERVER_TIMESTAMP
+
+
+def decode_types(value: str) -> list:
+    """Local types column: comma separated (database.py), JSON in rows pulled by older versions"""
+    if not value:
+        return []
+    if value.startswith('['):
+        try:
+            return json.loads(value)
+        except ValueError:
+            pass
+    return value.split(',')
+
+
+# appointments column -> Firestore field
+APPOINTMENT_FIELDS = {
+    'client_name': 'clientName',
+    'phone': 'phone',
+    'date': 'date',
+    'time': 'time',
+    'types': 'types',
+    'note': 'note',
+    'status': 'status'
+}
+
+
+def appointment_document(row, dietitian_id: str, timestamp, columns: list = None) -> dict:
+    """
+    Firestore document for a local appointment row.
+    With columns, only those fields are included (a partial update merged
+    into the existing document).
+    """
+    data = {
+        APPOINTMENT_FIELDS[column]: decode_types(row[column]) if column == 'types' else row[column]
+        for column in (columns or APPOINTMENT_FIELDS)
+    }
+    data['dietitianId'] = dietitian_id
+    data['updatedAt'] = timestamp
+    if not row['synced_at']:
+        # Never pushed successfully: this write creates the document
+        data['createdAt'] = timestamp
+    return data
+
+
+def commit_with_retry(client, writes: list, max_attempts: int = PUSH_MAX_ATTEMPTS):
+    """
+    Commit (reference, data) pairs as one WriteBatch; data None deletes the document.
+    Transient errors are retried with backoff; anything else is raised.
+    """
+    for attempt in range(max_attempts):
+        batch = client.batch()
+        for reference, data in writes:
+            if data is None:
+                batch.delete(reference)
+            else:
+                batch.set(reference, data, merge=True)
+        try:
+            batch.commit()
+            return
+        except Exception as e:
+            if not is_transient_error(e) or attempt == max_attempts - 1:
+                raise
+            time.sleep(retry_delay(attempt))
+
+
+def commit_writes(client, writes: list, max_attempts: int = PUSH_MAX_ATTEMPTS):
+    """
+    Commit writes, isolating documents that are rejected permanently.
+    A batch is atomic, so on a permanent error it is split in halves and
+    each half retried until the failing documents are found.
+    
+    Returns:
+        (committed, failed): committed write items and (item, error message) pairs
+    """
+    committed = []
+    failed = []
+    pending = [writes]
+    
+    while pending:
+        chunk = pending.pop()
+        try:
+            commit_with_retry(client, [(reference, data) for _, reference, data in chunk], max_attempts)
+            committed.extend(chunk)
+        except Exception as e:
+            if is_transient_error(e):
+                # Still failing after retries: stop, the rest stays in the outbox
+                raise
+            if len(chunk) == 1:
+                failed.append((chunk[0], str(e)))
+            else:
+                middle = len(chunk) // 2
+                pending.append(chunk[middle:])
+                pending.append(chunk[:middle])
+    
+    return committed, failed
+
+
+def read_outbox_chunk(db: Database, collection, after_seq: int, limit: int):
+    """
+    Next outbox entries for appointments (seq order) and their current rows.
+    Runs as one write transaction, so a row cannot be deleted between being
+    read and getting its client-generated firebase_id.
     
+    Returns:
+        (entries, rows): outbox rows and {row id: appointment row}
+    """
+    conn = db.connect()
     try:
-        # Build query
-        appointments_ref = db_firestore.collection('appointments')
-        query = appointments_ref.where('dietitianId', '==', request.dietitianId)
+        conn.execute("BEGIN IMMEDIATE")
+        entries = conn.execute("""
+            SELECT seq, row_id, op, changed_mask, firebase_id FROM sync_outbox
+            WHERE table_name = 'appointments' AND seq > ?
+            ORDER BY seq LIMIT ?
+        """, (after_seq, limit)).fetchall()
         
-        # If we have a lastSyncTime, only get records updated after that
-        if request.lastSyncTime:
-            last_sync = datetime.fromisoformat(request.lastSyncTime.replace('Z', '+00:00'))
-            query = query.where('updatedAt', '>', last_sync)
+        row_ids = [entry['row_id'] for entry in entries if entry['op'] != 'delete']
+        rows = {}
+        if row_ids:
+            placeholders = ",".join("?" * len(row_ids))
+            rows = {
+                row['id']: dict(row) for row in
+                conn.execute(f"SELECT * FROM appointments WHERE id IN ({placeholders})", row_ids)
+            }
         
-        # Execute query
-        docs = query.stream()
+        assigned = [(collection.document().id, row_id) for row_id, row in rows.items() if not row['firebase_id']]
+        if assigned:
+            # firebase_id is not a tracked column, so this does not add outbox entries
+            conn.executemany("UPDATE appointments SET firebase_id = ? WHERE id = ?", assigned)
+            for firebase_id, row_id in assigned:
+                rows[row_id]['firebase_id'] = firebase_id
         
-        pulled = 0
-        with Database() as db:
-            conn = db.connect()
-            cursor = conn.cursor()
+        conn.commit()
+        return entries, rows
+    finally:
+        db.close()
+
+
+def push_pending_appointments(db: Database, client, dietitian_id: str,
+                              batch_size: int = PUSH_BATCH_SIZE,
+                              max_attempts: int = PUSH_MAX_ATTEMPTS) -> dict:
+    """
+    Push pending appointment changes from the sync outbox, in seq order,
+    as WriteBatch commits of up to batch_size writes.
+    
+    Inserts send the whole document, updates only the changed fields and
+    deletes remove the document. New documents get client-generated ids,
+    stored locally before the commit so a retried or interrupted push
+    rewrites the same document instead of creating a duplicate. After each
+    commit the pushed entries are removed from the outbox and the rows
+    marked synced in one transaction. An entry superseded during the push
+    has already been merged into a newer one, which stays for the next run.
+    """
+    with _push_lock:
+        batch_size = min(batch_size, PUSH_BATCH_SIZE)
+        collection = client.collection('appointments')
+        timestamp = server_timestamp(client)
+        
+        pushed = 0
+        batches = 0
+        failed = []
+        last_seq = 0
+        
+        while True:
+            entries, rows = read_outbox_chunk(db, collection, last_seq, batch_size)
+            if not entries:
+                break
+            last_seq = entries[-1]['seq']
             
-            for doc in docs:
-                data = doc.to_dict()
-                firebase_id = doc.id
-                
-                # Check if exists locally by firebase_id
-                cursor.execute(
-                    "SELECT id FROM appointments WHERE firebase_id = ?", 
-                    (firebase_id,)
-                )
-                existing = cursor.fetchone()
+            writes = []
+            skipped = []  # nothing to send: row gone (a later delete entry follows) or never pushed
+            for entry in entries:
+                if entry['op'] == 'delete':
+                    if entry['firebase_id']:
+                        writes.append((entry, collection.document(entry['firebase_id']), None))
+                    else:
+                        skipped.append(entry)
+                    continue
                 
-                types_json = json.dumps(data.get('types', []))
+                row = rows.get(entry['row_id'])
+                if row is None:
+                    skipped.append(entry)
+                    continue
                 
-                if existing:
-                    # Update existing
-                    cursor.execute("""
-                        UPDATE appointments 
-                        SET client_name = ?, phone = ?, date = ?, time = ?,
-                            types = ?, note = ?, status = ?, synced_at = ?
-                        WHERE firebase_id = ?
-                    """, (
-                        data.get('clientName'),
-                        data.get('phone'),
-                        data.get('date'),
-                        data.get('time'),
-                        types_json,
-                        data.get('note'),
-                        data.get('status', 'pending'),
-                        datetime.now().isoformat(),
-                        firebase_id
-                    ))
-                else:
-                    # Insert new
-                    cursor.execute("""
-                        INSERT INTO appointments 
-                        (firebase_id, client_name, phone, date, time, types, note, status, synced_at, needs_sync)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
-                    """, (
-                        firebase_id,
-                        data.get('clientName'),
-                        data.get('phone'),
-                        data.get('date'),
-                        data.get('time'),
-                        types_json,
-                        data.get('note'),
-                        data.get('status', 'pending'),
-                        datetime.now().isoformat()
-                    ))
-                
-                pulled += 1
+                columns = None
+                if entry['op'] == 'update' and row['synced_at']:
+                    columns = outbox_columns('appointments', entry['changed_mask'])
+                writes.append((
+                    entry,
+                    collection.document(row['firebase_id']),
+                    appointment_document(row, dietitian_id, timestamp, columns)
+                ))
+            
+            committed, rejected = commit_writes(client, writes, max_attempts) if writes else ([], [])
+            batches += 1
             
-            conn.commit()
+            done = [entry for entry, _, _ in committed] + skipped
+            if done:
+                synced_at = datetime.now().isoformat()
+                conn = db.connect()
+                try:
+                    with conn:
+                        conn.executemany(
+                            "DELETE FROM sync_outbox WHERE seq = ?",
+                            [(entry['seq'],) for entry in done]
+                        )
+                        conn.executemany(
+                            "UPDATE appointments SET needs_sync = 0, synced_at = ? WHERE id = ?",
+                            [(synced_at, entry['row_id']) for entry, _, data in committed if data is not None]
+                        )
+                finally:
+                    db.close()
             
-            # Update last sync time
-            db.set_setting("lastSync_appointments", datetime.now().isoformat())
+            pushed += len(committed)
+            failed.extend(
+                {"id": item[0]['row_id'], "op": item[0]['op'], "error": message}
+                for item, message in rejected
+            )
         
-        return {"pulled": pulled, "lastSyncTime": datetime.now().isoformat()}
-    
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        return {"pushed": pushed, "batches": batches, "failed": failed}
 
 
 @router.post("/appointments/push")
 async def push_appointments(request: SyncRequest):
     """
     Push local appointments that need sync to Firebase.
-    Only pushes records with needs_sync = true.
+    Pushes the changes recorded in the sync outbox, in batches of up to 500 writes.
     """
-    if not init_firebase():
-        raise HTTPException(status_code=503, detail="Firebase not available")
+    await require_firebase()
+    await run_blocking(remember_dietitian, request.dietitianId)
     
     try:
-        pushed = 0
-        
-        with Database() as db:
-            conn = db.connect()
-            cursor = conn.cursor()
-            
-            # Get all appointments that need sync
-            cursor.execute("""
-                SELECT * FROM appointments WHERE needs_sync = 1
-            """)
-            rows = cursor.fetchall()
-            
-            for row in rows:
-                appointment_data = {
-                    'clientName': row['client_name'],
-                    'phone': row['phone'],
-                    'date': row['date'],
-                    'time': row['time'],
-                    'types': json.loads(row['types']) if row['types'] else [],
-                    'note': row['note'],
-                    'status': row['status'],
-                    'dietitianId': request.dietitianId,
-                    'updatedAt': firestore.SERVER_TIMESTAMP
-                }
-                
-                if row['firebase_id']:
-                    # Update existing in Firebase
-                    db_firestore.collection('appointments').document(row['firebase_id']).update(appointment_data)
-                else:
-                    # Create new in Firebase
-                    appointment_data['createdAt'] = firestore.SERVER_TIMESTAMP
-                    doc_ref = db_firestore.collection('appointments').add(appointment_data)
-                    firebase_id = doc_ref[1].id
-                    
-                    # Update local record with firebase_id
-                    cursor.execute(
-                        "UPDATE appointments SET firebase_id = ? WHERE id = ?",
-                        (firebase_id, row['id'])
-                    )
-                
-                # Mark as synced
-                cursor.execute("""
-                    UPDATE appointments 
-                    SET needs_sync = 0, synced_at = ? 
-                    WHERE id = ?
-                """, (datetime.now().isoformat(), row['id']))
-                
-                pushed += 1
-            
-            conn.commit()
-        
-        return {"pushed": pushed}
+        return await run_blocking(push_pending_appointments, get_sync_db(), db_firestore, request.dietitianId)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/appointments/full")
-async def full_sync_appointments(request: SyncRequest, background_tasks: BackgroundTasks):
+def full_sync(dietitian_id: str, last_sync_time: str = None) -> dict:
     """
-    Perform full bidirectional sync:
-    1. Push local changes to Firebase
-    2. Pull new changes from Firebase
+    Push and pull at the same time (blocking).
+    Safe to overlap: the pull's UPSERT skips rows with pending outbox entries, and
+    new rows get their firebase_id before the push commits, so a pulled copy
+    of a just-pushed document lands on the same local row.
+    The catalog collections (sync_engine) push their outbox entries and are
+    then pulled, after the appointments pull. While the snapshot listener is
+    live the appointments pull is skipped.
     """
-    push_result = await push_appointments(request)
-    pull_result = await pull_appointments(request)
+    import sync_engine
+    import sync_listener
+    
+    client = db_firestore
+    executor = get_executor()
+    push_future = executor.submit(push_pending_appointments, get_sync_db(), client, dietitian_id)
+    if sync_listener.listener.is_live(dietitian_id) and last_sync_time is None:
+        pull_result = {"pulled": 0, "lastSyncTime": get_sync_db().get_sync_checkpoint('appointments')}
+    else:
+        # The pull runs in the calling thread while the push runs on the executor
+        pull_result = pull_remote_appointments(get_sync_db(), client, dietitian_id, last_sync_time)
+    pushed_collections = sync_engine.push_collections(client, dietitian_id, db_factory=get_sync_db)
+    collections = sync_engine.pull_collections(client, dietitian_id, db_factory=get_sync_db)
+    for name, pushed in pushed_collections.items():
+        if "error" in pushed:
+            collections[name] = {**collections[name], "error": pushed["error"]}
+        else:
+            collections[name] = {**collections[name], **pushed}
+    push_result = push_future.result()
     
     return {
         "pushed": push_result["pushed"],
+        "failed": push_result["failed"],
         "pulled": pull_result["pulled"],
-        "lastSyncTime": pull_result["lastSyncTime"]
+        "lastSyncTime": pull_result["lastSyncTime"],
+        "collections": collections
     }
 
 
-@router.delete("/appointments/{appointment_id}")
-async def delete_appointment_sync(appointment_id: int, dietitian_id: str):
-    """Delete appointment from both local and Firebase"""
-    with Database() as db:
-        conn = db.connect()
+def run_full_sync(trigger: str, dietitian_id: str, last_sync_time: str = None) -> dict:
+    """full_sync, recorded in the sync run history (blocking; errors are re-raised)"""
+    started = time.monotonic()
+    run = {"trigger": trigger, "status": "ok", "started_at": datetime.now().isoformat()}
+    try:
+        result = full_sync(dietitian_id, last_sync_time)
+        collections = result["collections"]
+        run["pushed"] = result["pushed"] + sum(c.get("pushed", 0) for c in collections.values())
+        run["pulled"] = result["pulled"] + sum(c.get("pulled", 0) for c in collections.values())
+        errors = []
+        rejected = len(result["failed"]) + sum(len(c.get("failed", ())) for c in collections.values())
+        if rejected:
+            errors.append(f"{rejected} document(s) rejected")
+        errors.extend(f"{name}: {c['error']}" for name, c in collections.items() if "error" in c)
+        if errors:
+            run["status"] = "partial"
+            run["error"] = "; ".join(errors)
+        return result
+    except Exception as e:
+        run["status"] = "failed"
+        run["error"] = str(e)
+        raise
+    finally:
+        run["finished_at"] = datetime.now().isoformat()
+        run["duration_ms"] = int((time.monotonic() - started) * 1000)
+        get_sync_db().add_sync_run(run)
+
+
+def remember_dietitian(dietitian_id: str):
+    """Keep the dietitian id so the background scheduler can sync on its own"""
+    import sync_scheduler
+    
+    db = get_sync_db()
+    if dietitian_id and db.get_setting(sync_scheduler.DIETITIAN_SETTING) != dietitian_id:
+        db.set_setting(sync_scheduler.DIETITIAN_SETTING, dietitian_id)
+
+
+# ==================== BACKGROUND JOBS ====================
+
+MAX_JOBS = 20
+
+_jobs = OrderedDict()  # job_id -> job dict, oldest first
+_jobs_lock = threading.Lock()
+
+
+def start_job(kind: str, func, *args) -> dict:
+    """Run func(*args) on a plain thread and track it as a job (see GET /jobs/{id})"""
+    job = {
+        "id": uuid.uuid4().hex,
+        "kind": kind,
+        "status": "running",
+        "startedAt": datetime.now().isoformat(),
+        "finishedAt": None,
+        "result": None,
+        "error": None
+    }
+    with _jobs_lock:
+        _jobs[job["id"]] = job
+        while len(_jobs) > MAX_JOBS:
+            _jobs.popitem(last=False)
+    
+    def run():
+        try:
+            update = {"status": "done", "result": func(*args)}
+        except Exception as e:
+            update = {"status": "failed", "error": str(e)}
+        update["finishedAt"] = datetime.now().isoformat()
+        with _jobs_lock:
+            job.update(update)
+    
+    # Not on the sync executor: full_sync itself submits work there and waits for it
+    threading.Thread(target=run, name=f"sync-job-{job['id'][:8]}", daemon=True).start()
+    return dict(job)
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job else None
+
+
+@router.post("/appointments/full")
+async def full_sync_appointments(request: SyncRequest, background: bool = False):
+    """
+    Perform full bidirectional sync: push local changes and pull remote
+    changes concurrently.
+    With ?background=true returns 202 and a job to poll at /api/sync/jobs/{id}.
+    """
+    await require_firebase()
+    
+    await run_blocking(remember_dietitian, request.dietitianId)
+    
+    if background:
+        job = start_job("appointments/full", run_full_sync, "api", request.dietitianId, request.lastSyncTime)
+        return JSONResponse(job, status_code=202)
+    
+    try:
+        # Not on the sync executor: full_sync waits for work it submits there
+        return await asyncio.to_thread(run_full_sync, "api", request.dietitianId, request.lastSyncTime)
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/collections/pull")
+async def pull_collections(request: CollectionPullRequest):
+    """
+    Pull recipes, diet templates, packages and clients (or the requested subset)
+    from their checkpoints; collections are paged and applied concurrently.
+    """
+    import sync_engine
+    
+    await require_firebase()
+    
+    unknown = [name for name in request.collections or [] if name not in sync_engine.COLLECTIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown collections: {', '.join(unknown)}")
+    
+    await run_blocking(remember_dietitian, request.dietitianId)
+    
+    try:
+        # Not on the sync executor: pull_collections runs its own thread per collection
+        return await asyncio.to_thread(
+            sync_engine.pull_collections, db_firestore, request.dietitianId,
+            request.collections, sync_engine.PAGE_SIZE, get_sync_db
+        )
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def set_listener(dietitian_id: str, enabled: bool) -> dict:
+    """Start or stop the snapshot listener and remember the choice for the next start (blocking)"""
+    import sync_listener
+    
+    get_sync_db().set_setting(sync_listener.LISTENER_SETTING, "1" if enabled else "0")
+    if enabled:
+        remember_dietitian(dietitian_id)
+        sync_listener.listener.start(dietitian_id)
+    else:
+        sync_listener.listener.stop()
+    return sync_listener.listener.state()
+
+
+@router.post("/listener/start")
+async def start_listener(request: ListenerRequest):
+    """
+    Keep appointments up to date in real time with an on_snapshot listener
+    instead of polling; stays enabled across restarts until stopped.
+    """
+    await require_firebase()
+    
+    try:
+        return await run_blocking(set_listener, request.dietitianId, True)
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/listener/stop")
+async def stop_listener():
+    """Detach the snapshot listener (queued changes are applied first)"""
+    try:
+        # Not on the sync executor: stopping joins the listener threads
+        return await asyncio.to_thread(set_listener, None, False)
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/trigger")
+async def trigger_sync(reason: str = "manual"):
+    """
+    Ask the background scheduler for a sync run as soon as possible.
+    Triggers arriving while a run is queued or in progress are merged.
+    """
+    import sync_scheduler
+    
+    queued = sync_scheduler.scheduler.trigger(reason)
+    return {"queued": queued, "scheduler": sync_scheduler.scheduler.state()}
+
+
+@router.get("/jobs/{job_id}")
+async def get_sync_job(job_id: str):
+    """Status of a background sync job"""
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+def delete_appointment_everywhere(appointment_id: int):
+    """
+    Delete appointment from Firebase (if linked) and locally (blocking).
+    If the remote delete fails, the local delete's outbox entry retries it
+    on the next push.
+    """
+    db = get_sync_db()
+    conn = db.connect()
+    try:
         cursor = conn.cursor()
         
         # Get firebase_id before deleting
         cursor.execute("SELECT firebase_id FROM appointments WHERE id = ?", (appointment_id,))
         row = cursor.fetchone()
         
+        deleted_remotely = False
         if row and row['firebase_id'] and init_firebase():
             try:
                 db_firestore.collection('appointments').document(row['firebase_id']).delete()
+                deleted_remotely = True
             except Exception as e:
                 print(f"Failed to delete from Firebase: {e}")
         
         # Delete locally
-        cursor.execute("DELETE FROM appointments WHERE id = ?", (appointment_id,))
-        conn.commit()
-    
+        with conn:
+            if deleted_remotely:
+                with outbox_paused(conn):
+                    conn.execute("DELETE FROM sync_outbox WHERE table_name = 'appointments' AND row_id = ?", (appointment_id,))
+                    conn.execute("DELETE FROM appointments WHERE id = ?", (appointment_id,))
+            else:
+                conn.execute("DELETE FROM appointments WHERE id = ?", (appointment_id,))
+    finally:
+        db.close()
+
+
+@router.delete("/appointments/{appointment_id}")
+async def delete_appointment_sync(appointment_id: int, dietitian_id: str):
+    """Delete appointment from both local and Firebase"""
+    await run_blocking(delete_appointment_everywhere, appointment_id)
     return {"deleted": True}
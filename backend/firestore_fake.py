@@ -0,0 +1,530 @@
+"""
+In-process fake of the Firestore client subset used by firebase_sync.
+
+Lets the sync code run (and be benchmarked) without network access or
+credentials. Documents live in plain dicts; every RPC (query, document
+write, batch commit) can be given an artificial latency, and failures
+can be injected to exercise retry paths.
+
+Queries also support on_snapshot() listeners: changes are delivered from a
+background thread per listener, like the real client's watch stream, and
+break_watches() simulates a dropped stream.
+
+Enable it for the running API with DETOKS_FIRESTORE_FAKE=1, or pass an
+instance to firebase_sync.set_firestore_client().
+"""
+import enum
+import heapq
+import queue
+import random
+import string
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+MAX_BATCH_SIZE = 500
+
+_AUTO_ID_CHARS = string.ascii_letters + string.digits
+
+
+class _ServerTimestamp:
+    """Sentinel replaced by the commit time, like firestore.SERVER_TIMESTAMP."""
+
+    def __repr__(self):
+        return "SERVER_TIMESTAMP"
+
+
+SERVER_TIMESTAMP = _ServerTimestamp()
+
+
+# Error names match google.api_core.exceptions so callers can classify both alike
+class ServiceUnavailable(Exception):
+    """Transient error; the same request may succeed when retried."""
+
+
+class InvalidArgument(Exception):
+    """Permanent error; retrying the same request will fail again."""
+
+
+class NotFound(Exception):
+    """update() on a document that does not exist."""
+
+
+def auto_id() -> str:
+    """20-character document id, same shape as Firestore's auto ids."""
+    return "".join(random.choices(_AUTO_ID_CHARS, k=20))
+
+
+class ChangeType(enum.Enum):
+    """Same member names as google.cloud.firestore_v1.watch.ChangeType."""
+    ADDED = 1
+    REMOVED = 2
+    MODIFIED = 3
+
+
+class FakeDocumentChange:
+    """One entry of the `changes` list passed to an on_snapshot callback."""
+
+    def __init__(self, type: ChangeType, document, old_index: int, new_index: int):
+        self.type = type
+        self.document = document
+        self.old_index = old_index
+        self.new_index = new_index
+
+
+_OPERATORS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a is not None and a < b,
+    "<=": lambda a, b: a is not None and a <= b,
+    ">": lambda a, b: a is not None and a > b,
+    ">=": lambda a, b: a is not None and a >= b,
+    "in": lambda a, b: a in b,
+    "not-in": lambda a, b: a not in b,
+    "array-contains": lambda a, b: isinstance(a, list) and b in a,
+}
+
+
+class FakeDocumentSnapshot:
+    """Read-only view of a document at query time."""
+
+    def __init__(self, reference, data, update_time=None):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+        self.update_time = update_time
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return self._data.get(field) if self._data is not None else None
+
+
+class FakeDocumentReference:
+    """Reference to one document; writes are single-operation commits."""
+
+    def __init__(self, client, collection: str, doc_id: str):
+        self._client = client
+        self._collection = collection
+        self.id = doc_id
+
+    @property
+    def path(self) -> str:
+        return f"{self._collection}/{self.id}"
+
+    def get(self) -> FakeDocumentSnapshot:
+        self._client._rpc("get")
+        data, update_time = self._client._read(self._collection, self.id)
+        return FakeDocumentSnapshot(self, data, update_time)
+
+    def set(self, data: dict, merge: bool = False):
+        batch = self._client.batch()
+        batch.set(self, data, merge=merge)
+        return batch.commit()
+
+    def update(self, data: dict):
+        batch = self._client.batch()
+        batch.update(self, data)
+        return batch.commit()
+
+    def delete(self):
+        batch = self._client.batch()
+        batch.delete(self)
+        return batch.commit()
+
+
+class FakeQuery:
+    """Immutable query; each method returns a refined copy."""
+
+    def __init__(self, client, collection: str, filters=(), orders=(), limit=None, start_after=None):
+        self._client = client
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._start_after = start_after
+
+    def _copy(self, **changes):
+        state = {
+            "filters": self._filters,
+            "orders": self._orders,
+            "limit": self._limit,
+            "start_after": self._start_after,
+        }
+        state.update(changes)
+        return FakeQuery(self._client, self._collection, **state)
+
+    def where(self, field: str, op: str, value):
+        if op not in _OPERATORS:
+            raise InvalidArgument(f"Unsupported operator: {op}")
+        return self._copy(filters=self._filters + ((field, op, value),))
+
+    def order_by(self, field: str, direction: str = "ASCENDING"):
+        return self._copy(orders=self._orders + ((field, direction == "DESCENDING"),))
+
+    def limit(self, count: int):
+        return self._copy(limit=count)
+
+    def start_after(self, document):
+        """Accepts a snapshot or a dict of the ordered fields' values."""
+        if isinstance(document, FakeDocumentSnapshot):
+            values = document.to_dict()
+            values["__name__"] = document.id
+        else:
+            values = dict(document)
+        return self._copy(start_after=values)
+
+    def _sort_key(self, doc_id: str, data: dict):
+        key = []
+        for field, descending in self._orders:
+            value = doc_id if field == "__name__" else data.get(field)
+            key.append(_Ordered(value, descending))
+        key.append(_Ordered(doc_id, False))
+        return key
+
+    def _evaluate(self) -> list:
+        """Matching (doc_id, data, update_time) in query order (no RPC cost)."""
+        documents = self._client._documents(self._collection)
+
+        matched = [
+            (doc_id, data, update_time) for doc_id, (data, update_time) in documents.items()
+            if all(_OPERATORS[op](data.get(field), value) for field, op, value in self._filters)
+        ]
+
+        if self._start_after is not None:
+            cursor = self._sort_key(self._start_after.get("__name__", ""), self._start_after)
+            # Without __name__ in the cursor only the ordered fields are compared
+            size = len(self._orders) + (1 if "__name__" in self._start_after else 0)
+            matched = [item for item in matched if self._sort_key(item[0], item[1])[:size] > cursor[:size]]
+
+        sort_key = lambda item: self._sort_key(item[0], item[1])
+        if self._limit is not None:
+            # Paged queries only need the first `limit` documents, not a full sort
+            return heapq.nsmallest(self._limit, matched, key=sort_key)
+        matched.sort(key=sort_key)
+        return matched
+
+    def _snapshot(self, doc_id: str, data, update_time) -> FakeDocumentSnapshot:
+        return FakeDocumentSnapshot(FakeDocumentReference(self._client, self._collection, doc_id), data, update_time)
+
+    def stream(self):
+        """Evaluate the query with one RPC, then yield snapshots."""
+        self._client._rpc("query")
+        for doc_id, data, update_time in self._evaluate():
+            yield self._snapshot(doc_id, data, update_time)
+
+    def get(self):
+        return list(self.stream())
+
+    def on_snapshot(self, callback) -> "FakeWatch":
+        """Listen to the query: callback(docs, changes, read_time) from a background thread."""
+        return FakeWatch(self, callback)
+
+
+class FakeWatch:
+    """Listener handle, like the real client's Watch: unsubscribe() and is_active.
+
+    The first callback carries every matching document as ADDED; after that
+    each commit touching the collection wakes the listener, which diffs the
+    query result against what it delivered before. Commits that land while a
+    callback runs are merged into the next change set.
+    """
+
+    def __init__(self, query: FakeQuery, callback):
+        self._query = query
+        self._callback = callback
+        self._known = {}  # doc_id -> update_time delivered so far
+        self._delivered = False
+        self._wake = queue.Queue()
+        self._closed = False
+        self.error = None
+        query._client._add_watch(self)
+        self._wake.put(True)
+        self._thread = threading.Thread(target=self._run, name="fake-firestore-watch", daemon=True)
+        self._thread.start()
+
+    @property
+    def is_active(self) -> bool:
+        return not self._closed
+
+    def unsubscribe(self):
+        self._close()
+
+    def _close(self, error: Exception = None):
+        if self._closed:
+            return
+        self._closed = True
+        self.error = error
+        self._query._client._remove_watch(self)
+        self._wake.put(False)
+
+    def _notify(self):
+        self._wake.put(True)
+
+    def _run(self):
+        while True:
+            if not self._wake.get():
+                return
+            # Drain queued wake-ups: one diff covers them all
+            try:
+                while True:
+                    if not self._wake.get_nowait():
+                        return
+            except queue.Empty:
+                pass
+            if self._closed:
+                return
+
+            client = self._query._client
+            with client._lock:
+                matched = self._query._evaluate()
+                read_time = client._clock
+
+            changes = []
+            current = {}
+            for index, (doc_id, data, update_time) in enumerate(matched):
+                current[doc_id] = update_time
+                previous = self._known.get(doc_id)
+                if previous is None:
+                    changes.append(FakeDocumentChange(ChangeType.ADDED, self._query._snapshot(doc_id, data, update_time), -1, index))
+                elif previous != update_time:
+                    changes.append(FakeDocumentChange(ChangeType.MODIFIED, self._query._snapshot(doc_id, data, update_time), index, index))
+            for doc_id, update_time in self._known.items():
+                if doc_id not in current:
+                    snapshot = self._query._snapshot(doc_id, None, update_time)
+                    changes.append(FakeDocumentChange(ChangeType.REMOVED, snapshot, 0, -1))
+
+            self._known = current
+            if changes or not self._delivered:
+                self._delivered = True
+                docs = [self._query._snapshot(doc_id, data, update_time) for doc_id, data, update_time in matched]
+                try:
+                    self._callback(docs, changes, read_time)
+                except Exception as e:
+                    # The real client closes the stream when the callback raises
+                    self._close(e)
+                    return
+
+
+class _Ordered:
+    """Sort wrapper: None first, descending support, mixed types kept stable."""
+
+    __slots__ = ("value", "descending")
+
+    def __init__(self, value, descending: bool):
+        self.value = value
+        self.descending = descending
+
+    def _rank(self):
+        value = self.value
+        return (value is not None, type(value).__name__ if value is not None else "", value)
+
+    def __lt__(self, other):
+        a, b = self._rank(), other._rank()
+        if a[:2] != b[:2]:
+            return (a[:2] < b[:2]) != self.descending
+        return (a[2] < b[2]) if not self.descending else (a[2] > b[2])
+
+    def __gt__(self, other):
+        return other < self
+
+    def __eq__(self, other):
+        return self._rank() == other._rank()
+
+
+class FakeCollectionReference(FakeQuery):
+    """Collection; also the root query over all of its documents."""
+
+    def __init__(self, client, name: str):
+        super().__init__(client, name)
+        self.id = name
+
+    def document(self, doc_id: str = None) -> FakeDocumentReference:
+        """Reference to a document; without an id a new auto id is generated locally."""
+        return FakeDocumentReference(self._client, self.id, doc_id or auto_id())
+
+    def add(self, data: dict):
+        reference = self.document()
+        result = reference.set(data)
+        return result, reference
+
+
+class FakeWriteBatch:
+    """Up to MAX_BATCH_SIZE writes applied atomically on commit()."""
+
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def __len__(self):
+        return len(self._writes)
+
+    def _add(self, write):
+        if len(self._writes) >= MAX_BATCH_SIZE:
+            raise InvalidArgument(f"A batch can contain at most {MAX_BATCH_SIZE} writes")
+        self._writes.append(write)
+
+    def set(self, reference: FakeDocumentReference, data: dict, merge: bool = False):
+        self._add(("set", reference, dict(data), merge))
+
+    def update(self, reference: FakeDocumentReference, data: dict):
+        self._add(("update", reference, dict(data), True))
+
+    def delete(self, reference: FakeDocumentReference):
+        self._add(("delete", reference, None, False))
+
+    def commit(self):
+        return self._client._commit(self._writes)
+
+
+class FakeFirestore:
+    """The client object: collection(), batch() and fault injection hooks.
+
+    Args:
+        latency: Seconds slept per RPC (query, get, commit)
+        write_latency: Extra seconds per write inside a commit
+    """
+
+    SERVER_TIMESTAMP = SERVER_TIMESTAMP
+
+    def __init__(self, latency: float = 0.0, write_latency: float = 0.0):
+        self.latency = latency
+        self.write_latency = write_latency
+        self._lock = threading.RLock()
+        self._data = {}  # collection -> {doc_id: (data, update_time)}
+        self._clock = datetime.now(timezone.utc)
+        self._failures = []
+        self._watches = []
+        self.stats = {"rpcs": 0, "commits": 0, "writes": 0, "queries": 0}
+
+    # ---- API used by the sync code ----
+
+    def collection(self, name: str) -> FakeCollectionReference:
+        return FakeCollectionReference(self, name)
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
+
+    # ---- Test/benchmark helpers ----
+
+    def fail_next_commits(self, count: int = 1, error: Exception = None):
+        """The next `count` commits raise `error` (default: ServiceUnavailable)."""
+        for _ in range(count):
+            self._failures.append(lambda writes, error=error: error or ServiceUnavailable("injected"))
+
+    def reject_documents(self, doc_ids):
+        """Any commit that writes one of these ids fails with InvalidArgument, every time."""
+        rejected = set(doc_ids)
+
+        def check(writes):
+            for _, reference, _, _ in writes:
+                if reference.id in rejected:
+                    return InvalidArgument(f"Rejected document: {reference.id}")
+            return None
+
+        check.persistent = True
+        self._failures.append(check)
+
+    def break_watches(self, error: Exception = None):
+        """Drop every active listener stream (is_active turns False), like a lost connection."""
+        with self._lock:
+            watches = list(self._watches)
+        for watch in watches:
+            watch._close(error or ServiceUnavailable("watch stream closed"))
+
+    def dump(self, collection: str) -> dict:
+        """Copy of every document in a collection (no RPC cost)."""
+        with self._lock:
+            return {doc_id: dict(data) for doc_id, (data, _) in self._data.get(collection, {}).items()}
+
+    # ---- Internals ----
+
+    def _rpc(self, kind: str):
+        with self._lock:
+            self.stats["rpcs"] += 1
+            if kind == "query":
+                self.stats["queries"] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _now(self) -> datetime:
+        """Commit timestamp; strictly increasing so '>' queries never miss a write."""
+        now = datetime.now(timezone.utc)
+        if now <= self._clock:
+            now = self._clock + timedelta(microseconds=1)
+        self._clock = now
+        return now
+
+    def _add_watch(self, watch):
+        with self._lock:
+            self._watches.append(watch)
+
+    def _remove_watch(self, watch):
+        with self._lock:
+            if watch in self._watches:
+                self._watches.remove(watch)
+
+    def _read(self, collection: str, doc_id: str):
+        with self._lock:
+            return self._data.get(collection, {}).get(doc_id, (None, None))
+
+    def _documents(self, collection: str) -> dict:
+        with self._lock:
+            return dict(self._data.get(collection, {}))
+
+    def _check_failures(self, writes):
+        for check in list(self._failures):
+            error = check(writes)
+            if error is None:
+                continue
+            if not getattr(check, "persistent", False):
+                self._failures.remove(check)
+            return error
+        return None
+
+    def _commit(self, writes: list):
+        self._rpc("commit")
+        if self.write_latency:
+            time.sleep(self.write_latency * len(writes))
+
+        with self._lock:
+            error = self._check_failures(writes)
+            if error is not None:
+                raise error
+
+            now = self._now()
+            staged = {}
+            for op, reference, data, merge in writes:
+                key = (reference._collection, reference.id)
+                current = staged[key] if key in staged else self._data.get(key[0], {}).get(key[1], (None, None))[0]
+
+                if op == "delete":
+                    staged[key] = None
+                    continue
+                if op == "update" and current is None:
+                    raise NotFound(f"No document to update: {reference.path}")
+
+                values = {field: (now if value is SERVER_TIMESTAMP else value) for field, value in data.items()}
+                staged[key] = {**current, **values} if merge and current is not None else values
+
+            for (collection, doc_id), data in staged.items():
+                documents = self._data.setdefault(collection, {})
+                if data is None:
+                    documents.pop(doc_id, None)
+                else:
+                    documents[doc_id] = (data, now)
+
+            self.stats["commits"] += 1
+            self.stats["writes"] += len(writes)
+
+            touched = {collection for collection, _ in staged}
+            for watch in self._watches:
+                if watch._query._collection in touched:
+                    watch._notify()
+
+        return now
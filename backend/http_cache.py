@@ -0,0 +1,83 @@
+"""
+HTTP önbellek yardımcıları - katalog uç noktaları için ETag ve koşullu GET.
+
+ETag'ler table_versions sayaçlarından türetilir. Sayaçlar bellekte tutulur ve
+yalnızca db_watch token'ı değiştiğinde yeniden okunur; böylece değişmemiş bir
+katalog için If-None-Match isteği SQLite'a hiç dokunmadan 304 ile döner.
+Serileştirilmiş JSON gövdesi de sürüm başına bir kez üretilip saklanır.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from fastapi import Request, Response
+
+import db_watch
+
+MAX_ENTRIES = 64
+
+_lock = threading.Lock()
+_entries = OrderedDict()  # cache key -> (etag, body bytes)
+
+
+def make_etag(key: str, versions: dict, tables: tuple, variant: str = "") -> str:
+    """Anahtar, tablo sürümleri ve varyanttan güçlü bir ETag üret."""
+    parts = [key, str(versions.get('__epoch__', 0)), variant]
+    parts.extend(f"{table}:{versions.get(table, 0)}" for table in tables)
+    digest = hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:24]
+    return f'"{digest}"'
+
+
+def if_none_match(request: Request, etag: str) -> bool:
+    """İstemcinin If-None-Match başlığı bu ETag ile eşleşiyor mu."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match zayıf karşılaştırma kullanır (W/ öneki yok sayılır)
+    candidates = (tag.strip() for tag in header.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def serialize(data) -> bytes:
+    """JSON gövdesini kompakt UTF-8 bayt dizisine çevir."""
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def cached_json_response(request: Request, db, key: str, tables: tuple,
+                         build, variant: str = "") -> Response:
+    """
+    Koşullu GET: ETag eşleşirse 304, yoksa sürüm başına önbelleklenmiş JSON.
+
+    Args:
+        key: Uç nokta + parametreleri tanımlayan önbellek anahtarı
+        tables: Yanıtın bağlı olduğu tablolar
+        build: Önbellek boşsa veriyi üreten fonksiyon
+        variant: Tablo dışı girdiler (örn. config.json değerleri)
+    """
+    versions = db_watch.table_versions(db)
+    etag = make_etag(key, versions, tables, variant)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if if_none_match(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry[0] == etag:
+            _entries.move_to_end(key)
+            body = entry[1]
+        else:
+            body = None
+
+    if body is None:
+        body = serialize(build())
+        with _lock:
+            _entries[key] = (etag, body)
+            _entries.move_to_end(key)
+            while len(_entries) > MAX_ENTRIES:
+                _entries.popitem(last=False)
+
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,197 @@
+"""
+Görsel yükleme yardımcıları - avatar ve logo yüklemeleri için.
+
+Yüklemeler parça parça, threadpool'da ve kesin bir boyut sınırıyla diske
+yazılır; sınır UploadLimitMiddleware ile istek gövdesi okunurken de uygulanır,
+böylece büyük bir dosya multipart ayrıştırması bitmeden 413 ile reddedilir.
+Pillow kuruluysa yüklemeden bir kez küçültülmüş varyantlar (thumb, header)
+üretilir; dosyalar assets.AssetServer ile /static altından sunulur.
+Pillow yoksa yalnızca özgün dosya saklanır.
+"""
+import os
+import re
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+try:
+    from PIL import Image, ImageOps, features
+    PIL_AVAILABLE = True
+    WEBP_AVAILABLE = features.check("webp")
+except ImportError:
+    PIL_AVAILABLE = False
+    WEBP_AVAILABLE = False
+    print("Warning: Pillow not installed, uploads are stored without resized variants. Run: pip install pillow")
+
+MAX_UPLOAD_BYTES = 5 * 1024 * 1024
+CHUNK_SIZE = 256 * 1024
+# Multipart sınırları ve form alanları için gövdeye tanınan pay
+MULTIPART_OVERHEAD = 64 * 1024
+
+ALLOWED_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".gif", ".bmp"}
+
+# Varyant adı -> (en büyük boyut, biçim). header PNG: reportlab/python-docx WebP okuyamaz
+VARIANTS = {
+    "thumb": ((128, 128), "WEBP"),
+    "header": ((600, 200), "PNG"),
+}
+
+
+def _variant_format(fmt: str) -> tuple:
+    """(Pillow biçimi, uzantı); WebP desteklenmiyorsa PNG."""
+    if fmt == "WEBP" and not WEBP_AVAILABLE:
+        fmt = "PNG"
+    return fmt, "." + fmt.lower()
+
+
+def upload_extension(filename: str) -> str:
+    """Dosya uzantısını doğrula (küçük harfle döndür)."""
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext not in ALLOWED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail=f"Desteklenmeyen dosya türü: {ext or '-'}")
+    return ext
+
+
+def copy_limited(source, target_path: str, max_bytes: int = MAX_UPLOAD_BYTES) -> int:
+    """source dosyasını parça parça target_path'e yaz; sınır aşılırsa 413 (engelleyen)."""
+    written = 0
+    try:
+        with open(target_path, "wb") as target:
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_bytes:
+                    raise HTTPException(status_code=413, detail=f"Dosya en fazla {max_bytes // (1024 * 1024)} MB olabilir")
+                target.write(chunk)
+    except BaseException:
+        if os.path.exists(target_path):
+            os.remove(target_path)
+        raise
+    return written
+
+
+def make_variants(path: str, names: tuple = tuple(VARIANTS)) -> dict:
+    """Görseli doğrula ve istenen VARIANTS kopyalarını üret (engelleyen).
+
+    Returns:
+        {varyant adı: dosya yolu}; Pillow yoksa boş sözlük
+    """
+    if not PIL_AVAILABLE:
+        return {}
+
+    try:
+        with Image.open(path) as image:
+            image.verify()
+    except Exception:
+        raise HTTPException(status_code=400, detail="Dosya geçerli bir görsel değil")
+
+    variants = {}
+    with Image.open(path) as image:
+        # Telefon fotoğraflarındaki EXIF yönünü uygula; ilk kare yeterli (GIF)
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if image.mode in ("LA", "PA") or "transparency" in image.info else "RGB")
+
+        for name in names:
+            size, fmt = VARIANTS[name]
+            fmt, ext = _variant_format(fmt)
+            variant = image.copy()
+            variant.thumbnail(size, Image.LANCZOS)
+            variant_path = f"{path}.{name}{ext}"
+            options = {"quality": 85, "method": 4} if fmt == "WEBP" else {"optimize": True}
+            variant.save(variant_path, fmt, **options)
+            variants[name] = variant_path
+    return variants
+
+
+async def save_image_upload(upload, directory: str, filename_stem: str,
+                            variants: tuple = tuple(VARIANTS),
+                            max_bytes: int = MAX_UPLOAD_BYTES) -> dict:
+    """Yüklemeyi diske yaz ve varyantlarını üret (dosya işleri threadpool'da).
+
+    Returns:
+        {"filename": özgün dosya adı, "variants": {varyant adı: dosya adı}}
+    """
+    ext = upload_extension(upload.filename)
+    os.makedirs(directory, exist_ok=True)
+    filename = f"{filename_stem}{ext}"
+    path = os.path.join(directory, filename)
+
+    await run_in_threadpool(copy_limited, upload.file, path, max_bytes)
+    try:
+        created = await run_in_threadpool(make_variants, path, variants)
+    except BaseException:
+        os.remove(path)
+        raise
+
+    return {
+        "filename": filename,
+        "variants": {name: os.path.basename(variant) for name, variant in created.items()}
+    }
+
+
+def variant_path(path: str, name: str):
+    """Özgün dosya yolu için varyant dosyasının yolu (yoksa None)."""
+    _, ext = _variant_format(VARIANTS[name][1])
+    candidate = f"{path}.{name}{ext}"
+    return candidate if os.path.exists(candidate) else None
+
+
+def remove_with_variants(path: str):
+    """Özgün dosyayı ve varyantlarını sil (yoksa sessizce geç)."""
+    candidates = [path] + [f"{path}.{name}{ext}" for name in VARIANTS for ext in (".webp", ".png")]
+    for candidate in candidates:
+        try:
+            os.remove(candidate)
+        except OSError:
+            pass
+
+
+class UploadLimitMiddleware:
+    """Belirli yükleme yollarında istek gövdesini sınırla (ASGI).
+
+    Content-Length sınırı aşıyorsa istek hiç okunmadan 413 döner; başlık yoksa
+    (chunked) okunan baytlar sayılır ve sınır aşıldığı anda ayrıştırma 413 ile kesilir.
+    """
+
+    def __init__(self, app, paths: list, max_bytes: int = MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD):
+        self.app = app
+        self.paths = [re.compile(pattern) for pattern in paths]
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not any(pattern.match(scope["path"]) for pattern in self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        length = headers.get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            await self._reject(send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # FastAPI gövde ayrıştırırken HTTPException'ı olduğu gibi iletir
+                    raise HTTPException(status_code=413, detail="Request body too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    async def _reject(self, send):
+        body = b'{"detail":"Request body too large"}'
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
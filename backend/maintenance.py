@@ -0,0 +1,480 @@
+"""
+Database maintenance for DetoksBot
+Online backups and compaction of detoksbot.db from a daemon thread, started
+from the API lifespan.
+
+Backups use the sqlite3 backup API in small page steps with a pause between
+steps, so readers and writers are never blocked for more than one step. Each
+copy is checked (PRAGMA quick_check), gzip-compressed and rotated. Compaction
+(PRAGMA incremental_vacuum in steps, then PRAGMA optimize) only runs while the
+API has been idle for QUIET_SECONDS and stops as soon as requests come in;
+progress and the last results are served on /api/admin/maintenance.
+"""
+import glob
+import gzip
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from fastapi import APIRouter, Depends
+
+import auth
+from database import Database, get_data_dir
+
+router = APIRouter(prefix="/api/admin/maintenance", tags=["maintenance"])
+
+# Settings (settings table)
+INTERVAL_SETTING = "backup_interval_seconds"   # 0 disables scheduled backups; triggers still work
+KEEP_SETTING = "backup_keep"                   # number of compressed backups to keep
+DIR_SETTING = "backup_dir"                     # default: <data>/backups
+
+DEFAULT_INTERVAL = 24 * 3600.0
+DEFAULT_KEEP = 14
+STARTUP_DELAY = 60.0
+POLL_INTERVAL = 15.0
+
+BACKUP_STEP_PAGES = 128        # pages copied per backup step (512 KB with 4 KB pages)
+STEP_PAUSE = 0.01              # seconds between steps, lets other connections in
+MAX_BACKUP_RESTARTS = 5        # then copy the rest in a single step
+VACUUM_STEP_PAGES = 256        # freelist pages released per incremental_vacuum step
+QUIET_SECONDS = 120.0          # API idle time required before compaction
+# Databases without auto_vacuum=INCREMENTAL are converted with one VACUUM, only when this small
+CONVERT_MAX_BYTES = 32 * 1024 * 1024
+MAX_HISTORY = 20
+
+BACKUP_PREFIX = "detoksbot-"
+BACKUP_SUFFIX = ".db.gz"
+
+
+# ==================== ACTIVITY ====================
+
+class ActivityTracker:
+    """In-flight request count and time of the last request (for quiet periods)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._last = time.monotonic()
+
+    def begin(self):
+        with self._lock:
+            self._in_flight += 1
+            self._last = time.monotonic()
+
+    def end(self):
+        with self._lock:
+            self._in_flight -= 1
+            self._last = time.monotonic()
+
+    def quiet_for(self) -> float:
+        """Seconds since the last request finished (0 while requests are running)"""
+        with self._lock:
+            if self._in_flight:
+                return 0.0
+            return time.monotonic() - self._last
+
+
+activity = ActivityTracker()
+
+
+class ActivityMiddleware:
+    """ASGI middleware feeding `activity`; paths under `ignore` (status polling) do not count"""
+
+    def __init__(self, app, ignore: tuple = ()):
+        self.app = app
+        self.ignore = tuple(ignore)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.ignore):
+            await self.app(scope, receive, send)
+            return
+        activity.begin()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            activity.end()
+
+
+# ==================== BACKUP ====================
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def get_backup_dir(db: Database) -> str:
+    backup_dir = db.get_setting(DIR_SETTING, "") or os.path.join(get_data_dir(), "backups")
+    os.makedirs(backup_dir, exist_ok=True)
+    return backup_dir
+
+
+def list_backups(backup_dir: str) -> list:
+    """Compressed backups in the directory, newest first"""
+    backups = []
+    for path in glob.glob(os.path.join(backup_dir, f"{BACKUP_PREFIX}*{BACKUP_SUFFIX}")):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        backups.append({
+            "name": os.path.basename(path),
+            "bytes": stat.st_size,
+            "createdAt": datetime.fromtimestamp(stat.st_mtime).isoformat(timespec="seconds"),
+            "mtime": stat.st_mtime
+        })
+    backups.sort(key=lambda backup: backup["mtime"], reverse=True)
+    return backups
+
+
+def rotate_backups(backup_dir: str, keep: int) -> list:
+    """Delete all but the `keep` newest backups; returns the deleted names"""
+    deleted = []
+    for backup in list_backups(backup_dir)[max(keep, 1):]:
+        try:
+            os.remove(os.path.join(backup_dir, backup["name"]))
+            deleted.append(backup["name"])
+        except OSError:
+            pass
+    return deleted
+
+
+def backup_database(db_path: str, backup_dir: str, progress=None) -> dict:
+    """
+    Copy the database in page steps, verify and gzip the copy.
+    progress(phase, done, total) is called after every step.
+    """
+    started = time.perf_counter()
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    gz_path = os.path.join(backup_dir, f"{BACKUP_PREFIX}{stamp}{BACKUP_SUFFIX}")
+    sequence = 1
+    while os.path.exists(gz_path):
+        # Several backups within one second (manual triggers)
+        sequence += 1
+        gz_path = os.path.join(backup_dir, f"{BACKUP_PREFIX}{stamp}-{sequence}{BACKUP_SUFFIX}")
+    raw_path = gz_path[:-len(BACKUP_SUFFIX)] + ".db.tmp"
+    restarts = 0
+    last_remaining = None
+
+    def on_step(status, remaining, total):
+        nonlocal restarts, last_remaining
+        if last_remaining is not None and remaining > last_remaining:
+            # Another connection wrote to the source: the copy starts over
+            restarts += 1
+            if restarts > MAX_BACKUP_RESTARTS:
+                raise _TooManyRestarts()
+        last_remaining = remaining
+        if progress:
+            progress("backup", total - remaining, total)
+        time.sleep(STEP_PAUSE)
+
+    try:
+        source = sqlite3.connect(db_path, uri=True)
+        try:
+            target = sqlite3.connect(raw_path)
+            try:
+                try:
+                    source.backup(target, pages=BACKUP_STEP_PAGES, progress=on_step)
+                    single_step = False
+                except _TooManyRestarts:
+                    # Busy source: copy the rest in one step (holds a read lock only while copying)
+                    source.backup(target)
+                    single_step = True
+                check = target.execute("PRAGMA quick_check").fetchone()[0]
+                pages = target.execute("PRAGMA page_count").fetchone()[0]
+            finally:
+                target.close()
+        finally:
+            source.close()
+
+        if check != "ok":
+            raise RuntimeError(f"Backup copy failed quick_check: {check}")
+        raw_bytes = os.path.getsize(raw_path)
+        if progress:
+            progress("compress", 0, raw_bytes)
+        with open(raw_path, "rb") as src, gzip.open(f"{gz_path}.tmp", "wb", compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.replace(f"{gz_path}.tmp", gz_path)
+    finally:
+        for path in (raw_path, f"{gz_path}.tmp"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    return {
+        "file": os.path.basename(gz_path),
+        "pages": pages,
+        "bytes": raw_bytes,
+        "compressedBytes": os.path.getsize(gz_path),
+        "restarts": restarts,
+        "singleStep": single_step,
+        "seconds": round(time.perf_counter() - started, 3)
+    }
+
+
+# ==================== COMPACTION ====================
+
+def compact_database(db_path: str, should_stop=None, progress=None) -> dict:
+    """
+    Release free pages with PRAGMA incremental_vacuum in steps, then PRAGMA optimize.
+    should_stop() is checked between steps; an interrupted run leaves the rest for later.
+    """
+    started = time.perf_counter()
+    should_stop = should_stop or (lambda: False)
+    conn = sqlite3.connect(db_path, uri=True, isolation_level=None)
+    try:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        free_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        result = {"freePagesBefore": free_before, "converted": False, "interrupted": False}
+
+        if auto_vacuum != 2:
+            if page_count * page_size > CONVERT_MAX_BYTES:
+                # Switching to incremental needs a full VACUUM; too long to block on for a large file
+                result["skipped"] = "auto_vacuum is not INCREMENTAL and the database is too large to convert"
+            elif not should_stop():
+                if progress:
+                    progress("vacuum", 0, page_count)
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                conn.execute("VACUUM")
+                result["converted"] = True
+        else:
+            freed = 0
+            while True:
+                free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if not free:
+                    break
+                if should_stop():
+                    result["interrupted"] = True
+                    break
+                # The pragma frees one page per statement step and returns no columns, which
+                # execute() treats as done after the first step; executescript runs it to the end
+                conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_STEP_PAGES});")
+                freed += min(free, VACUUM_STEP_PAGES)
+                if progress:
+                    progress("vacuum", freed, free_before)
+                time.sleep(STEP_PAUSE)
+
+        if not result["interrupted"]:
+            if progress:
+                progress("optimize", 0, 0)
+            conn.execute("PRAGMA optimize")
+
+        free_after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        result.update({
+            "freePagesAfter": free_after,
+            "bytesReleased": (page_count - conn.execute("PRAGMA page_count").fetchone()[0]) * page_size,
+            "seconds": round(time.perf_counter() - started, 3)
+        })
+        return result
+    finally:
+        conn.close()
+
+
+# ==================== SCHEDULER ====================
+
+class MaintenanceScheduler:
+    """Interval backups + compaction in quiet periods; one job at a time"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._backup_requested = False
+        self._compact_requested = False   # manual: runs without waiting for a quiet period
+        self._compact_pending = False     # after a backup: waits for a quiet period
+        self._next_backup_at = None
+        self._job = None
+        self._progress = None
+        self._progress_started = None
+        self._last = {}
+        self._history = []
+
+    # ---- Control ----
+
+    def start(self, delay: float = None):
+        """Start the maintenance thread (no-op if already running)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._wake.clear()
+            self._next_backup_at = self._first_backup_at(delay)
+            self._thread = threading.Thread(target=self._loop, name="db-maintenance", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the thread; a running job stops at its next step"""
+        self._stopping.set()
+        self._wake.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        with self._lock:
+            self._thread = None
+
+    def trigger_backup(self, compact: bool = False) -> bool:
+        """Ask for a backup as soon as possible; False if one was already queued"""
+        with self._lock:
+            queued = self._backup_requested
+            self._backup_requested = True
+            self._compact_requested = self._compact_requested or compact
+        self._wake.set()
+        return not queued
+
+    def trigger_compaction(self) -> bool:
+        """Ask for a compaction now, without waiting for a quiet period"""
+        with self._lock:
+            queued = self._compact_requested
+            self._compact_requested = True
+        self._wake.set()
+        return not queued
+
+    def state(self) -> dict:
+        """Progress, last results and backups for /api/admin/maintenance"""
+        db = Database()
+        backup_dir = get_backup_dir(db)
+        with self._lock:
+            next_backup = self._next_backup_at
+            state = {
+                "active": self._thread is not None and self._thread.is_alive(),
+                "job": self._job,
+                "progress": dict(self._progress) if self._progress else None,
+                "nextBackupAt": datetime.fromtimestamp(next_backup).isoformat(timespec="seconds")
+                if next_backup else None,
+                "compactionPending": self._compact_pending or self._compact_requested,
+                "quietSeconds": round(activity.quiet_for(), 1),
+                "last": {name: dict(run) for name, run in self._last.items()},
+                "history": list(self._history)
+            }
+        state["backupDir"] = backup_dir
+        state["keep"] = self._keep(db)
+        state["backups"] = [
+            {key: value for key, value in backup.items() if key != "mtime"} for backup in list_backups(backup_dir)
+        ]
+        return state
+
+    # ---- Loop ----
+
+    def _interval(self, db) -> float:
+        """Configured backup interval in seconds (None = scheduled backups disabled)"""
+        try:
+            interval = float(db.get_setting(INTERVAL_SETTING, DEFAULT_INTERVAL))
+        except (TypeError, ValueError):
+            interval = DEFAULT_INTERVAL
+        return interval if interval > 0 else None
+
+    def _keep(self, db) -> int:
+        try:
+            return max(int(db.get_setting(KEEP_SETTING, DEFAULT_KEEP)), 1)
+        except (TypeError, ValueError):
+            return DEFAULT_KEEP
+
+    def _first_backup_at(self, delay: float = None) -> float:
+        """Continue the schedule from the newest backup, so restarts do not back up again"""
+        db = Database()
+        interval = self._interval(db)
+        if interval is None:
+            return None
+        soonest = time.time() + (STARTUP_DELAY if delay is None else delay)
+        backups = list_backups(get_backup_dir(db))
+        if backups:
+            return max(backups[0]["mtime"] + interval, soonest)
+        return soonest
+
+    def _set_progress(self, phase: str, done: int, total: int):
+        with self._lock:
+            self._progress = {
+                "phase": phase,
+                "done": done,
+                "total": total,
+                "percent": round(done / total * 100, 1) if total else None,
+                "elapsedSeconds": round(time.time() - self._progress_started, 1)
+            }
+
+    def _run(self, job: str, func) -> dict:
+        with self._lock:
+            self._job = job
+            self._progress_started = time.time()
+            self._progress = None
+        started_at = datetime.now().isoformat(timespec="seconds")
+        try:
+            run = {"status": "success", **func()}
+        except Exception as e:
+            run = {"status": "error", "error": str(e)}
+        run = {"job": job, "startedAt": started_at, **run}
+        with self._lock:
+            self._job = None
+            self._progress = None
+            self._last[job] = run
+            self._history.insert(0, run)
+            del self._history[MAX_HISTORY:]
+        return run
+
+    def _loop(self):
+        while not self._stopping.is_set():
+            self._wake.wait(POLL_INTERVAL)
+            self._wake.clear()
+            if self._stopping.is_set():
+                break
+
+            db = Database()
+            now = time.time()
+            with self._lock:
+                due = self._next_backup_at is not None and now >= self._next_backup_at
+                backup = self._backup_requested or due
+                self._backup_requested = False
+
+            if backup:
+                run = self._run("backup", lambda: self._backup(db))
+                interval = self._interval(db)
+                with self._lock:
+                    self._next_backup_at = time.time() + interval if interval else None
+                    if run["status"] == "success":
+                        self._compact_pending = True
+
+            with self._lock:
+                forced = self._compact_requested
+                compact = forced or (self._compact_pending and activity.quiet_for() >= QUIET_SECONDS)
+                self._compact_requested = False
+
+            if compact:
+                def should_stop():
+                    return self._stopping.is_set() or (not forced and activity.quiet_for() < QUIET_SECONDS)
+
+                run = self._run("compaction", lambda: compact_database(db.db_path, should_stop, self._set_progress))
+                with self._lock:
+                    self._compact_pending = run["status"] != "success" or run.get("interrupted", False)
+
+    def _backup(self, db) -> dict:
+        backup_dir = get_backup_dir(db)
+        result = backup_database(db.db_path, backup_dir, self._set_progress)
+        result["deleted"] = rotate_backups(backup_dir, self._keep(db))
+        return result
+
+
+scheduler = MaintenanceScheduler()
+
+
+# ==================== ENDPOINTS ====================
+
+@router.get("")
+def get_maintenance_status(admin: dict = Depends(auth.require_admin)):
+    """Backup/compaction progress, last runs and the kept backups"""
+    return scheduler.state()
+
+
+@router.post("/backup")
+def start_backup(compact: bool = False, admin: dict = Depends(auth.require_admin)):
+    """Queue an online backup (and, with ?compact=true, a compaction right after it)"""
+    queued = scheduler.trigger_backup(compact)
+    return {"status": "queued" if queued else "already_queued"}
+
+
+@router.post("/compact")
+def start_compaction(admin: dict = Depends(auth.require_admin)):
+    """Queue an incremental vacuum + optimize without waiting for a quiet period"""
+    queued = scheduler.trigger_compaction()
+    return {"status": "queued" if queued else "already_queued"}
@@ -0,0 +1,109 @@
+"""
+Sayfalama yardımcıları - keyset imleçleri ve akış halinde JSON yanıtları.
+
+Liste uç noktaları satırları bir generator üzerinden tek tek serileştirir;
+tüm liste bellekte hiçbir zaman oluşturulmaz.
+"""
+import base64
+import json
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+MAX_PAGE_SIZE = 5000
+
+
+def encode_cursor(values: tuple) -> str:
+    """Keyset değerlerini opak, URL güvenli bir imlece çevir."""
+    raw = json.dumps(list(values), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, types: tuple) -> tuple:
+    """İmleci keyset değerlerine çöz; geçersizse 400 döndür.
+
+    Args:
+        token: encode_cursor çıktısı
+        types: Her sıralama anahtarının beklenen tipi, örn. (str, int);
+            NULL olabilen anahtarlar için (str, type(None)) gibi bir tuple
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(types):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    for value, expected in zip(values, types):
+        # bool bir int alt sınıfıdır; imleçte anlamı yok
+        if isinstance(value, bool) or not isinstance(value, expected):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    return tuple(values)
+
+
+def parse_fields(fields: str, mapping: dict) -> list:
+    """'a,b,c' biçimindeki alan listesini sütun adlarına çevir.
+
+    Args:
+        fields: İstemcinin istediği (API) alan adları
+        mapping: API alan adı -> veritabanı sütunu
+    """
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in mapping]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return names
+
+
+def check_limit(limit: int) -> int:
+    """Sayfa boyutunu doğrula."""
+    if limit is not None and not 0 < limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be in 1..{MAX_PAGE_SIZE}")
+    return limit
+
+
+def _dump(item) -> bytes:
+    return json.dumps(item, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def stream_array(rows, convert):
+    """Satırları JSON dizisi olarak parça parça üret."""
+    yield b"["
+    first = True
+    for row in rows:
+        if not first:
+            yield b","
+        yield _dump(convert(row))
+        first = False
+    yield b"]"
+
+
+def stream_page(rows, convert, limit: int, cursor_key):
+    """Bir sayfayı {"items": [...], "next_after": imleç} olarak parça parça üret.
+
+    `rows` en fazla limit + 1 satır içermeli; fazladan satır varsa sonraki sayfa vardır
+    ve imleç sayfanın son satırından üretilir.
+    """
+    yield b'{"items":['
+    count = 0
+    last = None
+    has_more = False
+    for row in rows:
+        if count == limit:
+            has_more = True
+            break
+        if count:
+            yield b","
+        yield _dump(convert(row))
+        last = row
+        count += 1
+
+    next_after = encode_cursor(cursor_key(last)) if has_more and last is not None else None
+    yield b'],"next_after":' + _dump(next_after) + b"}"
+
+
+def json_stream_response(chunks) -> StreamingResponse:
+    """Bayt parçalarından akış halinde JSON yanıtı oluştur."""
+    return StreamingResponse(chunks, media_type="application/json")
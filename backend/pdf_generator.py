@@ -3,6 +3,7 @@ PDF oluşturucu modülü - ReportLab ile Türkçe destekli PDF oluşturma.
 """
 import os
 import datetime
+import threading
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import cm
@@ -16,6 +17,11 @@ from reportlab.lib.enums import TA_CENTER, TA_LEFT
 class PDFGenerator:
     """PDF oluşturucu sınıfı."""
     
+    # Font kaydı ve stil şablonları süreç boyunca bir kez yapılır
+    _setup_lock = threading.Lock()
+    _registered_font_name = None
+    _styles_by_font = {}
+    
     def __init__(self, footer_info: dict = None):
         """PDF oluşturucuyu başlat.
         
@@ -27,7 +33,15 @@ class PDFGenerator:
         self._setup_styles()
     
     def _register_fonts(self):
-        """Comic Sans MS fontunu kaydet (normal ve bold)."""
+        """Comic Sans MS fontunu kaydet (normal ve bold). TTF dosyaları yalnızca ilk seferde okunur."""
+        with PDFGenerator._setup_lock:
+            if PDFGenerator._registered_font_name is None:
+                PDFGenerator._registered_font_name = self._load_fonts()
+        self.font_name = PDFGenerator._registered_font_name
+    
+    @staticmethod
+    def _load_fonts() -> str:
+        """Font dosyalarını bul, kaydet ve kullanılacak font adını döndür."""
         from reportlab.pdfbase.pdfmetrics import registerFontFamily
         
         # Normal font
@@ -70,15 +84,25 @@ class PDFGenerator:
         if normal_registered and bold_registered:
             # Font ailesini kaydet (bu sayede <b> tag'i çalışır)
             registerFontFamily('ComicSans', normal='ComicSans', bold='ComicSansBold')
-            self.font_name = 'ComicSans'
+            return 'ComicSans'
         elif normal_registered:
-            self.font_name = 'ComicSans'
+            return 'ComicSans'
         else:
-            self.font_name = 'Helvetica'
+            return 'Helvetica'
     
     def _setup_styles(self):
-        """Stil şablonlarını oluştur."""
-        self.styles = getSampleStyleSheet()
+        """Stil şablonlarını oluştur (font başına bir kez, sonra paylaşılır)."""
+        with PDFGenerator._setup_lock:
+            styles = PDFGenerator._styles_by_font.get(self.font_name)
+            if styles is None:
+                styles = self._build_styles()
+                PDFGenerator._styles_by_font[self.font_name] = styles
+        self.styles = styles
+    
+    def _build_styles(self):
+        """Stil şablonlarını sıfırdan oluştur."""
+        styles = getSampleStyleSheet()
+        self.styles = styles
         
         # Kapak başlık stili
         self.styles.add(ParagraphStyle(
@@ -196,6 +220,8 @@ class PDFGenerator:
             alignment=TA_CENTER,
             textColor=colors.HexColor('#7f8c8d')
         ))
+        
+        return styles
     
     def _get_meal_style_and_name(self, meal_type: str, meal_name: str, time: str):
         """Öğün türüne göre stil ve görünen adı döndür."""
@@ -308,14 +308,15 @@ hastalik_recipes = [
 
 print("Tarifler ekleniyor...")
 
-# Normal tarifleri ekle
+# Tek bağlantı ve tek transaction ile toplu ekle (tarif başına commit yerine)
+columns = ("name", "meal_type", "pool_type", "bki_21_25", "bki_26_29", "bki_30_33", "bki_34_plus")
+db.import_recipes(
+    dict(zip(columns, recipe), seasons="yaz,kis")
+    for recipe in normal_recipes + hastalik_recipes
+)
 for recipe in normal_recipes:
-    db.add_recipe(*recipe)
     print(f"  + {recipe[0]} (Normal)")
-
-# Hastalık tariflerini ekle
 for recipe in hastalik_recipes:
-    db.add_recipe(*recipe)
     print(f"  + {recipe[0]} (Hastalik)")
 
 print(f"\n[OK] Toplam {len(normal_recipes) + len(hastalik_recipes)} tarif eklendi!")
@@ -1,7 +1,8 @@
-from database import Database, get_season_db_path
+from database import Database, get_db_path
 
-print(f"Populating DB at: {get_season_db_path()}")
+print(f"Populating DB at: {get_db_path()}")
 db = Database()
+db.initialize()
 
 # Recipes to add
 recipes = [
@@ -37,25 +38,26 @@ recipes = [
     }
 ]
 
-conn = db.connect()
-cursor = conn.cursor()
-
 try:
-    count = 0
-    for r in recipes:
-        # Check if exists
-        cursor.execute("SELECT COUNT(*) FROM recipes WHERE name = ?", (r['name'],))
-        if cursor.fetchone()[0] == 0:
-            db.add_recipe(
-                r['name'], 
-                r['meal_type'], 
-                r['pool_type'], 
-                r['content'], r['content'], r['content'], r['content']
-            )
-            count += 1
-            
-    print(f"Added {count} sample recipes.")
+    # Aynı adla zaten var olanları atla; kalanları tek transaction'da ekle
+    conn = db.connect()
+    try:
+        existing = {row[0] for row in conn.execute("SELECT name FROM recipes")}
+    finally:
+        db.close()
+    
+    new_recipes = [
+        {
+            "name": r['name'],
+            "meal_type": r['meal_type'],
+            "pool_type": r['pool_type'],
+            "seasons": "yaz,kis",
+            "bki_21_25": r['content'], "bki_26_29": r['content'],
+            "bki_30_33": r['content'], "bki_34_plus": r['content']
+        }
+        for r in recipes if r['name'] not in existing
+    ]
+    result = db.import_recipes(new_recipes)
+    print(f"Added {result['inserted']} sample recipes.")
 except Exception as e:
     print(f"Error: {e}")
-finally:
-    db.close()
@@ -0,0 +1,369 @@
+# -*- coding: utf-8 -*-
+"""
+Sentetik büyük veri seti üretici - ölçek testleri ve benchmark'lar için.
+
+Aynı preset ve tohum (--seed) her zaman aynı veritabanını üretir: rastgelelik
+tek bir random.Random örneğinden gelir, tarih/saatler sabit bir referans
+günden türetilir ve kullanıcı şifre hash'leri sabit tuzla hesaplanır.
+Böylece her benchmark aynı, yeniden üretilebilir veri üzerinde çalışır.
+
+Üretilenler:
+- Paketler (save_path geçici klasörde)
+- Tarifler: Türkçe ad ve içerikler, BKİ grubuna göre büyüyen porsiyonlar,
+  sezon karışımı (%60 yaz+kış, %20 yaz, %20 kış); paket üyeliği Zipf
+  dağılımıyla çarpık (ilk paketler çok daha kalabalık)
+- Randevular: referans günden önceki/sonraki iki yıla yayılmış, geçmiştekiler
+  çoğunlukla tamamlanmış; senkronize sayılır (outbox'a düşmez)
+- Kullanıcılar: hepsinin şifresi SYNTHETIC_PASSWORD
+
+Yazımlar executemany ile parçalar halinde yapılır; üretim sırasında
+synchronous=OFF kullanılır (hedef her seferinde sıfırdan oluşturulan bir dosya).
+
+Kullanım:
+    python populate_synthetic.py --preset small
+    python populate_synthetic.py --preset large --output /tmp/large.db
+    python populate_synthetic.py --preset medium --recipes 50000 --seed 7 --force
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import bcrypt
+
+import catalog
+from database import Database, get_data_dir, outbox_paused, username_key
+
+# Ölçek presetleri (benchmark'lar ada göre başvurur)
+PRESETS = {
+    "tiny": {"recipes": 500, "packages": 10, "appointments": 2_000, "users": 20},
+    "small": {"recipes": 5_000, "packages": 40, "appointments": 50_000, "users": 200},
+    "medium": {"recipes": 20_000, "packages": 100, "appointments": 250_000, "users": 1_000},
+    "large": {"recipes": 100_000, "packages": 200, "appointments": 1_000_000, "users": 5_000},
+}
+
+DEFAULT_SEED = 42
+CHUNK_SIZE = 10_000
+REFERENCE_DAY = date(2026, 1, 1)
+SYNTHETIC_PASSWORD = "synthetic"
+# Zipf üssü: 1'e yakın -> güçlü çarpıklık
+PACKAGE_SKEW = 1.1
+
+# ==================== SÖZLÜK ====================
+
+PROTEINS = [
+    ("tavuk göğsü", "g", 100), ("hindi füme", "g", 60), ("somon", "g", 120), ("ton balığı", "g", 80),
+    ("kırmızı et", "g", 100), ("köfte", "g", 90), ("yumurta", "adet", 2), ("lor peyniri", "g", 60),
+    ("beyaz peynir", "g", 40), ("nohut", "yemek kaşığı", 6), ("kuru fasulye", "yemek kaşığı", 6),
+    ("yeşil mercimek", "yemek kaşığı", 6), ("levrek", "g", 150), ("süzme yoğurt", "yemek kaşığı", 4),
+]
+CARBS = [
+    ("bulgur pilavı", "yemek kaşığı", 4), ("esmer pirinç", "yemek kaşığı", 4), ("tam buğday ekmeği", "dilim", 1),
+    ("çavdar ekmeği", "dilim", 1), ("yulaf ezmesi", "yemek kaşığı", 3), ("haşlanmış patates", "adet", 1),
+    ("karabuğday", "yemek kaşığı", 4), ("tam buğday makarna", "yemek kaşığı", 5), ("galeta", "adet", 2),
+]
+VEGETABLES = [
+    "ıspanak", "brokoli", "kabak", "havuç", "roka", "semizotu", "domates", "salatalık", "biber",
+    "mantar", "pırasa", "karnabahar", "enginar", "taze fasulye", "kereviz", "marul", "lahana",
+]
+EXTRAS = [
+    ("zeytinyağı", "tatlı kaşığı", 1), ("ceviz", "adet", 2), ("badem", "adet", 5), ("fındık", "adet", 5),
+    ("zeytin", "adet", 5), ("avokado", "dilim", 2), ("keten tohumu", "tatlı kaşığı", 1),
+    ("chia tohumu", "tatlı kaşığı", 1), ("tarçın", "çay kaşığı", 1), ("limon suyu", "yemek kaşığı", 1),
+]
+FRUITS = ["elma", "armut", "muz", "çilek", "kivi", "portakal", "mandalina", "şeftali", "kayısı", "erik"]
+DRINKS = ["yeşil çay", "ıhlamur", "ada çayı", "maden suyu", "ayran", "kefir", "limonlu su", "rezene çayı"]
+COOKING = ["Izgara", "Fırında", "Haşlanmış", "Buğulama", "Sote", "Zeytinyağlı", "Közlenmiş", "Fırın"]
+DISH_SUFFIX = ["Tabağı", "Salatası", "Kasesi", "Dürümü", "Güveci", "Çorbası", "Bowl", "Tostu"]
+
+FIRST_NAMES = [
+    "Ayşe", "Fatma", "Emine", "Hatice", "Zeynep", "Elif", "Merve", "Büşra", "Selin", "Deniz",
+    "Mehmet", "Mustafa", "Ahmet", "Ali", "Hüseyin", "Hasan", "İbrahim", "Emre", "Burak", "Can",
+    "Şeyma", "Gülşen", "Özlem", "Çağla", "İrem", "Ömer", "Uğur", "Gökhan", "Tuğba", "Sevgi",
+]
+LAST_NAMES = [
+    "Yılmaz", "Kaya", "Demir", "Şahin", "Çelik", "Yıldız", "Yıldırım", "Öztürk", "Aydın", "Özdemir",
+    "Arslan", "Doğan", "Kılıç", "Aslan", "Çetin", "Kara", "Koç", "Kurt", "Özkan", "Şimşek",
+]
+APPOINTMENT_TYPES = ["Ön görüşme", "Ölçüm", "Andulasyon", "Spor Salonu"]
+PACKAGE_THEMES = ["Detoks", "Kilo Verme", "Sporcu", "Vejetaryen", "Diyabet", "Gebelik", "Kilo Alma", "Akdeniz"]
+
+# BKİ grubu başına porsiyon çarpanı (catalog.BKI_COLUMNS sırasıyla)
+BKI_SCALES = (1.0, 1.25, 1.5, 1.75)
+
+
+# ==================== ÜRETİCİLER ====================
+
+def _amount(base: float, unit: str, scale: float) -> str:
+    value = base * scale
+    if unit == "g":
+        return f"{int(round(value / 10.0) * 10)}g"
+    if unit in ("adet", "dilim"):
+        return f"{max(int(round(value)), 1)} {unit}"
+    rounded = round(value * 2) / 2
+    text = str(int(rounded)) if rounded == int(rounded) else str(rounded).replace(".", ",")
+    return f"{text} {unit}"
+
+
+def _portion(item: tuple, scale: float) -> str:
+    name, unit, base = item
+    return f"{_amount(base, unit, scale)} {name}"
+
+
+def recipe_texts(rng: random.Random, meal_type: str) -> tuple:
+    """(ad, [bki_21_25, bki_26_29, bki_30_33, bki_34_plus]) üret."""
+    if meal_type == "ozel_icecek":
+        drink = rng.choice(DRINKS)
+        extra = rng.choice(EXTRAS)
+        name = f"{drink.capitalize()} ve {extra[0]}"
+        texts = [f"{1 + i // 2} bardak {drink}, {_portion(extra, scale)}" for i, scale in enumerate(BKI_SCALES)]
+        return name, texts
+
+    if meal_type.startswith("ara_ogun"):
+        fruit = rng.choice(FRUITS)
+        extra = rng.choice(EXTRAS)
+        name = f"{fruit.capitalize()} ve {extra[0].capitalize()}"
+        texts = [f"{_amount(1, 'porsiyon', scale)} {fruit}, {_portion(extra, scale)}" for scale in BKI_SCALES]
+        return name, texts
+
+    protein = rng.choice(PROTEINS)
+    carb = rng.choice(CARBS)
+    vegetables = rng.sample(VEGETABLES, 2)
+    extra = rng.choice(EXTRAS)
+    if meal_type == "kahvalti":
+        name = f"{protein[0].capitalize()} ile Kahvaltı {rng.choice(DISH_SUFFIX)}"
+    else:
+        name = f"{rng.choice(COOKING)} {protein[0].capitalize()} {rng.choice(DISH_SUFFIX)}"
+    texts = [
+        f"{_portion(protein, scale)}, {_portion(carb, scale)}, "
+        f"{vegetables[0]} ve {vegetables[1]}, {_portion(extra, scale)}"
+        for scale in BKI_SCALES
+    ]
+    return name, texts
+
+
+def zipf_weights(count: int, skew: float = PACKAGE_SKEW) -> list:
+    """Kümülatif Zipf ağırlıkları (rng.choices(cum_weights=...) için)."""
+    total = 0.0
+    cumulative = []
+    for rank in range(1, count + 1):
+        total += 1.0 / rank ** skew
+        cumulative.append(total)
+    return cumulative
+
+
+def iter_recipes(rng: random.Random, count: int, package_ids: list):
+    """Database.import_recipes için tarif sözlükleri üret."""
+    meal_types = catalog.MEAL_TYPES
+    # Ana öğünler daha kalabalık
+    meal_weights = [3, 2, 3, 2, 3, 1, 1]
+    cum_weights = zipf_weights(len(package_ids)) if package_ids else None
+    seasons = ("yaz,kis", "yaz", "kis")
+
+    for i in range(count):
+        meal_type = rng.choices(meal_types, weights=meal_weights)[0]
+        name, texts = recipe_texts(rng, meal_type)
+        recipe = dict(zip(catalog.BKI_COLUMNS, texts))
+        recipe.update({
+            "name": f"{name} #{i + 1}",
+            "meal_type": meal_type,
+            "pool_type": "hastalik" if rng.random() < 0.15 else "normal",
+            "seasons": rng.choices(seasons, weights=(6, 2, 2))[0],
+        })
+        if cum_weights:
+            memberships = rng.choices(package_ids, cum_weights=cum_weights, k=rng.choice((1, 1, 2, 2, 3, 4)))
+            recipe["package_ids"] = list(dict.fromkeys(memberships))
+        yield recipe
+
+
+def iter_appointments(rng: random.Random, count: int, clients: int):
+    """appointments satırları (senkronize sayılır: firebase_id ve synced_at dolu)."""
+    span = 730  # referans günden önce ve sonra iki yıl
+    synced_at = f"{REFERENCE_DAY.isoformat()}T00:00:00"
+    for i in range(count):
+        client = rng.randrange(clients)
+        first = FIRST_NAMES[client % len(FIRST_NAMES)]
+        last = LAST_NAMES[(client // len(FIRST_NAMES)) % len(LAST_NAMES)]
+        offset = rng.randint(-span, span)
+        day = REFERENCE_DAY + timedelta(days=offset)
+        minutes = 9 * 60 + rng.randrange(40) * 15
+        if offset < 0:
+            status = rng.choices(("completed", "cancelled", "pending"), weights=(85, 10, 5))[0]
+        else:
+            status = rng.choices(("pending", "cancelled"), weights=(92, 8))[0]
+        types = ",".join(rng.sample(APPOINTMENT_TYPES, rng.choice((1, 1, 2))))
+        note = rng.choice(("", "", "", "Kontrol", "Ölçüm sonrası liste", "Telefonla görüşme"))
+        yield (
+            f"synthetic-{i + 1:08d}", f"{first} {last} {client + 1}", f"05{client % 10**9:09d}",
+            day.isoformat(), f"{minutes // 60:02d}:{minutes % 60:02d}", types, note, status,
+            f"{(day - timedelta(days=rng.randint(1, 30))).isoformat()} 10:00:00", synced_at
+        )
+
+
+def _chunks(rows, size: int):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# ==================== YAZICILAR ====================
+
+def write_packages(conn, rng: random.Random, count: int, save_root: str) -> list:
+    rows = []
+    for i in range(count):
+        theme = PACKAGE_THEMES[i % len(PACKAGE_THEMES)]
+        rows.append((
+            f"{theme} Paketi {i + 1}", f"Sentetik {theme.lower()} paketi",
+            os.path.join(save_root, f"paket_{i + 1}"), rng.choice((1, 2, 4)), rng.choice((7, 10, 14)),
+            rng.choice((0.0, -1.0, -2.0, 1.0)), f"{REFERENCE_DAY.isoformat()} 09:00:00"
+        ))
+    with conn:
+        conn.executemany("""
+            INSERT INTO packages (name, description, save_path, list_count, days_per_list,
+                                  weight_change_per_list, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+    return [row[0] for row in conn.execute("SELECT id FROM packages ORDER BY id")]
+
+
+def write_appointments(conn, rng: random.Random, count: int):
+    clients = max(count // 8, 1)
+    for chunk in _chunks(iter_appointments(rng, count, clients), CHUNK_SIZE):
+        with conn, outbox_paused(conn):
+            conn.executemany("""
+                INSERT INTO appointments (firebase_id, client_name, phone, date, time, types, note,
+                                          status, created_at, synced_at, needs_sync)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
+            """, chunk)
+
+
+def write_users(conn, rng: random.Random, count: int):
+    # Sabit tuz: aynı tohum aynı hash'i verir; düşük maliyet 5k kullanıcıyı saniyelere indirir
+    alphabet = "./ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+    salt = ("$2b$04$" + "".join(rng.choice(alphabet) for _ in range(21)) + ".").encode("ascii")
+    password_hash = bcrypt.hashpw(SYNTHETIC_PASSWORD.encode("utf-8"), salt).decode("utf-8")
+    rows = []
+    for i in range(count):
+        username = f"kullanici{i + 1:05d}"
+        first = FIRST_NAMES[i % len(FIRST_NAMES)]
+        last = LAST_NAMES[i % len(LAST_NAMES)]
+        role = "admin" if i == 0 else "user"
+        rows.append((username, username_key(username), password_hash, f"{first} {last}", role,
+                     0 if rng.random() < 0.05 else 1, f"{REFERENCE_DAY.isoformat()} 08:00:00"))
+    with conn:
+        conn.executemany("""
+            INSERT INTO users (username, username_key, password_hash, display_name, role, is_active, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+
+
+def generate(path: str, preset: str = "small", seed: int = DEFAULT_SEED, overrides: dict = None,
+             force: bool = False) -> dict:
+    """path'e preset ölçeğinde sentetik veritabanı üret.
+
+    Args:
+        overrides: Preset sayılarını ezen değerler (recipes, packages, appointments, users)
+        force: Dosya varsa sil ve yeniden üret
+
+    Returns:
+        Üretilen sayılar ve süreler
+    """
+    scale = dict(PRESETS[preset])
+    scale.update({key: value for key, value in (overrides or {}).items() if value is not None})
+
+    if os.path.exists(path):
+        if not force:
+            raise FileExistsError(f"{path} already exists (use --force to overwrite)")
+        for suffix in ("", "-journal", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    rng = random.Random(seed)
+    timings = {}
+    started = time.perf_counter()
+
+    db = Database(path)
+    db.initialize()
+
+    conn = db.connect()
+    try:
+        conn.execute("PRAGMA synchronous = OFF")
+
+        step = time.perf_counter()
+        save_root = os.path.join(tempfile.gettempdir(), "detoks-synthetic")
+        package_ids = write_packages(conn, rng, scale["packages"], save_root)
+        write_users(conn, rng, scale["users"])
+        timings["packages_users"] = time.perf_counter() - step
+
+        step = time.perf_counter()
+        write_appointments(conn, rng, scale["appointments"])
+        timings["appointments"] = time.perf_counter() - step
+    finally:
+        db.close()
+
+    step = time.perf_counter()
+    recipes = Database(path).import_recipes(
+        iter_recipes(rng, scale["recipes"], package_ids), chunk_size=CHUNK_SIZE
+    )
+    timings["recipes"] = time.perf_counter() - step
+
+    step = time.perf_counter()
+    conn = Database(path).connect()
+    try:
+        with conn:
+            # Sabit oluşturma zamanı; üretilen katalog Firestore'a gönderilmeyi beklemesin
+            conn.execute("UPDATE recipes SET created_at = ?", (f"{REFERENCE_DAY.isoformat()} 09:00:00",))
+            conn.execute("DELETE FROM sync_outbox WHERE table_name IN ('recipes', 'packages')")
+    finally:
+        conn.close()
+    # Üretim kayıtları bootstrap'ı şişirmesin: istemciler tam yüklemeyle başlar
+    Database(path).compact_change_log(max_entries=0)
+    conn = Database(path).connect()
+    try:
+        conn.execute("ANALYZE")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    timings["finalize"] = time.perf_counter() - step
+
+    return {
+        "path": path,
+        "preset": preset,
+        "seed": seed,
+        "counts": {**scale, "package_links": recipes["package_links"]},
+        "size_mb": round(os.path.getsize(path) / (1024 * 1024), 1),
+        "seconds": {name: round(value, 2) for name, value in timings.items()},
+        "total_seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+def main():
+    sys.stdout.reconfigure(encoding="utf-8")
+
+    parser = argparse.ArgumentParser(description="Sentetik, yeniden üretilebilir büyük veri seti üret")
+    parser.add_argument("--preset", choices=tuple(PRESETS), default="small")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--output", default=None,
+                        help="Veritabanı dosyası (varsayılan: veri klasöründe synthetic-<preset>.db)")
+    parser.add_argument("--force", action="store_true", help="Var olan dosyanın üzerine yaz")
+    for name in ("recipes", "packages", "appointments", "users"):
+        parser.add_argument(f"--{name}", type=int, default=None, help=f"Preset {name} sayısını ez")
+    args = parser.parse_args()
+
+    path = args.output or os.path.join(get_data_dir(), f"synthetic-{args.preset}.db")
+    overrides = {name: getattr(args, name) for name in ("recipes", "packages", "appointments", "users")}
+    result = generate(path, args.preset, args.seed, overrides, args.force)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+Tarif içe/dışa aktarımı - JSONL ve CSV, akış halinde.
+
+İçe aktarımda kaynak satır satır okunur ve doğrulanır; geçerli satırlar
+Database.import_recipes ile parçalar halinde (executemany, parça başına tek
+transaction) yazılır, geçersiz satırlar atlanıp satır numarasıyla raporlanır.
+Dışa aktarım satırları bir generator üzerinden parça parça üretir. İki yönde
+de bellek kullanımı kayıt sayısından bağımsızdır.
+
+Alanlar: name, meal_type, pool_type, seasons, bki_21_25, bki_26_29, bki_30_33,
+bki_34_plus, packages (paket id'leri; JSONL'de liste, CSV'de "1;3"). Boş
+bırakılan bki_* alanları bki_21_25 ile doldurulur (API ile aynı kural).
+
+Kullanım:
+    python recipe_io.py export tarifler.jsonl
+    python recipe_io.py export tarifler.csv --pool-type normal
+    python recipe_io.py import tarifler.csv --chunk-size 2000
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+
+import catalog
+from database import Database, RECIPE_IMPORT_COLUMNS
+
+CHUNK_SIZE = 1000
+MAX_CHUNK_SIZE = 50000
+MAX_REPORTED_ERRORS = 100
+EXPORT_BATCH = 500
+
+FORMATS = {
+    "jsonl": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+EXPORT_FIELDS = ("id",) + RECIPE_IMPORT_COLUMNS + ("packages",)
+
+
+def resolve_format(fmt: str = None, content_type: str = None, filename: str = None) -> str:
+    """Biçimi açık parametreden, dosya uzantısından ya da Content-Type'tan belirle."""
+    if fmt:
+        fmt = fmt.lower()
+    elif filename and "." in filename:
+        fmt = filename.rsplit(".", 1)[1].lower()
+        fmt = "jsonl" if fmt in ("ndjson", "json") else fmt
+    elif content_type:
+        fmt = "csv" if "csv" in content_type.lower() else "jsonl"
+    else:
+        fmt = "jsonl"
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt} (expected {', '.join(FORMATS)})")
+    return fmt
+
+
+# ==================== İÇE AKTARIM ====================
+
+def read_records(stream, fmt: str):
+    """İkili akıştan (satır numarası, kayıt) çiftleri üret; bozuk satırlarda kayıt yerine hata.
+
+    Yields:
+        (int, dict | ValueError)
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        if fmt == "csv":
+            reader = csv.DictReader(text)
+            for record in reader:
+                if None in record:
+                    yield reader.line_num, ValueError("Too many columns")
+                else:
+                    yield reader.line_num, record
+            return
+
+        for line_number, line in enumerate(text, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, ValueError(f"Invalid JSON: {e}")
+                continue
+            if not isinstance(record, dict):
+                yield line_number, ValueError("Expected a JSON object")
+                continue
+            yield line_number, record
+    finally:
+        # Alttaki akış çağıranındır; sarmalayıcı kapanırken onu kapatmasın
+        text.detach()
+
+
+def _text(record: dict, field: str) -> str:
+    value = record.get(field)
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise ValueError(f"{field} must be a string")
+    return value.strip()
+
+
+def _seasons(value) -> str:
+    """'yaz,kis' / ["yaz"] -> SEASONS sırasıyla normalize edilmiş metin."""
+    if isinstance(value, list):
+        names = value
+    elif isinstance(value, str):
+        names = value.replace(";", ",").split(",")
+    elif value is None:
+        names = []
+    else:
+        raise ValueError("seasons must be a string or a list")
+    names = {str(name).strip().lower() for name in names if str(name).strip()}
+    unknown = names - set(catalog.SEASONS)
+    if unknown:
+        raise ValueError(f"Unknown seasons: {', '.join(sorted(unknown))}")
+    if not names:
+        return catalog.DEFAULT_SEASONS
+    return ",".join(season for season in catalog.SEASONS if season in names)
+
+
+def _package_ids(value, known: set) -> list:
+    """[1, 3] / "1;3" -> paket id listesi (var olmayan paket hatadır)."""
+    if value is None or value == "":
+        return []
+    if isinstance(value, str):
+        value = [part for part in value.replace(",", ";").split(";") if part.strip()]
+    if not isinstance(value, list):
+        raise ValueError("packages must be a list of package ids")
+    ids = []
+    for item in value:
+        try:
+            package_id = int(item)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid package id: {item!r}")
+        if package_id not in known:
+            raise ValueError(f"Unknown package id: {package_id}")
+        ids.append(package_id)
+    return list(dict.fromkeys(ids))
+
+
+def validate_record(record: dict, package_ids: set) -> dict:
+    """Ham kaydı içe aktarılacak tarif sözlüğüne çevir; geçersizse ValueError."""
+    recipe = {column: _text(record, column) for column in ("name", "meal_type", "pool_type")}
+    if not recipe["name"]:
+        raise ValueError("name is required")
+    if recipe["meal_type"] not in catalog.MEAL_TYPES:
+        raise ValueError(f"Unknown meal_type: {recipe['meal_type'] or '-'}")
+    if not recipe["pool_type"]:
+        raise ValueError("pool_type is required")
+
+    base = _text(record, "bki_21_25")
+    if not base:
+        raise ValueError("bki_21_25 is required")
+    for column in catalog.BKI_COLUMNS:
+        recipe[column] = _text(record, column) or base
+
+    recipe["seasons"] = _seasons(record.get("seasons"))
+    recipe["package_ids"] = _package_ids(record.get("packages"), package_ids)
+    return recipe
+
+
+def import_recipes(db: Database, stream, fmt: str, chunk_size: int = CHUNK_SIZE) -> dict:
+    """Akıştaki tarifleri doğrulayıp parçalar halinde ekle (engelleyen).
+
+    Returns:
+        {"inserted", "package_links", "first_id", "last_id", "skipped", "errors"}
+        errors: ilk MAX_REPORTED_ERRORS hata ({"line", "error"})
+    """
+    if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+        raise ValueError(f"chunk_size must be in 1..{MAX_CHUNK_SIZE}")
+
+    package_ids = {package["id"] for package in db.get_all_packages()}
+    errors = []
+    skipped = 0
+
+    def valid_recipes():
+        nonlocal skipped
+        for line_number, record in read_records(stream, fmt):
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                yield validate_record(record, package_ids)
+            except ValueError as e:
+                skipped += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"line": line_number, "error": str(e)})
+
+    result = db.import_recipes(valid_recipes(), chunk_size=chunk_size)
+    result["skipped"] = skipped
+    result["errors"] = errors
+    return result
+
+
+# ==================== DIŞA AKTARIM ====================
+
+def export_record(row: dict) -> dict:
+    """Veritabanı satırını içe aktarımla uyumlu kayda çevir."""
+    record = {field: row.get(field) for field in EXPORT_FIELDS if field != "packages"}
+    package_ids = row.get("package_ids")
+    record["packages"] = sorted(int(part) for part in package_ids.split(",")) if package_ids else []
+    return record
+
+
+def export_recipes(db: Database, fmt: str, pool_type: str = None):
+    """Tarifleri seçilen biçimde bayt parçaları olarak üret (EXPORT_BATCH satırda bir)."""
+    rows = db.iter_recipes_for_export(pool_type=pool_type)
+    buffer = io.StringIO()
+
+    if fmt == "csv":
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(EXPORT_FIELDS)
+
+        def write(record):
+            record["packages"] = ";".join(str(package_id) for package_id in record["packages"])
+            writer.writerow([record[field] for field in EXPORT_FIELDS])
+    else:
+        def write(record):
+            buffer.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+            buffer.write("\n")
+
+    pending = 0
+    for row in rows:
+        write(export_record(row))
+        pending += 1
+        if pending >= EXPORT_BATCH:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+# ==================== KOMUT SATIRI ====================
+
+def main():
+    sys.stdout.reconfigure(encoding="utf-8")
+
+    parser = argparse.ArgumentParser(description="Tarifleri JSONL/CSV olarak içe veya dışa aktar")
+    parser.add_argument("command", choices=("import", "export"))
+    parser.add_argument("path", help="Dosya yolu ('-': stdin/stdout)")
+    parser.add_argument("--format", choices=tuple(FORMATS), default=None,
+                        help="Varsayılan: dosya uzantısından (yoksa jsonl)")
+    parser.add_argument("--pool-type", default=None, help="export: yalnızca bu havuz")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help="import: transaction başına tarif sayısı")
+    args = parser.parse_args()
+
+    fmt = resolve_format(args.format, filename=None if args.path == "-" else args.path)
+    db = Database()
+    db.initialize()
+
+    if args.command == "export":
+        target = sys.stdout.buffer if args.path == "-" else open(args.path, "wb")
+        try:
+            for chunk in export_recipes(db, fmt, args.pool_type):
+                target.write(chunk)
+        finally:
+            if target is not sys.stdout.buffer:
+                target.close()
+        return
+
+    source = sys.stdin.buffer if args.path == "-" else open(args.path, "rb")
+    try:
+        result = import_recipes(db, source, fmt, args.chunk_size)
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
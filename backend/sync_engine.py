@@ -0,0 +1,448 @@
+"""
+Generic paged sync engine for Firestore collections
+Each collection is described by a CollectionSpec (remote field -> local
+column mapping). Remote changes are read page by page, ordered by updatedAt
+with limit + start_after, and every page is applied in one transaction
+together with the collection's checkpoint. Collections run concurrently,
+each on its own connection; at most one page per collection is in memory.
+Local edits of the catalog tables are pushed from the sync outbox in seq
+order, one WriteBatch per chunk (push_collection).
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from database import Database, PUSHED_TABLES, outbox_paused
+from firebase_sync import (
+    PUSH_BATCH_SIZE, after_cursor, commit_writes, save_checkpoint, server_timestamp
+)
+
+PAGE_SIZE = 500
+
+# One pull per collection at a time, so two runs never race on its checkpoint
+_collection_locks = {}
+_collection_locks_guard = threading.Lock()
+
+
+def _collection_lock(collection: str) -> threading.Lock:
+    with _collection_locks_guard:
+        return _collection_locks.setdefault(collection, threading.Lock())
+
+
+def _text(value, default: str = "") -> str:
+    return default if value is None else str(value)
+
+
+def _int(value, default: int = 0) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _float(value, default: float = 0.0) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _seasons(value) -> str:
+    """Seasons as stored locally: comma separated (a list is accepted too)"""
+    if isinstance(value, (list, tuple)):
+        return ",".join(value)
+    return value or "yaz,kis"
+
+
+def _timestamp(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+class CollectionSpec:
+    """
+    How one Firestore collection maps onto a local table.
+
+    Args:
+        collection: Firestore collection name
+        table: Local table (must have a UNIQUE firebase_id column)
+        fields: {local column: (remote field, converter)}
+        match_columns: Columns used to link a remote document to an existing
+            local row that has no firebase_id yet (e.g. one pushed by the frontend)
+        apply_children: Optional callable(conn, [(local id, document data)]) for child rows
+        read_children: Optional callable(conn, [local ids]) -> {local id: {remote field: value}},
+            the child rows as pushed document fields (inverse of apply_children)
+    """
+
+    def __init__(self, collection: str, table: str, fields: dict,
+                 match_columns: tuple = (), apply_children=None, read_children=None):
+        self.collection = collection
+        self.table = table
+        self.fields = fields
+        self.match_columns = match_columns
+        self.apply_children = apply_children
+        self.read_children = read_children
+        self.columns = list(fields)
+
+    def to_document(self, row: dict) -> dict:
+        """Document fields for a local row (updatedAt is set by the push)"""
+        return {
+            remote: row[column] for column, (remote, _) in self.fields.items()
+            if remote != "updatedAt"
+        }
+
+    def to_row(self, doc_id: str, data: dict) -> tuple:
+        """UPSERT parameters for a document: (firebase_id, *columns)"""
+        return (doc_id,) + tuple(
+            convert(data.get(remote)) for remote, convert in self.fields.values()
+        )
+
+    def upsert_sql(self) -> str:
+        """INSERT ... ON CONFLICT(firebase_id) DO UPDATE for this table"""
+        columns = ", ".join(self.columns)
+        placeholders = ", ".join("?" * (len(self.columns) + 1))
+        updates = ", ".join(f"{column} = excluded.{column}" for column in self.columns)
+        sql = f"""
+            INSERT INTO {self.table} (firebase_id, {columns}) VALUES ({placeholders})
+            ON CONFLICT(firebase_id) DO UPDATE SET {updates}
+        """
+        if self.table in PUSHED_TABLES:
+            # Rows with unpushed local edits keep their local values
+            sql += f"""
+            WHERE NOT EXISTS (
+                SELECT 1 FROM sync_outbox
+                WHERE table_name = '{self.table}' AND row_id = {self.table}.id
+            )
+            """
+        return sql
+
+    def link_sql(self) -> str:
+        """Give the oldest unlinked local row with the same match columns this firebase_id"""
+        conditions = " AND ".join(f"{column} IS ?" for column in self.match_columns)
+        return f"""
+            UPDATE {self.table} SET firebase_id = ?
+            WHERE id = (
+                SELECT id FROM {self.table}
+                WHERE firebase_id IS NULL AND {conditions}
+                ORDER BY id LIMIT 1
+            )
+            AND NOT EXISTS (SELECT 1 FROM {self.table} WHERE firebase_id = ?)
+        """
+
+
+def apply_template_meals(conn, templates: list):
+    """Replace template_meals of pulled templates (meals: list of dicts or [time, name, type])"""
+    template_ids = [template_id for template_id, _ in templates]
+    conn.executemany("DELETE FROM template_meals WHERE template_id = ?", [(i,) for i in template_ids])
+
+    rows = []
+    for template_id, data in templates:
+        for order, meal in enumerate(data.get("meals") or [], start=1):
+            if isinstance(meal, dict):
+                time, name, meal_type = meal.get("time"), meal.get("meal_name"), meal.get("meal_type")
+            else:
+                time, name, meal_type = (list(meal) + [None, None, None])[:3]
+            rows.append((template_id, _text(time), _text(name), _text(meal_type), order))
+    conn.executemany("""
+        INSERT INTO template_meals (template_id, time, meal_name, meal_type, sort_order)
+        VALUES (?, ?, ?, ?, ?)
+    """, rows)
+
+
+def read_template_meals(conn, template_ids: list) -> dict:
+    """{template id: {"meals": [{time, meal_name, meal_type}, ...]}} in sort order"""
+    meals = {template_id: {"meals": []} for template_id in template_ids}
+    placeholders = ",".join("?" * len(template_ids))
+    for row in conn.execute(f"""
+        SELECT template_id, time, meal_name, meal_type FROM template_meals
+        WHERE template_id IN ({placeholders}) ORDER BY template_id, sort_order, id
+    """, template_ids):
+        meals[row[0]]["meals"].append({"time": row[1], "meal_name": row[2], "meal_type": row[3]})
+    return meals
+
+
+COLLECTIONS = {
+    "recipes": CollectionSpec(
+        "recipes", "recipes",
+        {
+            "name": ("name", _text),
+            "meal_type": ("meal_type", _text),
+            "pool_type": ("pool_type", lambda value: value),
+            "seasons": ("seasons", _seasons),
+            "bki_21_25": ("bki_21_25", _text),
+            "bki_26_29": ("bki_26_29", _text),
+            "bki_30_33": ("bki_30_33", _text),
+            "bki_34_plus": ("bki_34_plus", _text),
+        },
+        match_columns=("name", "meal_type")
+    ),
+    "dietTemplates": CollectionSpec(
+        "dietTemplates", "diet_templates",
+        {"name": ("name", _text)},
+        match_columns=("name",),
+        apply_children=apply_template_meals,
+        read_children=read_template_meals
+    ),
+    "packages": CollectionSpec(
+        "packages", "packages",
+        {
+            "name": ("name", _text),
+            "description": ("description", _text),
+            "save_path": ("save_path", _text),
+            "list_count": ("list_count", lambda value: _int(value, 1)),
+            "days_per_list": ("days_per_list", lambda value: _int(value, 7)),
+            "weight_change_per_list": ("weight_change_per_list", _float),
+        },
+        match_columns=("name",)
+    ),
+    "clients": CollectionSpec(
+        "clients", "clients",
+        {
+            "name": ("name", _text),
+            "phone": ("phone", lambda value: value),
+            "email": ("email", lambda value: value),
+            "notes": ("notes", lambda value: value),
+            "updated_at": ("updatedAt", _timestamp),
+        }
+    ),
+}
+
+
+def apply_page(db: Database, spec: CollectionSpec, documents: list, cursor_value: str,
+               cursor_id: str = None):
+    """Apply one page of (doc id, data) pairs and the new checkpoint in one transaction"""
+    rows = [spec.to_row(doc_id, data) for doc_id, data in documents]
+    doc_ids = [doc_id for doc_id, _ in documents]
+
+    conn = db.connect()
+    try:
+        with conn, outbox_paused(conn):
+            if spec.match_columns:
+                positions = [spec.columns.index(column) + 1 for column in spec.match_columns]
+                conn.executemany(spec.link_sql(), [
+                    (row[0], *(row[position] for position in positions), row[0]) for row in rows
+                ])
+
+            conn.executemany(spec.upsert_sql(), rows)
+
+            if spec.apply_children:
+                placeholders = ",".join("?" * len(doc_ids))
+                local_ids = dict(conn.execute(
+                    f"SELECT firebase_id, id FROM {spec.table} WHERE firebase_id IN ({placeholders})",
+                    doc_ids
+                ).fetchall())
+                pending = set()
+                if spec.table in PUSHED_TABLES and local_ids:
+                    pending = {row[0] for row in conn.execute(
+                        f"SELECT row_id FROM sync_outbox WHERE table_name = ? "
+                        f"AND row_id IN ({','.join('?' * len(local_ids))})",
+                        [spec.table, *local_ids.values()]
+                    )}
+                spec.apply_children(conn, [
+                    (local_ids[doc_id], data) for doc_id, data in documents
+                    if doc_id in local_ids and local_ids[doc_id] not in pending
+                ])
+
+            if cursor_value:
+                save_checkpoint(conn, spec.collection, cursor_value, cursor_id)
+    finally:
+        db.close()
+
+
+def pull_collection(db: Database, client, spec: CollectionSpec, dietitian_id: str,
+                    page_size: int = PAGE_SIZE) -> dict:
+    """
+    Pull one collection page by page from its checkpoint.
+    The checkpoint is the (updatedAt, document id) of the last applied
+    document, so a run resumes strictly after it (see
+    firebase_sync.after_cursor); within a run pages continue with
+    start_after(last snapshot).
+    """
+    with _collection_lock(spec.collection):
+        checkpoint, checkpoint_id = db.get_sync_cursor(spec.collection)
+
+        query = client.collection(spec.collection).where("dietitianId", "==", dietitian_id)
+        query = query.order_by("updatedAt").order_by("__name__")
+        query = after_cursor(query, checkpoint, checkpoint_id).limit(page_size)
+
+        pulled = 0
+        pages = 0
+        cursor_value = checkpoint
+        cursor_id = checkpoint_id
+        last = None
+
+        while True:
+            page_query = query.start_after(last) if last is not None else query
+            documents = []
+            for snapshot in page_query.stream():
+                data = snapshot.to_dict()
+                documents.append((snapshot.id, data))
+                if data.get("updatedAt") is not None:
+                    cursor_value = data["updatedAt"].isoformat()
+                    cursor_id = snapshot.id
+                last = snapshot
+
+            if not documents:
+                break
+
+            apply_page(db, spec, documents, cursor_value, cursor_id)
+            pulled += len(documents)
+            pages += 1
+
+            if len(documents) < page_size:
+                break
+
+        return {"pulled": pulled, "pages": pages, "cursor": cursor_value}
+
+
+def pull_collections(client, dietitian_id: str, names: list = None,
+                     page_size: int = PAGE_SIZE, db_factory=Database) -> dict:
+    """
+    Pull several collections concurrently (one thread and connection each).
+
+    Returns:
+        {collection: {"pulled", "pages", "cursor"} or {"error"}}
+    """
+    specs = [COLLECTIONS[name] for name in (names or COLLECTIONS)]
+    if not specs:
+        return {}
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=len(specs), thread_name_prefix="collection-sync") as executor:
+        futures = {
+            spec.collection: executor.submit(pull_collection, db_factory(), client, spec, dietitian_id, page_size)
+            for spec in specs
+        }
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                results[name] = {"error": str(e)}
+    return results
+
+
+def read_push_chunk(db: Database, spec: CollectionSpec, collection, after_seq: int, limit: int):
+    """
+    Next outbox entries of the spec's table (seq order), their current rows
+    as documents, with new rows given a client-generated firebase_id in the
+    same write transaction (see firebase_sync.read_outbox_chunk).
+
+    Returns:
+        (entries, documents): outbox rows and {row id: (firebase_id, document)}
+    """
+    conn = db.connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        entries = conn.execute("""
+            SELECT seq, row_id, op, firebase_id FROM sync_outbox
+            WHERE table_name = ? AND seq > ?
+            ORDER BY seq LIMIT ?
+        """, (spec.table, after_seq, limit)).fetchall()
+
+        row_ids = [entry["row_id"] for entry in entries if entry["op"] != "delete"]
+        rows = {}
+        if row_ids:
+            placeholders = ",".join("?" * len(row_ids))
+            rows = {
+                row["id"]: dict(row) for row in
+                conn.execute(f"SELECT * FROM {spec.table} WHERE id IN ({placeholders})", row_ids)
+            }
+
+        assigned = [(collection.document().id, row_id) for row_id, row in rows.items() if not row["firebase_id"]]
+        if assigned:
+            # firebase_id is not a tracked column, so this does not add outbox entries
+            conn.executemany(f"UPDATE {spec.table} SET firebase_id = ? WHERE id = ?", assigned)
+            for firebase_id, row_id in assigned:
+                rows[row_id]["firebase_id"] = firebase_id
+
+        children = spec.read_children(conn, list(rows)) if spec.read_children and rows else {}
+        documents = {
+            row_id: (row["firebase_id"], {**spec.to_document(row), **children.get(row_id, {})})
+            for row_id, row in rows.items()
+        }
+
+        conn.commit()
+        return entries, documents
+    finally:
+        db.close()
+
+
+def push_collection(db: Database, client, spec: CollectionSpec, dietitian_id: str,
+                    batch_size: int = PUSH_BATCH_SIZE) -> dict:
+    """
+    Push the spec's pending outbox entries, in seq order, as WriteBatch
+    commits of up to batch_size writes. Catalog documents are small, so
+    inserts and updates both send the whole document (merged); deletes
+    remove it. Committed entries are removed from the outbox; an entry
+    superseded during the push was merged into a newer one, which stays.
+    """
+    with _collection_lock(spec.collection):
+        batch_size = min(batch_size, PUSH_BATCH_SIZE)
+        collection = client.collection(spec.collection)
+        timestamp = server_timestamp(client)
+
+        pushed = 0
+        failed = []
+        last_seq = 0
+
+        while True:
+            entries, documents = read_push_chunk(db, spec, collection, last_seq, batch_size)
+            if not entries:
+                break
+            last_seq = entries[-1]["seq"]
+
+            writes = []
+            skipped = []  # nothing to send: row gone (a later delete entry follows) or never pushed
+            for entry in entries:
+                if entry["op"] == "delete":
+                    if entry["firebase_id"]:
+                        writes.append((entry, collection.document(entry["firebase_id"]), None))
+                    else:
+                        skipped.append(entry)
+                    continue
+
+                if entry["row_id"] not in documents:
+                    skipped.append(entry)
+                    continue
+                firebase_id, document = documents[entry["row_id"]]
+                writes.append((entry, collection.document(firebase_id), {
+                    **document, "dietitianId": dietitian_id, "updatedAt": timestamp
+                }))
+
+            committed, rejected = commit_writes(client, writes) if writes else ([], [])
+
+            done = [entry for entry, _, _ in committed] + skipped
+            if done:
+                conn = db.connect()
+                try:
+                    with conn:
+                        conn.executemany("DELETE FROM sync_outbox WHERE seq = ?", [(entry["seq"],) for entry in done])
+                finally:
+                    db.close()
+
+            pushed += len(committed)
+            failed.extend(
+                {"id": item[0]["row_id"], "op": item[0]["op"], "error": message}
+                for item, message in rejected
+            )
+
+        return {"pushed": pushed, "failed": failed}
+
+
+def push_collections(client, dietitian_id: str, names: list = None, db_factory=Database) -> dict:
+    """
+    Push the pending local edits of several collections (only those whose
+    table is drained from the outbox, see PUSHED_TABLES). One after another:
+    catalog edits are few, and every chunk needs the single SQLite writer.
+
+    Returns:
+        {collection: {"pushed", "failed"} or {"error"}}
+    """
+    results = {}
+    for name in names or COLLECTIONS:
+        spec = COLLECTIONS[name]
+        if spec.table not in PUSHED_TABLES:
+            continue
+        try:
+            results[name] = push_collection(db_factory(), client, spec, dietitian_id)
+        except Exception as e:
+            results[name] = {"error": str(e)}
+    return results
@@ -0,0 +1,268 @@
+"""
+Real-time appointment listener for DetoksBot
+Attaches on_snapshot to the dietitian's appointments query. The callback
+only queues change sets; a dedicated writer thread debounces them and
+applies each batch in one transaction, so SQLite is never touched from the
+Firestore client's callback thread. A supervisor thread re-attaches dropped
+streams and resumes from the last applied updatedAt (the Python client
+exposes no resume token, so the timestamp checkpoint is the resume point).
+"""
+import queue
+import threading
+import time
+from datetime import datetime
+
+import firebase_sync
+from sync_scheduler import DIETITIAN_SETTING, backoff_delay
+
+# Settings (settings table)
+LISTENER_SETTING = "sync_listener_enabled"   # "1": start the listener with the API
+
+DEBOUNCE = 0.25         # apply once no change arrived for this long...
+MAX_DELAY = 2.0         # ...or once the oldest queued change is this old
+HEALTH_INTERVAL = 1.0   # how often the supervisor checks the stream
+
+
+class AppointmentListener:
+    """on_snapshot listener + writer thread for the appointments collection"""
+
+    def __init__(self, debounce: float = DEBOUNCE, max_delay: float = MAX_DELAY):
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._changes = queue.Queue()
+        self._stopping = threading.Event()
+        self._resync = threading.Event()
+        self._threads = []
+        self._dietitian_id = None
+        self._cursor = None        # updatedAt of the newest applied change
+        self._connected = False
+        self._reconnects = 0
+        self._failures = 0
+        self._applied = 0
+        self._batches = 0
+        self._last_batch_at = None
+        self._last_error = None
+
+    # ---- Control ----
+
+    def start(self, dietitian_id: str):
+        """Start listening for dietitian_id (restarts if another dietitian is active)"""
+        with self._lock:
+            if self._threads and self._dietitian_id == dietitian_id:
+                return
+        self.stop()
+
+        with self._lock:
+            self._dietitian_id = dietitian_id
+            self._cursor = None
+            self._stopping.clear()
+            self._resync.clear()
+            self._changes = queue.Queue()
+            self._threads = [
+                threading.Thread(target=self._write_loop, name="sync-listener-writer", daemon=True),
+                threading.Thread(target=self._supervise, name="sync-listener", daemon=True),
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Detach the listener and stop both threads (queued changes are applied first)"""
+        with self._lock:
+            threads, self._threads = self._threads, []
+            changes = self._changes
+        if not threads:
+            return
+        self._stopping.set()
+        changes.put(None)
+        for thread in threads:
+            thread.join(timeout)
+        with self._lock:
+            self._connected = False
+
+    def is_live(self, dietitian_id: str) -> bool:
+        """True while a stream for dietitian_id is attached"""
+        with self._lock:
+            return bool(self._threads) and self._connected and self._dietitian_id == dietitian_id
+
+    def state(self) -> dict:
+        """Listener state for /api/sync/status"""
+        with self._lock:
+            return {
+                "active": bool(self._threads),
+                "connected": self._connected,
+                "dietitianId": self._dietitian_id,
+                "cursor": self._cursor,
+                "queuedChangeSets": self._changes.qsize(),
+                "appliedChanges": self._applied,
+                "batches": self._batches,
+                "lastBatchAt": self._last_batch_at,
+                "reconnects": self._reconnects,
+                "consecutiveFailures": self._failures,
+                "lastError": self._last_error
+            }
+
+    # ---- Firestore side ----
+
+    def _attach(self, client):
+        """
+        Listen to the dietitian's whole appointments query: with an updatedAt
+        filter, deletes of documents older than the cursor would never be seen.
+        The first snapshot of each stream repeats every document as ADDED, so
+        documents already applied (updatedAt before the cursor) are dropped there.
+        """
+        resume = firebase_sync.parse_sync_time(self._cursor) if self._cursor else None
+        first = [True]
+
+        def on_snapshot(docs, changes, read_time):
+            # Client callback thread: only hand the change set over to the writer
+            items = [(change.type.name, change.document) for change in changes]
+            if first[0]:
+                first[0] = False
+                if resume is not None:
+                    items = [
+                        (kind, snapshot) for kind, snapshot in items
+                        if kind != 'ADDED' or (snapshot.get('updatedAt') or resume) >= resume
+                    ]
+            if items:
+                self._changes.put(items)
+
+        query = client.collection('appointments').where('dietitianId', '==', self._dietitian_id)
+        return query.on_snapshot(on_snapshot)
+
+    def _supervise(self):
+        db = firebase_sync.get_sync_db()
+        caught_up = False
+
+        while not self._stopping.is_set():
+            watch = None
+            try:
+                client = firebase_sync.db_firestore
+                if client is None:
+                    raise RuntimeError("Firebase not initialized")
+                if not caught_up:
+                    # Chunked pull first, so the first snapshot only writes what changed since
+                    result = firebase_sync.pull_remote_appointments(db, client, self._dietitian_id)
+                    with self._lock:
+                        self._cursor = result["lastSyncTime"]
+                    caught_up = True
+
+                watch = self._attach(client)
+                with self._lock:
+                    self._connected = True
+                    self._failures = 0
+
+                while not self._stopping.wait(HEALTH_INTERVAL):
+                    if not getattr(watch, 'is_active', True) or self._resync.is_set():
+                        break
+            except Exception as e:
+                with self._lock:
+                    self._failures += 1
+                    self._last_error = str(e)
+            finally:
+                with self._lock:
+                    self._connected = False
+                if watch is not None:
+                    watch.unsubscribe()
+
+            if self._stopping.is_set():
+                break
+            if self._resync.is_set():
+                # A batch failed to apply: resume from the last committed checkpoint
+                self._resync.clear()
+                with self._lock:
+                    self._cursor = db.get_sync_checkpoint('appointments')
+            with self._lock:
+                self._reconnects += 1
+                failures = self._failures
+            if failures:
+                self._stopping.wait(backoff_delay(failures))
+
+    # ---- SQLite side ----
+
+    def _write_loop(self):
+        db = firebase_sync.get_sync_db()
+        changes = self._changes
+
+        while True:
+            item = changes.get()
+            if item is None:
+                return
+            batch = [item]
+            stop = False
+            deadline = time.monotonic() + self.max_delay
+            while True:
+                timeout = min(self.debounce, deadline - time.monotonic())
+                if timeout <= 0:
+                    break
+                try:
+                    item = changes.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._apply(db, batch)
+            if stop:
+                return
+
+    def _apply(self, db, batch: list):
+        """Apply debounced change sets in one transaction (last change per document wins)"""
+        latest = {}
+        for change_set in batch:
+            for kind, snapshot in change_set:
+                latest[snapshot.id] = (kind, snapshot)
+
+        synced_at = datetime.now().isoformat()
+        rows = []
+        deleted = []
+        newest = None  # (updatedAt, document id), the pull's sort order
+        for kind, snapshot in latest.values():
+            if kind == 'REMOVED':
+                deleted.append(snapshot.id)
+                continue
+            row, updated_at = firebase_sync.appointment_row(snapshot, synced_at)
+            rows.append(row)
+            if updated_at is not None and (newest is None or (updated_at, snapshot.id) > newest):
+                newest = (updated_at, snapshot.id)
+
+        cursor_value = None
+        cursor_id = None
+        with self._lock:
+            current = self._cursor
+        if newest is not None and (current is None or newest[0] > firebase_sync.parse_sync_time(current)):
+            cursor_value = newest[0].isoformat()
+            cursor_id = newest[1]
+
+        try:
+            firebase_sync.apply_pull_chunk(db, rows, cursor_value, deleted, cursor_id)
+        except Exception as e:
+            # Re-attach from the stored checkpoint; the new stream re-delivers these changes
+            with self._lock:
+                self._last_error = str(e)
+            self._resync.set()
+            return
+
+        with self._lock:
+            if cursor_value:
+                self._cursor = cursor_value
+            self._applied += len(latest)
+            self._batches += 1
+            self._last_batch_at = datetime.now().isoformat()
+
+
+listener = AppointmentListener()
+
+
+def start_from_settings() -> bool:
+    """Start the listener if it is enabled and a dietitian is known (blocking; used at startup)"""
+    db = firebase_sync.get_sync_db()
+    dietitian_id = db.get_setting(DIETITIAN_SETTING, None)
+    if db.get_setting(LISTENER_SETTING, "0") != "1" or not dietitian_id:
+        return False
+    if not firebase_sync.init_firebase():
+        return False
+    listener.start(dietitian_id)
+    return True
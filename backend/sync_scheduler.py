@@ -0,0 +1,154 @@
+"""
+Background sync scheduler for DetoksBot
+Runs incremental push + pull on an interval from a daemon thread, started
+from the API lifespan. Failed runs back off exponentially (with jitter);
+triggers that arrive while a run is in progress collapse into one follow-up run.
+"""
+import random
+import threading
+import time
+from datetime import datetime
+
+import firebase_sync
+
+# Settings (settings table)
+INTERVAL_SETTING = "sync_interval_seconds"   # 0 disables interval runs; triggers still work
+DIETITIAN_SETTING = "sync_dietitian_id"      # remembered from the last /api/sync request
+
+DEFAULT_INTERVAL = 300.0
+STARTUP_DELAY = 10.0
+BACKOFF_BASE = 15.0
+BACKOFF_MAX = 1800.0
+
+
+def backoff_delay(failures: int) -> float:
+    """Delay after `failures` consecutive failed runs (exponential, with jitter)"""
+    delay = min(BACKOFF_BASE * (2 ** (failures - 1)), BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1.0)
+
+
+class SyncScheduler:
+    """Interval + on-demand sync runner; one run at a time"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._triggers = []       # reasons queued since the last run started
+        self._running = False
+        self._failures = 0
+        self._next_run_at = None
+        self._last_error = None
+        self._coalesced = 0
+
+    # ---- Control ----
+
+    def start(self, delay: float = None):
+        """Start the scheduler thread (no-op if already running)"""
+        if delay is None:
+            delay = STARTUP_DELAY
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._wake.clear()
+            self._next_run_at = time.time() + delay
+            self._thread = threading.Thread(target=self._loop, args=(delay,), name="sync-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the scheduler; waits up to timeout for a run in progress"""
+        self._stopping.set()
+        self._wake.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        with self._lock:
+            self._thread = None
+            self._next_run_at = None
+
+    def trigger(self, reason: str = "manual") -> bool:
+        """
+        Ask for a run as soon as possible.
+        Returns False if it was merged into a run that is already queued.
+        """
+        with self._lock:
+            queued = bool(self._triggers)
+            self._triggers.append(reason)
+            if queued:
+                self._coalesced += 1
+        self._wake.set()
+        return not queued
+
+    def state(self) -> dict:
+        """Scheduler state for /api/sync/status"""
+        with self._lock:
+            next_run = self._next_run_at
+            return {
+                "active": self._thread is not None and self._thread.is_alive(),
+                "running": self._running,
+                "consecutiveFailures": self._failures,
+                "lastError": self._last_error,
+                "nextRunAt": datetime.fromtimestamp(next_run).isoformat() if next_run else None,
+                "queuedTriggers": len(self._triggers),
+                "coalescedTriggers": self._coalesced
+            }
+
+    # ---- Loop ----
+
+    def _interval(self, db) -> float:
+        """Configured interval in seconds (None = interval runs disabled)"""
+        try:
+            interval = float(db.get_setting(INTERVAL_SETTING, DEFAULT_INTERVAL))
+        except (TypeError, ValueError):
+            interval = DEFAULT_INTERVAL
+        return interval if interval > 0 else None
+
+    def _loop(self, delay: float):
+        while not self._stopping.is_set():
+            self._wake.wait(delay)
+            self._wake.clear()
+            if self._stopping.is_set():
+                break
+
+            with self._lock:
+                reasons, self._triggers = self._triggers, []
+                self._running = True
+            try:
+                self._run_once(",".join(dict.fromkeys(reasons)) or "interval")
+            finally:
+                with self._lock:
+                    self._running = False
+
+            if self._failures:
+                delay = backoff_delay(self._failures)
+            else:
+                # None: interval runs disabled, sleep until the next trigger
+                delay = self._interval(firebase_sync.get_sync_db())
+            with self._lock:
+                if self._triggers:
+                    # Triggered during the run: one follow-up run covers all of them
+                    delay = 0
+                self._next_run_at = time.time() + delay if delay is not None else None
+
+    def _run_once(self, trigger: str):
+        """One push + pull; failures only count when Firestore was actually tried"""
+        db = firebase_sync.get_sync_db()
+        dietitian_id = db.get_setting(DIETITIAN_SETTING, None)
+        if not dietitian_id or not firebase_sync.init_firebase():
+            # Nothing to sync with yet (no dietitian known, or no Firebase client)
+            return
+
+        try:
+            firebase_sync.run_full_sync(trigger, dietitian_id)
+            with self._lock:
+                self._failures = 0
+                self._last_error = None
+        except Exception as e:
+            with self._lock:
+                self._failures += 1
+                self._last_error = str(e)
+
+
+scheduler = SyncScheduler()
@@ -0,0 +1,75 @@
+"""
+Catalog edits are captured in the sync outbox and drained by the catalog push.
+"""
+import pytest
+
+from database import Database
+import firestore_fake
+import sync_engine
+
+DIETITIAN = "test-dietitian"
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(str(tmp_path / "catalog.db"))
+    db.initialize()
+    return db
+
+
+def execute(db: Database, sql: str, params: tuple = ()) -> int:
+    conn = db.connect()
+    try:
+        with conn:
+            return conn.execute(sql, params).lastrowid
+    finally:
+        db.close()
+
+
+def remote(client, collection: str) -> dict:
+    return {doc.id: doc.to_dict() for doc in client.collection(collection).stream()}
+
+
+def test_seeded_defaults_are_not_queued(db):
+    assert not any(db.get_outbox_counts().values())
+
+
+def test_push_drains_catalog_outbox(db):
+    client = firestore_fake.FakeFirestore()
+    recipe_id = execute(db, """
+        INSERT INTO recipes (name, meal_type, bki_21_25, bki_26_29, bki_30_33, bki_34_plus)
+        VALUES ('Menemen', 'kahvalti', 'a', 'b', 'c', 'd')
+    """)
+    execute(db, "INSERT INTO packages (name, save_path) VALUES ('Paket', '.')")
+    execute(db, "UPDATE template_meals SET meal_name = 'Sabah' WHERE id = 1")
+
+    results = sync_engine.push_collections(client, DIETITIAN, db_factory=lambda: db)
+
+    assert {name: result["pushed"] for name, result in results.items()} == {
+        "recipes": 1, "dietTemplates": 1, "packages": 1
+    }
+    assert not any(db.get_outbox_counts().values())
+
+    (recipe,) = remote(client, "recipes").values()
+    assert recipe["name"] == "Menemen" and recipe["dietitianId"] == DIETITIAN
+    (template,) = remote(client, "dietTemplates").values()
+    assert template["meals"][0]["meal_name"] == "Sabah"
+
+    # Deleting a pushed row deletes its document
+    execute(db, "DELETE FROM recipes WHERE id = ?", (recipe_id,))
+    assert sync_engine.push_collections(client, DIETITIAN, ["recipes"], db_factory=lambda: db)["recipes"]["pushed"] == 1
+    assert remote(client, "recipes") == {}
+
+
+def test_deleting_a_template_is_not_overwritten_by_its_meals(db):
+    client = firestore_fake.FakeFirestore()
+    execute(db, "UPDATE diet_templates SET name = 'Kalıp' WHERE id = 1")
+    sync_engine.push_collections(client, DIETITIAN, ["dietTemplates"], db_factory=lambda: db)
+
+    execute(db, "DELETE FROM template_meals WHERE template_id = 1")
+    execute(db, "DELETE FROM diet_templates WHERE id = 1")
+    execute(db, "INSERT INTO template_meals (template_id, time, meal_name, meal_type, sort_order) "
+                "VALUES (1, '09:00', 'Yetim', 'kahvalti', 1)")
+
+    sync_engine.push_collections(client, DIETITIAN, ["dietTemplates"], db_factory=lambda: db)
+    assert remote(client, "dietTemplates") == {}
@@ -0,0 +1,125 @@
+"""
+/api/changes cursors across the migration that adds tables to the change log.
+"""
+import pytest
+
+from database import IMPORT_LOG_LIMIT, Database
+
+NEW_TABLES = ("recipe_packages", "template_meals")
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(str(tmp_path / "feed.db"))
+    db.initialize()
+    return db
+
+
+def drop_change_log_triggers(db: Database, tables: tuple):
+    """Bring the database back to a version that did not log `tables`."""
+    conn = db.connect()
+    try:
+        with conn:
+            for table in tables:
+                for event in ("insert", "update", "delete"):
+                    conn.execute(f"DROP TRIGGER trg_{table}_changelog_{event}")
+    finally:
+        db.close()
+
+
+def edit_template_meal(db: Database):
+    conn = db.connect()
+    try:
+        with conn:
+            conn.execute("UPDATE template_meals SET meal_name = 'Ara öğün' WHERE id = 1")
+    finally:
+        db.close()
+
+
+def test_caught_up_cursor_is_reset_when_tables_are_added(db):
+    drop_change_log_triggers(db, NEW_TABLES)
+    since = db.get_catalog_snapshot()["cursor"]
+    assert db.get_changes_since(since) == {"cursor": since, "reset": False, "changes": {}}
+
+    # Not logged: a delta client at `since` never hears about it
+    edit_template_meal(db)
+    db.initialize()
+
+    assert db.get_changes_since(since)["reset"] is True
+
+    # A fresh bootstrap is caught up again and sees later edits
+    cursor = db.get_catalog_snapshot()["cursor"]
+    edit_template_meal(db)
+    delta = db.get_changes_since(cursor)
+    assert delta["reset"] is False
+    assert [row["id"] for row in delta["changes"]["template_meals"]["upserted"]] == [1]
+
+
+def test_pruned_empty_log_cursor_is_reset_when_tables_are_added(db):
+    drop_change_log_triggers(db, NEW_TABLES)
+    since = db.get_catalog_snapshot()["cursor"]
+    db.compact_change_log(max_entries=0)
+
+    edit_template_meal(db)
+    db.initialize()
+
+    assert db.get_changes_since(since)["reset"] is True
+    cursor = db.get_catalog_snapshot()["cursor"]
+    assert db.get_changes_since(cursor)["reset"] is False
+
+
+def test_bootstrap_cursor_after_full_compaction_is_not_reset(db):
+    db.compact_change_log(max_entries=0)
+    cursor = db.get_catalog_snapshot()["cursor"]
+    assert cursor > 0
+    assert db.get_changes_since(cursor)["reset"] is False
+
+
+def imported_recipes(count: int, package_id: int):
+    for i in range(count):
+        yield {
+            "name": f"Tarif {i}", "meal_type": "kahvalti", "pool_type": None, "seasons": "yaz,kis",
+            "bki_21_25": "-", "bki_26_29": "-", "bki_30_33": "-", "bki_34_plus": "-",
+            "package_ids": [package_id],
+        }
+
+
+@pytest.fixture
+def package_id(db):
+    conn = db.connect()
+    try:
+        with conn:
+            return conn.execute("INSERT INTO packages (name, save_path) VALUES ('Paket', '.')").lastrowid
+    finally:
+        db.close()
+
+
+def test_small_import_is_logged_once_per_row_and_bumps_versions_per_chunk(db, package_id):
+    since = db.get_catalog_snapshot()["cursor"]
+    versions = db.get_table_versions()
+
+    db.import_recipes(imported_recipes(30, package_id), chunk_size=10)
+
+    bumped = db.get_table_versions()
+    assert bumped["recipes"] - versions["recipes"] == 3
+    assert bumped["recipe_packages"] - versions["recipe_packages"] == 3
+
+    delta = db.get_changes_since(since)
+    assert delta["reset"] is False
+    assert len(delta["changes"]["recipes"]["upserted"]) == 30
+    assert len(delta["changes"]["recipe_packages"]["upserted"]) == 30
+
+
+def test_large_import_resets_cursors_instead_of_flooding_the_log(db, package_id):
+    since = db.get_catalog_snapshot()["cursor"]
+    conn = db.connect()
+    logged = conn.execute("SELECT COUNT(*) FROM change_log").fetchone()[0]
+    db.close()
+
+    db.import_recipes(imported_recipes(IMPORT_LOG_LIMIT + 1, package_id))
+
+    conn = db.connect()
+    assert conn.execute("SELECT COUNT(*) FROM change_log").fetchone()[0] == logged
+    db.close()
+    assert db.get_changes_since(since)["reset"] is True
+    assert db.get_changes_since(db.get_catalog_snapshot()["cursor"])["reset"] is False
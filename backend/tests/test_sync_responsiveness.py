@@ -0,0 +1,90 @@
+"""
+Full sync through the API must not block the event loop: push and pull run
+on the sync executor while other requests keep being served.
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from database import Database
+import firebase_sync
+import firestore_fake
+
+DIETITIAN = "test-dietitian"
+COUNT = 1500
+RPC_LATENCY = 0.2        # per query/commit; push (3 commits) runs beside the pull
+WRITE_LATENCY = 0.0005   # per written document: ~0.75 s for the push
+MAX_STALL = 0.25         # no probe may wait longer than this
+MIN_SYNC_SECONDS = 0.6   # the sync must outlast the bound, or the test proves nothing
+
+
+@pytest.fixture
+def sync_env(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "sync.db")
+    monkeypatch.setenv("DETOKS_DB_PATH", db_path)
+    db = Database(db_path)
+    db.initialize()
+
+    conn = db.connect()
+    try:
+        with conn:
+            conn.executemany("""
+                INSERT INTO appointments (client_name, phone, date, time, types, note, status)
+                VALUES (?, ?, '2026-05-01', '10:00', 'detoks', '', 'pending')
+            """, [(f"Danisan {i}", f"0555{i:07d}") for i in range(COUNT)])
+    finally:
+        db.close()
+
+    client = firestore_fake.FakeFirestore()
+    collection = client.collection("appointments")
+    for start in range(0, COUNT, firestore_fake.MAX_BATCH_SIZE):
+        batch = client.batch()
+        for i in range(start, min(start + firestore_fake.MAX_BATCH_SIZE, COUNT)):
+            batch.set(collection.document(), {
+                "clientName": f"Uzak {i}", "date": "2026-06-01", "time": "11:00",
+                "types": ["kilo"], "status": "pending", "dietitianId": DIETITIAN,
+                "updatedAt": firestore_fake.SERVER_TIMESTAMP,
+            })
+        batch.commit()
+    client.latency = RPC_LATENCY
+    client.write_latency = WRITE_LATENCY
+
+    firebase_sync.set_firestore_client(client)
+    yield db
+    firebase_sync.set_firestore_client(None)
+    firebase_sync.shutdown_executor()
+
+
+def test_full_sync_keeps_event_loop_responsive(sync_env):
+    import api
+
+    async def run():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            started = time.perf_counter()
+            sync_task = asyncio.create_task(http.post(
+                "/api/sync/appointments/full", json={"collection": "appointments", "dietitianId": DIETITIAN}
+            ))
+
+            # Each probe: one request and a 10 ms sleep; overshoot means the loop was held
+            latencies = []
+            while not sync_task.done():
+                sent = time.perf_counter()
+                response = await http.get("/api/settings")
+                assert response.status_code == 200
+                await asyncio.sleep(0.01)
+                latencies.append(time.perf_counter() - sent - 0.01)
+
+            return await sync_task, time.perf_counter() - started, latencies
+
+    response, elapsed, latencies = asyncio.run(run())
+
+    assert response.status_code == 200
+    result = response.json()
+    assert result["pushed"] == COUNT
+    assert result["pulled"] == COUNT
+    assert elapsed >= MIN_SYNC_SECONDS
+    assert max(latencies) < MAX_STALL, f"event loop stalled {max(latencies) * 1000:.0f} ms"
+    assert len(latencies) >= 5
@@ -0,0 +1,146 @@
+"""
+Warm-up for DetoksBot backend
+Preloads the PDF/DOCX renderers and the recipe catalog index after startup,
+so the first /api/generate call does not pay for imports and font parsing.
+"""
+import io
+import threading
+import time
+import traceback
+
+import catalog
+from database import Database
+
+# Örnek program için öğün düzeni (veritabanında kalıp yoksa)
+SAMPLE_MEALS = [
+    ("08:00", "Kahvaltı", "kahvalti"),
+    ("10:30", "Ara Öğün 1", "ara_ogun_1"),
+    ("12:00", "Öğle Yemeği", "ogle"),
+    ("18:00", "Akşam Yemeği", "aksam"),
+    ("21:00", "Özel İçecek", "ozel_icecek"),
+]
+
+_lock = threading.Lock()
+_state = {
+    "ready": False,
+    "running": False,
+    "started_at": None,
+    "finished_at": None,
+    "duration_ms": None,
+    "stages": {},
+    "error": None
+}
+
+
+def get_state() -> dict:
+    """Warm-up durumunun kopyasını döndür."""
+    with _lock:
+        state = dict(_state)
+        state["stages"] = dict(_state["stages"])
+    return state
+
+
+def _stage(name: str, func):
+    """Bir aşamayı çalıştır ve süresini kaydet."""
+    started = time.perf_counter()
+    result = func()
+    with _lock:
+        _state["stages"][name] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def _sample_program(db) -> list:
+    """Bir günlük örnek program (gerçek kalıp varsa onun öğünleriyle)."""
+    meals = SAMPLE_MEALS
+    templates = db.get_all_templates()
+    if templates:
+        template = db.get_template(templates[0]['id'])
+        if template and template['meals']:
+            meals = template['meals']
+
+    return [{
+        "day": 1,
+        "meals": [
+            {
+                "time": meal_time,
+                "meal_name": meal_name,
+                "meal_type": meal_type,
+                "recipe_text": "1 bardak süt, 2 dilim tam buğday ekmeği, 5 adet zeytin"
+            }
+            for meal_time, meal_name, meal_type in meals
+        ]
+    }]
+
+
+def _render_sample(diet_program: list):
+    """Örnek programı PDF ve DOCX olarak belleğe çiz, sonucu at."""
+    from pdf_generator import PDFGenerator
+    from docx_generator import DOCXGenerator
+
+    patient_info = {
+        'patient_name': 'Warm Up',
+        'weight': 70.0,
+        'height': 170.0,
+        'birth_year': 1990,
+        'end_date': '1 OCAK'
+    }
+
+    PDFGenerator().create_diet_pdf(
+        file_path=io.BytesIO(),
+        diet_program=diet_program,
+        template_name="warmup",
+        pool_type="warmup",
+        bki_group="21_25",
+        patient_info=patient_info,
+        start_date="1 OCAK"
+    )
+    DOCXGenerator().create_diet_docx(
+        file_path=io.BytesIO(),
+        diet_program=diet_program,
+        patient_name=patient_info['patient_name'],
+        start_date="1 OCAK",
+        template_name="warmup",
+        bki_group="21_25",
+        excluded_foods="",
+        combination_code="",
+        patient_info=patient_info
+    )
+
+
+def run_warmup():
+    """Tüm warm-up aşamalarını sırayla çalıştır (bloklayan, thread içinde çağrılır)."""
+    with _lock:
+        if _state["running"] or _state["ready"]:
+            return
+        _state["running"] = True
+        _state["started_at"] = time.time()
+
+    started = time.perf_counter()
+    try:
+        def import_renderers():
+            import pdf_generator  # noqa: F401
+            import docx_generator  # noqa: F401
+
+        def register_fonts():
+            from pdf_generator import PDFGenerator
+            PDFGenerator()
+
+        db = Database()
+        _stage("import_renderers", import_renderers)
+        _stage("register_fonts", register_fonts)
+        indexed = _stage("catalog_index", lambda: catalog.warm(db))
+        _stage("render_sample", lambda: _render_sample(_sample_program(db)))
+
+        with _lock:
+            _state["catalog_recipes"] = indexed
+    except Exception as e:
+        traceback.print_exc()
+        with _lock:
+            _state["error"] = str(e)
+    finally:
+        # Hata olsa da uygulama çalışır; ilk istek eksik kalan işi kendisi yapar
+        with _lock:
+            _state["running"] = False
+            _state["ready"] = True
+            _state["finished_at"] = time.time()
+            _state["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)